@@ -1,4 +1,5 @@
 import os
+import threading
 from types import SimpleNamespace
 from flask import Flask, jsonify, current_app
 from pymongo import MongoClient
@@ -87,6 +88,18 @@ def create_app():
     app.register_blueprint(admin_bp)
     app.register_blueprint(payment_bp)
 
+    # Create missing indexes without holding up startup (idempotent; failures are logged)
+    if app.config.get('ENSURE_INDEXES_ON_STARTUP') and not app.config.get('TESTING'):
+        from models.indexes import ensure_indexes_at_startup
+        threading.Thread(target=ensure_indexes_at_startup, args=(db,),
+                         name='ensure-indexes', daemon=True).start()
+
+    # Apply queued Razorpay webhook events in the background
+    worker_threads = app.config.get('WEBHOOK_WORKER_THREADS', 0)
+    if worker_threads > 0 and not app.config.get('TESTING'):
+        from utils.webhook_outbox import start_outbox_workers
+        app.extensions['webhook_outbox_stop'] = start_outbox_workers(lambda: app.mongo.db, worker_threads)
+
     return app
 
 
@@ -12,6 +12,22 @@ class Config:
 		"MONGO_URI",
 		"mongodb://127.0.0.1:27017/raft_booking"  # fallback for local dev only
 	)
+	# Run multi-document admin writes and payment confirmation in a transaction (requires a replica set)
+	MONGO_TRANSACTIONS = os.environ.get("MONGO_TRANSACTIONS", "").lower() in ("1", "true", "yes")
+	# Unpaid Pending bookings are marked Expired this long after checkout starts
+	PENDING_BOOKING_EXPIRY_MINUTES = int(os.environ.get("PENDING_BOOKING_EXPIRY_MINUTES", "30"))
+	# Seats are held for a booking this long after create_order (utils.seat_holds)
+	SEAT_HOLD_MINUTES = int(os.environ.get("SEAT_HOLD_MINUTES", "15"))
+	# Razorpay API calls (utils.gateway): worker threads, overall deadline per call, retries
+	GATEWAY_MAX_WORKERS = int(os.environ.get("GATEWAY_MAX_WORKERS", "8"))
+	GATEWAY_DEADLINE_SECONDS = float(os.environ.get("GATEWAY_DEADLINE_SECONDS", "8"))
+	GATEWAY_RETRIES = int(os.environ.get("GATEWAY_RETRIES", "2"))
+	# Apply the index registry (models/indexes.py) in the background when the app starts;
+	# turn off to manage indexes only with scripts/ensure_indexes.py
+	ENSURE_INDEXES_ON_STARTUP = os.environ.get("ENSURE_INDEXES_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+	# Threads per app process applying queued webhook events (utils.webhook_outbox);
+	# 0 leaves the outbox to scripts/drain_webhook_outbox.py
+	WEBHOOK_WORKER_THREADS = int(os.environ.get("WEBHOOK_WORKER_THREADS", "2"))
 
 
 # Backwards-compatible module-level names used elsewhere in the codebase
@@ -1,6 +1,8 @@
 
-from datetime import datetime, timezone
+import re
+from datetime import datetime, timedelta, timezone
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
 
 
 def _normalize_status(value):
@@ -16,10 +18,38 @@ def _normalize_status(value):
         "confirmed": "Confirmed",
         "cancelled": "Cancelled",
         "failed": "Failed",
+        "expired": "Expired",
     }
     return known.get(value.lower(), value.title())
 
 
+def get_slot_index(time_slots, slot):
+    """
+    Position of `slot` in the configured time slot order.
+    Unknown / removed slots sort after every configured slot.
+    """
+    time_slots = time_slots or []
+    try:
+        return time_slots.index(slot)
+    except ValueError:
+        return len(time_slots)
+
+
+def normalize_phone(phone):
+    """Digits of a phone number, without a leading country code (last 10 digits)."""
+    digits = re.sub(r"\D", "", str(phone or ""))
+    return digits[-10:]
+
+
+def search_keys(name, email, phone):
+    """Normalised, indexed lookup fields stored on each booking for admin search."""
+    return {
+        "name_lower": (name or "").strip().lower(),
+        "email_lower": (email or "").strip().lower(),
+        "phone_digits": normalize_phone(phone),
+    }
+
+
 def create_booking(
     db,
     user_id,
@@ -29,15 +59,23 @@ def create_booking(
     status="Pending",
     razorpay_order_id=None,
     payment_status="Pending",
+    slot_index=None,
+    expires_at=None,
+    pricing=None,
 ):
     """
     Create a booking document.
 
-    - status: lifecycle of the booking itself (Pending / Confirmed / Cancelled / Failed)
+    - status: lifecycle of the booking itself (Pending / Confirmed / Cancelled / Failed / Expired)
     - payment_status: lifecycle of the payment (Pending / Paid / Failed)
+    - slot_index: position of the slot in settings['time_slots'], used for server-side ordering
+    - expires_at: when an unpaid Pending booking may be marked Expired (see expire_pending_bookings)
+    - pricing: the calculate_total_amount result the booking was priced with; its total,
+      advance and advance percent are stored so later price changes do not rewrite them
     """
     booking_status = _normalize_status(status)
     payment_status_norm = _normalize_status(payment_status)
+    now = datetime.now(timezone.utc)
 
     booking = {
         "user_id": user_id,
@@ -47,9 +85,12 @@ def create_booking(
         "status": booking_status,
         "payment_status": payment_status_norm,
         "razorpay_order_id": razorpay_order_id,
-        "created_at": datetime.now(timezone.utc),
+        "created_at": now,
+        "updated_at": now,
         "date": booking_details.get("date"),
         "slot": booking_details.get("slot"),
+        "slot_index": slot_index,
+        "expires_at": expires_at,
         "user_name": booking_details.get("user_name") or booking_details.get("name"),
         "phone": booking_details.get("phone"),
         "email": booking_details.get("email"),
@@ -57,9 +98,36 @@ def create_booking(
         "raft_allocations": booking_details.get("raft_allocations", []),
         "raft_allocation_details": booking_details.get("raft_allocation_details", []),
     }
+    if pricing:
+        booking["total_amount"] = pricing.get("total_amount", amount)
+        booking["advance_amount"] = pricing.get("advance_amount")
+        booking["advance_percent"] = pricing.get("advance_percent")
+    booking.update(search_keys(booking["user_name"], booking["email"], booking["phone"]))
     return db.bookings.insert_one(booking).inserted_id
 
 
+# Deleted bookings are remembered this long (TTL index on booking_tombstones.deleted_at)
+# so a dashboard delta refresh can drop their rows; an older ?since= reloads instead
+TOMBSTONE_TTL = timedelta(days=2)
+
+
+def record_booking_tombstones(db, bookings, session=None):
+    """
+    Note deleted bookings ({_id, date, slot}) in booking_tombstones for the
+    dashboard delta refresh and the occupancy audit of recent changes.
+    """
+    if not bookings:
+        return
+    now = datetime.utcnow()
+    # Upserts, so a booking restored from the archive and deleted again is noted again
+    db.booking_tombstones.bulk_write(
+        [UpdateOne({"_id": b["_id"]}, {"$set": {"date": b.get("date"), "slot": b.get("slot"), "deleted_at": now}}, upsert=True)
+         for b in bookings],
+        ordered=False,
+        session=session,
+    )
+
+
 def update_booking_status(
     db,
     booking_id,
@@ -94,8 +162,126 @@ def update_booking_status(
     if not update:
         return
 
+    update["updated_at"] = datetime.now(timezone.utc)
     db.bookings.update_one({"_id": ObjectId(booking_id)}, {"$set": update})
 
 
 def get_booking(db, booking_id):
     return db.bookings.find_one({"_id": ObjectId(booking_id)})
+
+
+# ---------- Lean projections for list views ----------
+# Each admin / tracking list fetches only the fields its table renders, so the
+# duplicated `booking_details` sub-document and allocation arrays stay on the server
+# unless a view actually needs them.
+DASHBOARD_PROJECTION = {
+    "user_name": 1, "name": 1, "phone": 1, "email": 1,
+    "date": 1, "slot": 1, "slot_index": 1, "created_at": 1,
+    "group_size": 1, "raft_allocations": 1,
+    "status": 1, "payment_status": 1, "amount": 1,
+}
+
+CALENDAR_PROJECTION = {
+    "user_name": 1, "name": 1, "date": 1, "slot": 1, "created_at": 1,
+    "group_size": 1, "raft_allocations": 1, "status": 1,
+}
+
+OCCUPANCY_PROJECTION = {
+    "user_name": 1, "name": 1, "email": 1, "date": 1, "slot": 1,
+    "group_size": 1, "raft_allocations": 1, "raft_allocation_details": 1, "status": 1,
+}
+
+MANIFEST_PROJECTION = {
+    "user_name": 1, "name": 1, "phone": 1, "date": 1, "slot": 1, "slot_index": 1,
+    "group_size": 1, "raft_allocations": 1, "raft_allocation_details": 1,
+}
+
+TRACKING_PROJECTION = {
+    "user_name": 1, "email": 1, "phone": 1, "date": 1, "slot": 1, "created_at": 1,
+    "group_size": 1, "raft_allocations": 1, "status": 1, "amount": 1,
+    "booking_details.amount_per_person": 1, "booking_details.total_amount": 1,
+}
+
+
+class BookingRow:
+    """
+    Lightweight, attribute-only view of a projected booking document.
+    Templates read it like the raw dict (`b.user_name`), and the admin views
+    attach their computed display fields to the same object.
+    """
+
+    __slots__ = (
+        "_id", "user_name", "name", "phone", "email", "date", "slot", "slot_index",
+        "created_at", "group_size", "raft_allocations", "raft_allocation_details",
+        "status", "payment_status", "amount", "amount_per_person",
+        # computed display fields
+        "created_at_ist", "total_amount", "advance_amount", "advance_percent",
+        "payment_status_display", "balance_amount",
+    )
+
+    def __init__(self, doc):
+        for field in self.__slots__:
+            setattr(self, field, doc.get(field))
+        details = doc.get("booking_details") or {}
+        if self.amount_per_person is None:
+            self.amount_per_person = details.get("amount_per_person", 0)
+        if self.total_amount is None:
+            self.total_amount = details.get("total_amount", 0)
+        if self.raft_allocations is None:
+            self.raft_allocations = []
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+
+def to_rows(cursor):
+    """Wrap projected booking documents from a cursor/iterable as BookingRow objects."""
+    return [BookingRow(doc) for doc in cursor]
+
+
+def reindex_booking_slot_order(db, time_slots):
+    """
+    Store the configured slot order on every booking as `slot_index`.
+    Run after the time slots change (and once to backfill older bookings).
+    Returns the number of bookings modified.
+    """
+    time_slots = time_slots or []
+    modified = 0
+    for idx, slot in enumerate(time_slots):
+        res = db.bookings.update_many(
+            {"slot": slot, "slot_index": {"$ne": idx}},
+            {"$set": {"slot_index": idx}},
+        )
+        modified += res.modified_count
+    res = db.bookings.update_many(
+        {"slot": {"$nin": time_slots}, "slot_index": {"$ne": len(time_slots)}},
+        {"$set": {"slot_index": len(time_slots)}},
+    )
+    modified += res.modified_count
+    return modified
+
+
+def backfill_search_keys(db, batch_size=1000):
+    """
+    Add name_lower / email_lower / phone_digits to bookings created before
+    admin search existed. Returns the number of bookings updated.
+    """
+    updated = 0
+    ops = []
+    cursor = db.bookings.find(
+        {"phone_digits": {"$exists": False}},
+        {"user_name": 1, "name": 1, "email": 1, "phone": 1},
+    ).batch_size(batch_size)
+    for b in cursor:
+        keys = search_keys(b.get("user_name") or b.get("name"), b.get("email"), b.get("phone"))
+        ops.append(UpdateOne({"_id": b["_id"]}, {"$set": keys}))
+        if len(ops) >= batch_size:
+            updated += db.bookings.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += db.bookings.bulk_write(ops, ordered=False).modified_count
+    return updated
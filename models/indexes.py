@@ -0,0 +1,212 @@
+"""
+Declarative index registry.
+
+Every index the application relies on is listed here once, next to the
+collection it belongs to, and applied idempotently by `ensure_indexes`.
+"""
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger("indexes")
+
+# Partial filter for unique ids that are null until set: only non-empty strings are indexed.
+# (A sparse index would still index the explicit nulls; a string equality query implies this filter.)
+HAS_ID = {"$gt": ""}
+
+# collection -> list of (keys, options)
+INDEXES = {
+    "bookings": [
+        # Admin list ordering / keyset pagination
+        (
+            [("date", ASCENDING), ("slot_index", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            {"name": "date_slot_index_created_desc"},
+        ),
+        # Slot occupancy and recompute: confirmed bookings of a date (range) and slot
+        ([("date", ASCENDING), ("slot", ASCENDING), ("status", ASCENDING)], {"name": "date_slot_status"}),
+        # Track booking: upcoming bookings by email or phone (one index per $or branch)
+        ([("email", ASCENDING), ("date", ASCENDING)], {"name": "email_date"}),
+        ([("phone", ASCENDING), ("date", ASCENDING)], {"name": "phone_date"}),
+        # Admin search (utils.admin_queries.search_bookings): exact and prefix lookups
+        ([("phone_digits", ASCENDING), ("date", DESCENDING)], {"name": "phone_digits_date"}),
+        ([("email_lower", ASCENDING), ("date", DESCENDING)], {"name": "email_lower_date"}),
+        ([("name_lower", ASCENDING), ("date", DESCENDING)], {"name": "name_lower_date"}),
+        # One booking per Razorpay order (create_booking stores None until an order exists)
+        (
+            [("razorpay_order_id", ASCENDING)],
+            {
+                "name": "razorpay_order_id_unique",
+                "unique": True,
+                "partialFilterExpression": {"razorpay_order_id": HAS_ID},
+            },
+        ),
+        ([("razorpay_payment_id", ASCENDING)], {"name": "razorpay_payment_id"}),
+        # Dashboard delta refresh (?since=)
+        ([("updated_at", ASCENDING)], {"name": "updated_at"}),
+        # Payment reconciliation (utils.reconciliation) pages through recent orders
+        ([("payment_order_created_at", ASCENDING), ("_id", ASCENDING)], {"name": "payment_order_created_at"}),
+        # Abandoned checkout sweeper (utils.booking_ops.expire_pending_bookings)
+        ([("status", ASCENDING), ("expires_at", ASCENDING)], {"name": "status_expires_at"}),
+    ],
+    "rafts": [
+        # Every allocation reads a slot's rafts in raft_id order; moves address one raft
+        ([("day", ASCENDING), ("slot", ASCENDING), ("raft_id", ASCENDING)], {"name": "day_slot_raft_id"}),
+    ],
+    "users": [
+        # Login looks users up by email
+        (
+            [("email", ASCENDING)],
+            {"name": "email_unique", "unique": True, "partialFilterExpression": {"email": HAS_ID}},
+        ),
+    ],
+    "payments": [
+        # One document per Razorpay payment; verify_payment, the webhook outbox and
+        # reconciliation upsert on it
+        (
+            [("payment_id", ASCENDING)],
+            {"name": "payment_id_unique", "unique": True, "partialFilterExpression": {"payment_id": HAS_ID}},
+        ),
+        # Reconciliation and archiving look payments up by order and booking
+        ([("order_id", ASCENDING)], {"name": "order_id"}),
+        ([("booking_id", ASCENDING)], {"name": "booking_id"}),
+    ],
+    "daily_stats": [
+        # One rollup row per (date, slot); upsert key for incremental updates
+        ([("date", ASCENDING), ("slot", ASCENDING)], {"name": "date_slot_unique", "unique": True}),
+    ],
+    # Archived dates (utils.archive): restore selects by date, payments follow their booking
+    "bookings_archive": [([("date", ASCENDING)], {"name": "date"})],
+    "rafts_archive": [([("day", ASCENDING), ("slot", ASCENDING), ("raft_id", ASCENDING)], {"name": "day_slot_raft"})],
+    "payments_archive": [
+        ([("booking_id", ASCENDING)], {"name": "booking_id"}),
+        ([("order_id", ASCENDING)], {"name": "order_id"}),
+    ],
+    "seat_holds": [
+        # One hold per booking; expired holds are removed by the TTL monitor
+        ([("booking_id", ASCENDING)], {"name": "booking_id_unique", "unique": True}),
+        ([("date", ASCENDING), ("slot", ASCENDING), ("expires_at", ASCENDING)], {"name": "date_slot_expires_at"}),
+        ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ],
+    "webhook_outbox": [
+        # Workers claim ready events oldest first; done events are dropped after 7 days
+        ([("state", ASCENDING), ("next_attempt_at", ASCENDING)], {"name": "state_next_attempt_at"}),
+        ([("state", ASCENDING), ("lease_until", ASCENDING)], {"name": "state_lease_until"}),
+        ([("claim", ASCENDING)], {"name": "claim", "sparse": True}),
+        ([("processed_at", ASCENDING)], {"name": "processed_at_ttl", "expireAfterSeconds": 7 * 24 * 3600}),
+    ],
+    "booking_tombstones": [
+        # Dashboard delta refresh: bookings deleted since the previous poll (kept 2 days)
+        ([("deleted_at", ASCENDING)], {"name": "deleted_at_ttl", "expireAfterSeconds": 2 * 24 * 3600}),
+    ],
+    "occupancy_audits": [
+        # Drift audit history is kept for 30 days
+        ([("created_at", ASCENDING)], {"name": "created_at_ttl", "expireAfterSeconds": 30 * 24 * 3600}),
+    ],
+}
+
+
+# Indexes replaced by a registry entry on the same keys: {collection: {retired name: replacement name}}.
+# A retired index is only dropped once its replacement exists, so the keys are never left unindexed.
+RETIRED_INDEXES = {
+    "bookings": {"razorpay_order_id": "razorpay_order_id_unique"},
+}
+
+# create_index errors for an index that clashes with an existing one on the same keys
+INDEX_CONFLICT_CODES = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+
+def _replace_retired(db, collection, keys, options, retired):
+    """
+    Build a registry index whose keys are still taken by a retired index (servers
+    that refuse both side by side): drop the retired one, build the replacement,
+    and put the retired one back if that fails. Returns the new index name.
+    """
+    existing = db[collection].index_information()
+    old = existing.get(retired)
+    if old is None:
+        return db[collection].create_index(keys, **options)
+    db[collection].drop_index(retired)
+    try:
+        return db[collection].create_index(keys, **options)
+    except PyMongoError:
+        restore = {k: v for k, v in old.items() if k not in ("key", "v", "ns")}
+        db[collection].create_index(old["key"], name=retired, **restore)
+        raise
+
+
+def ensure_indexes(db, registry=None, strict=True, retire=True):
+    """
+    Create all registered indexes (no-op for ones that already exist), then drop
+    retired indexes whose replacement now exists. Returns a list of
+    "collection.index_name" strings that were applied. With strict=False an
+    index that cannot be built (e.g. duplicates under a unique index) is logged
+    and skipped, and the index it replaces is kept. retire=False leaves retired
+    indexes alone (only create_index calls).
+    """
+    registry = registry or INDEXES
+    applied = []
+    for collection, specs in registry.items():
+        replacing = {new: old for old, new in RETIRED_INDEXES.get(collection, {}).items()} if retire else {}
+        for keys, options in specs:
+            try:
+                try:
+                    name = db[collection].create_index(keys, **options)
+                except OperationFailure as exc:
+                    if exc.code not in INDEX_CONFLICT_CODES or options.get("name") not in replacing:
+                        raise
+                    name = _replace_retired(db, collection, keys, options, replacing[options["name"]])
+            except PyMongoError:
+                if strict:
+                    raise
+                logger.exception("Could not create index %s.%s", collection, options.get("name"))
+                continue
+            applied.append(f"{collection}.{name}")
+
+    if retire:
+        for collection, retired in RETIRED_INDEXES.items():
+            if collection not in registry:
+                continue
+            try:
+                existing = db[collection].index_information()
+                for old, new in retired.items():
+                    if old in existing and new in existing:
+                        db[collection].drop_index(old)
+            except PyMongoError:
+                if strict:
+                    raise
+                logger.exception("Could not drop retired indexes on %s", collection)
+    return applied
+
+
+def duplicate_values(db, collection, field, limit=20):
+    """Values of `field` held by more than one document (they block a unique index)."""
+    return [d["_id"] for d in db[collection].aggregate([
+        {"$match": {field: HAS_ID}},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ])]
+
+
+def ensure_indexes_at_startup(db):
+    """
+    What the app runs when it starts (ENSURE_INDEXES_ON_STARTUP): only the
+    create_index calls of the registry, which are cheap no-ops once the indexes
+    exist and safe to run from every worker at once. Dropping retired indexes
+    and the booking backfills are left to scripts/ensure_indexes.py. Never
+    raises; failures are logged as errors. Returns True when every index exists.
+    """
+    try:
+        expected = sum(len(specs) for specs in INDEXES.values())
+        applied = ensure_indexes(db, strict=False, retire=False)
+    except Exception:
+        logger.exception("Startup index check failed; run scripts/ensure_indexes.py")
+        return False
+    if len(applied) < expected:
+        logger.error(
+            "Startup index check: %d of %d indexes could not be built; "
+            "run scripts/ensure_indexes.py for details", expected - len(applied), expected,
+        )
+        return False
+    return True
@@ -1,15 +1,45 @@
 from datetime import datetime
 
-def insert_payment(db, booking_id, order_id, payment_id, signature, amount, status, raw_response, webhook_verified=False):
-    payment = {
-        "booking_id": booking_id,
-        "order_id": order_id,
-        "payment_id": payment_id,
-        "signature": signature,
-        "amount": amount,
-        "status": status,
-        "created_at": datetime.utcnow(),
-        "raw_response": raw_response,
-        "webhook_verified": webhook_verified
-    }
-    db.payments.insert_one(payment)
+from pymongo.errors import DuplicateKeyError
+
+
+def upsert_payment(db, payment_id, fields, insert_fields=None, session=None):
+    """
+    Set `fields` on the payments document of `payment_id`, creating it (with
+    `insert_fields` as well) when there is none: one write, idempotent per
+    payment. Relies on the unique payment_id index; when a concurrent write
+    inserted the same payment first, the update is repeated without upsert.
+    """
+    on_insert = dict(insert_fields or {}, created_at=datetime.utcnow())
+    for key in fields:
+        on_insert.pop(key, None)
+    try:
+        return db.payments.update_one(
+            {"payment_id": payment_id},
+            {"$set": fields, "$setOnInsert": on_insert},
+            upsert=True,
+            session=session,
+        )
+    except DuplicateKeyError:
+        if session is not None:
+            # The transaction is aborted; with_transaction decides about retrying
+            raise
+        return db.payments.update_one({"payment_id": payment_id}, {"$set": fields})
+
+
+def insert_payment(db, booking_id, order_id, payment_id, signature, amount, status, raw_response, webhook_verified=False, session=None):
+    """Record a verified payment for a booking (an existing document of the payment, e.g. from the webhook, is updated)."""
+    return upsert_payment(
+        db,
+        payment_id,
+        {
+            "booking_id": booking_id,
+            "order_id": order_id,
+            "signature": signature,
+            "amount": amount,
+            "status": status,
+            "raw_response": raw_response,
+        },
+        {"webhook_verified": webhook_verified},
+        session=session,
+    )
@@ -9,3 +9,29 @@ def ensure_rafts_for_date_slot(db, date, slot, rafts_per_slot, capacity):
             to_create.append({'day': date, 'slot': slot, 'raft_id': rid, 'occupancy': 0, 'is_special': False, 'capacity': capacity})
     if to_create:
         db.rafts.insert_many(to_create)
+
+
+def ensure_rafts_for_dates(db, dates, slots, rafts_per_slot, capacity):
+    """
+    ensure_rafts_for_date_slot for every (date, slot) pair at once:
+    one query for the raft ids that already exist and one insert_many for the gaps.
+    """
+    if not dates or not slots:
+        return
+    existing = {}
+    for r in db.rafts.find(
+        {'day': {'$in': list(dates)}, 'slot': {'$in': list(slots)}},
+        {'_id': 0, 'day': 1, 'slot': 1, 'raft_id': 1},
+    ):
+        existing.setdefault((r.get('day'), r.get('slot')), set()).add(r.get('raft_id'))
+    to_create = []
+    for date in dates:
+        for slot in slots:
+            existing_ids = existing.get((date, slot), set())
+            if len(existing_ids) >= rafts_per_slot:
+                continue
+            for rid in range(1, rafts_per_slot + 1):
+                if rid not in existing_ids:
+                    to_create.append({'day': date, 'slot': slot, 'raft_id': rid, 'occupancy': 0, 'is_special': False, 'capacity': capacity})
+    if to_create:
+        db.rafts.insert_many(to_create)
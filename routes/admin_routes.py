@@ -1,10 +1,21 @@
 from bson.objectid import ObjectId
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from utils.allocation_logic import load_settings
-from utils.booking_ops import cancel_booking, postpone_booking
+from utils.booking_ops import cancel_booking, cancel_bookings, postpone_booking, delete_bookings_for_dates, reschedule_closed_slots
 from utils.settings_manager import invalidate_settings_cache, refresh_settings_cache, regenerate_rafts_for_settings_change
-from models.booking_model import update_booking_status
+from models.booking_model import (
+    update_booking_status, reindex_booking_slot_order, to_rows,
+    DASHBOARD_PROJECTION, CALENDAR_PROJECTION, OCCUPANCY_PROJECTION,
+)
+from utils.admin_queries import (
+    fetch_dashboard_page, fetch_calendar_entries, fetch_calendar_summary, iter_dashboard_rows, clamp_page_size,
+    fetch_dashboard_delta, search_bookings, DEFAULT_PAGE_SIZE, SEARCH_LIMIT, MAX_SEARCH_LIMIT,
+)
+from utils.occupancy import iter_occupancy_detail, iter_occupancy_by_date
+from utils.daily_stats import record_booking_change, fetch_daily_stats
+from utils.exports import stream_csv, booking_export_row, iter_manifest_rows, BOOKING_EXPORT_HEADER, MANIFEST_HEADER
+import json
 import datetime
 
 from datetime import timezone, timedelta
@@ -47,99 +58,82 @@ def subadmin_or_admin_required(f):
         return f(*args, **kwargs)
     return decorated
 
-def _booking_sort_key(booking, time_slots):
-    """Sort key for All Bookings: date ASC, then slot by configured time order, then created_at DESC."""
-    date_val = booking.get('date') or ''
-    slot = booking.get('slot') or ''
-    try:
-        slot_index = time_slots.index(slot) if slot in time_slots else len(time_slots)
-    except (ValueError, TypeError):
-        slot_index = len(time_slots)
-    created = booking.get('created_at')
-    created_ts = created.timestamp() if hasattr(created, 'timestamp') and created else 0
-    return (date_val, slot_index, -created_ts)
+def _decorate_booking(booking):
+    """
+    Add display fields used by the admin booking tables to a BookingRow.
+    Money columns (total / advance / balance) already come from the aggregation.
+    """
+    booking.created_at_ist = utc_to_ist(booking.created_at)
+    paid = str(booking.payment_status or '').lower() == 'paid'
+    booking.payment_status_display = 'Paid' if paid else 'Not paid'
+    return booking
+
+
+# Occupancy ranges longer than this are streamed rather than built as one dict
+OCCUPANCY_STREAM_DAYS = 31
+
+
+def _stream_json_object(items):
+    """Serialise (key, value) pairs as one JSON object, a pair per chunk."""
+    yield '{'
+    first = True
+    for key, value in items:
+        yield ('' if first else ',') + json.dumps(key) + ':' + json.dumps(value)
+        first = False
+    yield '}'
+
+
+def _booking_row_json(booking):
+    """JSON-safe admin table row for a decorated booking."""
+    return {
+        'id': str(booking['_id']),
+        'user_name': booking.get('user_name') or booking.get('name') or '',
+        'phone': booking.get('phone') or '',
+        'email': booking.get('email') or '',
+        'date': booking.get('date') or '',
+        'slot': booking.get('slot') or '',
+        'slot_index': booking.get('slot_index'),
+        'created_at_ist': booking.get('created_at_ist', ''),
+        'group_size': booking.get('group_size'),
+        'raft_allocations': booking.get('raft_allocations') or [],
+        'payment_status_display': booking.get('payment_status_display'),
+        'balance_amount': booking.get('balance_amount', 0),
+        'status': booking.get('status') or '',
+    }
+
+
+def _fetch_booking_row(db, booking_oid, settings=None):
+    """Current admin table row (with money fields) for one booking, or None."""
+    docs, _, _ = fetch_dashboard_page(db, {'_id': booking_oid}, settings or load_settings(db),
+                                      page_size=None, projection=DASHBOARD_PROJECTION, with_totals=False)
+    rows = to_rows(docs)
+    return _booking_row_json(_decorate_booking(rows[0])) if rows else None
+
+
+def _subadmin_booking_filter(args):
+    """Sub-admins only ever see confirmed bookings for today and tomorrow (optionally one slot)."""
+    today = datetime.date.today()
+    query_filter = {
+        'date': {'$in': [today.isoformat(), (today + datetime.timedelta(days=1)).isoformat()]},
+        'status': 'Confirmed',
+    }
+    slot_filter = args.get('slot', '').strip()
+    if slot_filter:
+        query_filter['slot'] = slot_filter
+    return query_filter
 
 
-@admin_bp.route('/dashboard')
-@login_required
-@subadmin_or_admin_required
-def dashboard():
-    db = current_app.mongo.db
-    settings = load_settings(db)
-    time_slots = settings.get('time_slots') or []
-    # Build query filter for bookings list (filters apply only to bookings)
+def _admin_booking_filter(args):
+    """
+    Build the admin bookings filter from query params (from, to, slot, status).
+    Returns (query_filter, from_date, to_date, slot_filter, status_filter, errors).
+    """
     query_filter = {"status": {"$in": ["Confirmed", "Pending", "paid"]}}
-
-    # DB sort: date and created_at; slot order applied in Python using configured time_slots
-    sort_order = [('date', 1), ('created_at', -1)]
-
-    # If subadmin, do not apply user-supplied filters — show Confirmed bookings for today and tomorrow separately
-    if current_user.is_subadmin():
-        today = datetime.date.today().isoformat()
-        tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
-        
-        # Get slot filter from query params if provided
-        slot_filter = request.args.get('slot', '').strip()
-
-        # Build query filters for today and tomorrow
-        today_filter = {'date': today, 'status': 'Confirmed'}
-        tomorrow_filter = {'date': tomorrow, 'status': 'Confirmed'}
-        
-        # Apply slot filter if provided
-        if slot_filter:
-            today_filter['slot'] = slot_filter
-            tomorrow_filter['slot'] = slot_filter
-
-        from utils.amount_calculator import calculate_total_amount
-
-        # Fetch Today's Bookings and sort by date then slot order
-        bookings_today = list(db.bookings.find(today_filter).sort(sort_order))
-        bookings_today.sort(key=lambda b: _booking_sort_key(b, time_slots))
-        for b in bookings_today:
-            b['created_at_ist'] = utc_to_ist(b.get('created_at'))
-            # Compute pricing / payment summary per booking
-            amt = calculate_total_amount(settings, b.get('date'), int(b.get('group_size', 0) or 0))
-            total = amt.get('total_amount', b.get('amount', 0) or 0)
-            advance = amt.get('advance_amount', 0)
-            b['total_amount'] = total
-            b['advance_amount'] = advance
-            b['advance_percent'] = amt.get('advance_percent', 0)
-            paid = str(b.get('payment_status', '')).lower() == 'paid'
-            b['payment_status_display'] = 'Paid' if paid else 'Not paid'
-            b['balance_amount'] = max(total - advance, 0) if paid else total
-
-        # Fetch Tomorrow's Bookings and sort by date then slot order
-        bookings_tomorrow = list(db.bookings.find(tomorrow_filter).sort(sort_order))
-        bookings_tomorrow.sort(key=lambda b: _booking_sort_key(b, time_slots))
-        for b in bookings_tomorrow:
-            b['created_at_ist'] = utc_to_ist(b.get('created_at'))
-            amt = calculate_total_amount(settings, b.get('date'), int(b.get('group_size', 0) or 0))
-            total = amt.get('total_amount', b.get('amount', 0) or 0)
-            advance = amt.get('advance_amount', 0)
-            b['total_amount'] = total
-            b['advance_amount'] = advance
-            b['advance_percent'] = amt.get('advance_percent', 0)
-            paid = str(b.get('payment_status', '')).lower() == 'paid'
-            b['payment_status_display'] = 'Paid' if paid else 'Not paid'
-            b['balance_amount'] = max(total - advance, 0) if paid else total
-
-        today_str = datetime.date.today().isoformat()
-        return render_template('admin_dashboard.html',
-                             bookings_today=bookings_today,
-                             bookings_tomorrow=bookings_tomorrow,
-                             is_subadmin=True,
-                             settings=settings,
-                             filter_from=today, # Default views for reference
-                             filter_to=tomorrow,
-                             filter_slot=slot_filter,
-                             filter_status='',
-                             today_str=today_str)
-
-    # For admin: Read filter params from query string
-    from_date = request.args.get('from', '').strip()
-    to_date = request.args.get('to', '').strip()
-    slot_filter = request.args.get('slot', '').strip()
-    status_filter = request.args.get('status', '').strip()
+    errors = []
+    from_date = args.get('from', '').strip()
+    to_date = args.get('to', '').strip()
+    slot_filter = args.get('slot', '').strip()
+    status_filter = args.get('status', '').strip()
 
     # Validate and build date range filter
     if from_date and to_date:
@@ -147,24 +141,24 @@ def dashboard():
             f = datetime.date.fromisoformat(from_date)
             t = datetime.date.fromisoformat(to_date)
             if f > t:
-                flash('From Date must not be later than To Date', 'error')
+                errors.append('From Date must not be later than To Date')
                 # ignore date filters on invalid range
             else:
                 query_filter['date'] = {'$gte': from_date, '$lte': to_date}
         except (ValueError, TypeError):
-            flash('Invalid date format for filters', 'error')
+            errors.append('Invalid date format for filters')
     elif from_date:
         try:
             datetime.date.fromisoformat(from_date)
             query_filter['date'] = {'$gte': from_date}
         except (ValueError, TypeError):
-            flash('Invalid From date', 'error')
+            errors.append('Invalid From date')
     elif to_date:
         try:
             datetime.date.fromisoformat(to_date)
             query_filter['date'] = {'$lte': to_date}
         except (ValueError, TypeError):
-            flash('Invalid To date', 'error')
+            errors.append('Invalid To date')
 
     # If NO date filter is provided for Admin, default to TODAY
     if not from_date and not to_date:
@@ -181,34 +175,54 @@ def dashboard():
     # Status filter
     if status_filter and status_filter.lower() != 'all':
         query_filter['status'] = status_filter
-    elif not status_filter or status_filter.lower() == 'all':
+    else:
         # Remove status filter to show all bookings for date/slot
         query_filter.pop('status', None)
 
-    from utils.amount_calculator import calculate_total_amount
-
-    # Fetch bookings with filters (admin)
-    bookings = list(db.bookings.find(query_filter).sort(sort_order).limit(500))
-    # Sort by filtered date then by configured time-slot order (chronological)
-    bookings.sort(key=lambda b: _booking_sort_key(b, time_slots))
-    for booking in bookings:
-        booking['created_at_ist'] = utc_to_ist(booking.get('created_at'))
-        # Compute pricing and balance per booking for admin table / export
-        amt = calculate_total_amount(settings, booking.get('date'), int(booking.get('group_size', 0) or 0))
-        total = amt.get('total_amount', booking.get('amount', 0) or 0)
-        advance = amt.get('advance_amount', 0)
-        booking['total_amount'] = total
-        booking['advance_amount'] = advance
-        booking['advance_percent'] = amt.get('advance_percent', 0)
-        paid = str(booking.get('payment_status', '')).lower() == 'paid'
-        booking['payment_status_display'] = 'Paid' if paid else 'Not paid'
-        booking['balance_amount'] = max(total - advance, 0) if paid else total
-
-    # Today's date for disabling Cancel/Postpone on past bookings
+    return query_filter, from_date, to_date, slot_filter, status_filter, errors
+
+
+@admin_bp.route('/dashboard')
+@login_required
+@subadmin_or_admin_required
+def dashboard():
+    """
+    Dashboard shell. The booking tables are rendered client-side from the same
+    JSON /admin/api/bookings returns; the first page is embedded in the page so
+    it needs no extra round trip, and the page then polls ?since= for changes.
+    """
+    db = current_app.mongo.db
+    settings = load_settings(db)
     today_str = datetime.date.today().isoformat()
+
+    # If subadmin, do not apply user-supplied filters — show Confirmed bookings for today and tomorrow separately
+    if current_user.is_subadmin():
+        slot_filter = request.args.get('slot', '').strip()
+        initial_bookings = _bookings_payload(db, settings, _subadmin_booking_filter(request.args),
+                                            page_size=None, with_totals=False)
+        return render_template('admin_dashboard.html',
+                             initial_bookings=initial_bookings,
+                             is_subadmin=True,
+                             settings=settings,
+                             filter_from=today_str, # Default views for reference
+                             filter_to=(datetime.date.today() + datetime.timedelta(days=1)).isoformat(),
+                             filter_slot=slot_filter,
+                             filter_status='',
+                             today_str=today_str)
+
+    # For admin: Read filter params from query string
+    query_filter, from_date, to_date, slot_filter, status_filter, errors = _admin_booking_filter(request.args)
+    for message in errors:
+        flash(message, 'error')
+
+    # First page plus range totals in one aggregation; further pages are appended
+    # by the page via /admin/api/bookings
+    initial_bookings = _bookings_payload(db, settings, query_filter)
+
     # Render dashboard with current booking filters (admin)
     return render_template('admin_dashboard.html',
-                         bookings=bookings,
+                         initial_bookings=initial_bookings,
+                         totals=initial_bookings['totals']['range'],
                          is_subadmin=False,
                          settings=settings,
                          filter_from=from_date,
@@ -217,6 +231,213 @@ def dashboard():
                          filter_status=status_filter,
                          today_str=today_str)
 
+
+def _bookings_payload(db, settings, query_filter, cursor=None, page_size=DEFAULT_PAGE_SIZE, with_totals=None):
+    """
+    JSON body shared by the dashboard (embedded first page) and /admin/api/bookings:
+    {bookings, next_cursor, server_time[, totals]}. server_time is the value to
+    send back as ?since= on the next delta refresh. Raises ValueError on a bad cursor.
+    """
+    server_time = datetime.datetime.now(timezone.utc)
+    if with_totals is None:
+        with_totals = cursor is None
+    docs, next_cursor, totals = fetch_dashboard_page(
+        db, query_filter, settings, cursor=cursor, page_size=page_size,
+        projection=DASHBOARD_PROJECTION, with_totals=with_totals,
+    )
+    payload = {
+        'bookings': [_booking_row_json(_decorate_booking(b)) for b in to_rows(docs)],
+        'next_cursor': next_cursor,
+        'server_time': server_time.isoformat(),
+    }
+    if totals is not None:
+        payload['totals'] = totals
+    return payload
+
+
+@admin_bp.route('/api/bookings')
+@login_required
+@subadmin_or_admin_required
+def api_bookings():
+    """
+    Bookings list for the dashboard tables.
+
+    Query params: from, to, slot, status (same as the dashboard; sub-admins are
+    fixed to confirmed bookings for today and tomorrow), cursor, limit.
+    Returns {bookings, next_cursor, server_time}; the admin first page (no
+    cursor) also carries `totals` for the whole filtered range and per date.
+
+    With ?since=<server_time of the previous response> only bookings changed
+    after that instant are returned: {bookings, removed, server_time[, totals]}
+    where `removed` lists ids that no longer match the filter or were deleted.
+    ?until=<next_cursor> limits the rows to the pages the client has loaded.
+    A response with reload=true means too much changed and the client should
+    refetch.
+    """
+    db = current_app.mongo.db
+    settings = load_settings(db)
+    is_subadmin = current_user.is_subadmin()
+    if is_subadmin:
+        query_filter = _subadmin_booking_filter(request.args)
+    else:
+        query_filter, _, _, _, _, errors = _admin_booking_filter(request.args)
+        if errors:
+            return jsonify({'error': errors[0]}), 400
+
+    since = request.args.get('since')
+    if since:
+        try:
+            since_dt = datetime.datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({'error': 'Invalid since timestamp'}), 400
+        if since_dt.tzinfo is not None:
+            # updated_at is stored as naive UTC
+            since_dt = since_dt.astimezone(timezone.utc).replace(tzinfo=None)
+        server_time = datetime.datetime.now(timezone.utc)
+        try:
+            rows, removed, complete = fetch_dashboard_delta(db, query_filter, settings, since_dt, DASHBOARD_PROJECTION,
+                                                            until=request.args.get('until') or None)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not complete:
+            return jsonify({'reload': True, 'server_time': server_time.isoformat()})
+        payload = {
+            'bookings': [_booking_row_json(_decorate_booking(b)) for b in to_rows(rows)],
+            'removed': [str(oid) for oid in removed],
+            'server_time': server_time.isoformat(),
+        }
+        if (rows or removed) and not is_subadmin:
+            _, _, totals = fetch_dashboard_page(db, query_filter, settings, page_size=1,
+                                                projection={'_id': 1}, with_totals=True)
+            payload['totals'] = totals
+        return jsonify(payload)
+
+    cursor = request.args.get('cursor') or None
+    try:
+        payload = _bookings_payload(
+            db, settings, query_filter, cursor=cursor,
+            page_size=clamp_page_size(request.args.get('limit')),
+            with_totals=cursor is None and not is_subadmin,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(payload)
+
+@admin_bp.route('/api/search')
+@login_required
+@subadmin_or_admin_required
+def api_search():
+    """
+    Front-desk booking lookup. ?q= is a name prefix, phone number (any format),
+    email, booking id or Razorpay order_/pay_ id; ?limit= caps results (max 50).
+    Returns {kind, results: [...]}, best matches first. Sub-admins only find the
+    bookings their dashboard shows (confirmed, today and tomorrow).
+    """
+    db = current_app.mongo.db
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', SEARCH_LIMIT)), MAX_SEARCH_LIMIT))
+    except (TypeError, ValueError):
+        limit = SEARCH_LIMIT
+
+    scope = _subadmin_booking_filter({}) if current_user.is_subadmin() else None
+    docs, kind = search_bookings(db, q, limit, scope=scope)
+    results = []
+    for b in to_rows(docs):
+        _decorate_booking(b)
+        results.append({
+            'id': str(b._id),
+            'user_name': b.user_name or b.name or '',
+            'phone': b.phone or '',
+            'email': b.email or '',
+            'date': b.date,
+            'slot': b.slot,
+            'group_size': b.group_size,
+            'raft_allocations': b.raft_allocations,
+            'status': b.status,
+            'payment_status_display': b.payment_status_display,
+        })
+    return jsonify({'kind': kind, 'results': results})
+
+@admin_bp.route('/api/analytics')
+@login_required
+@admin_required
+def api_analytics():
+    """
+    Season report from the daily_stats rollups (never scans bookings).
+
+    Query params: from, to (default: the configured season start/end date) and
+    by = date | slot | date_slot (default date).
+    Returns {from, to, by, rows: [...], totals: {...}}.
+    """
+    db = current_app.mongo.db
+    settings = load_settings(db)
+    today = datetime.date.today().isoformat()
+    from_date = request.args.get('from', '').strip() or settings.get('start_date') or today
+    to_date = request.args.get('to', '').strip() or settings.get('end_date') or today
+    by = request.args.get('by', 'date')
+    if by not in ('date', 'slot', 'date_slot'):
+        return jsonify({'error': 'by must be one of date, slot, date_slot'}), 400
+    try:
+        if datetime.date.fromisoformat(from_date) > datetime.date.fromisoformat(to_date):
+            return jsonify({'error': 'From Date must not be later than To Date'}), 400
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+
+    rows, totals = fetch_daily_stats(db, from_date, to_date, by)
+    return jsonify({'from': from_date, 'to': to_date, 'by': by, 'rows': rows, 'totals': totals})
+
+@admin_bp.route('/export/bookings.csv')
+@login_required
+@admin_required
+def export_bookings_csv():
+    """
+    Stream the filtered bookings (same from/to/slot/status params as the dashboard)
+    as CSV, including computed amounts. No row limit.
+    """
+    db = current_app.mongo.db
+    settings = load_settings(db)
+    query_filter, from_date, to_date, _, _, errors = _admin_booking_filter(request.args)
+    if errors:
+        return jsonify({'error': errors[0]}), 400
+
+    docs = iter_dashboard_rows(db, query_filter, settings, projection=DASHBOARD_PROJECTION)
+    rows = (booking_export_row(_decorate_booking(b)) for b in to_rows(docs))
+    filename = f'bookings_{from_date or "start"}_{to_date or "end"}.csv'
+    return Response(
+        stream_with_context(stream_csv(BOOKING_EXPORT_HEADER, rows)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@admin_bp.route('/export/manifest.csv')
+@login_required
+@subadmin_or_admin_required
+def export_manifest_csv():
+    """
+    Stream the guide manifest (raft -> guests and headcount) for ?date= (default
+    today) and optional ?slot=. Sub-admins are limited to today and tomorrow.
+    """
+    db = current_app.mongo.db
+    today = datetime.date.today()
+    qdate = request.args.get('date', '').strip() or today.isoformat()
+    slot = request.args.get('slot', '').strip() or None
+    try:
+        manifest_date = datetime.date.fromisoformat(qdate)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    if current_user.is_subadmin() and manifest_date not in (today, today + datetime.timedelta(days=1)):
+        return jsonify({'error': 'Sub-admins can only export manifests for today or tomorrow'}), 403
+
+    rows = iter_manifest_rows(db, qdate, slot)
+    return Response(
+        stream_with_context(stream_csv(MANIFEST_HEADER, rows)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="manifest_{qdate}.csv"'},
+    )
+
 @admin_bp.route('/calendar')
 @login_required
 @admin_required  # Only admin, not subadmin
@@ -251,11 +472,16 @@ def calendar():
         today = datetime.date.today()
         dates = [(today + datetime.timedelta(days=i)).isoformat() for i in range(days)]
     
-    calendar = {}
-    for d in dates:
-        entries = list(db.bookings.find({'date': d}).sort('created_at', -1))
-        calendar[d] = entries
-    return render_template('admin_calendar.html', calendar=calendar, settings=settings)
+    # One query for the whole window regardless of its length
+    if request.args.get('mode') == 'summary':
+        summary = fetch_calendar_summary(db, dates)
+        return render_template('admin_calendar.html', summary=summary, mode='summary', settings=settings)
+
+    calendar = {
+        d: to_rows(entries)
+        for d, entries in fetch_calendar_entries(db, dates, CALENDAR_PROJECTION).items()
+    }
+    return render_template('admin_calendar.html', calendar=calendar, mode='detail', settings=settings)
 
 @admin_bp.route('/bookings/<booking_id>/status', methods=['POST'])
 @login_required
@@ -270,7 +496,10 @@ def change_status(booking_id):
             raft_ids = [int(x.strip()) for x in raft_ids_raw.split(',') if x.strip()]
         except:
             raft_ids = []
+    before = db.bookings.find_one({'_id': ObjectId(booking_id)})
     update_booking_status(db, booking_id, status, raft_allocations=raft_ids if raft_ids else None)
+    if before:
+        record_booking_change(db, before, db.bookings.find_one({'_id': before['_id']}))
     flash('Booking updated', 'success')
     return redirect(url_for('admin.dashboard'))
 
@@ -410,6 +639,10 @@ def settings_page():
         
         # Regenerate rafts if needed
         changes = regenerate_rafts_for_settings_change(db, old_settings, data)
+
+        # Keep the stored slot order on bookings in sync with the configured slot order
+        if old_settings.get('time_slots', []) != data['time_slots']:
+            reindex_booking_slot_order(db, data['time_slots'])
         
         # Build success message
         messages = ['✅ Settings updated successfully!']
@@ -441,6 +674,20 @@ def api_get_settings():
     refresh_settings_cache(current_app, db)
     return jsonify(settings)
 
+def _audit_entry(action, **fields):
+    """admin_audit_logs document for the current admin (counts and timestamp are added by the caller)."""
+    admin_id = None
+    try:
+        admin_id = current_user.get_id()
+    except Exception:
+        admin_id = getattr(current_user, 'id', None) or getattr(current_user, '_id', None) or getattr(current_user, 'email', None)
+    return dict({
+        'action': action,
+        'admin_id': str(admin_id),
+        'admin_repr': getattr(current_user, 'email', '') or getattr(current_user, 'username', '') or str(admin_id),
+    }, **fields)
+
+
 @admin_bp.route('/delete_bookings_by_date', methods=['DELETE'])
 @login_required
 @admin_required  # Only admin, not subadmin
@@ -459,79 +706,14 @@ def delete_bookings_by_date():
     except ValueError:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    # Find all bookings for the date
-    bookings = list(db.bookings.find({'date': date}))
-    
-    if not bookings:
-        return jsonify({'message': f'No bookings found for {date}'}), 200
-    
-    # Free up raft occupancy for confirmed bookings using allocation pattern logic
-    from utils.booking_ops import cancel_booking, get_deallocation_amounts
-    from bson.objectid import ObjectId
-    
-    freed_count = 0
-    for booking in bookings:
-        if booking.get('status') == 'Confirmed' and booking.get('raft_allocations'):
-            # Use the same deallocation logic as cancel_booking
-            raft_ids = booking.get('raft_allocations', [])
-            group_size = int(booking.get('group_size', 0))
-            booking_date = booking.get('date')
-            booking_slot = booking.get('slot')
-            
-            if raft_ids and group_size > 0:
-                # Get deallocation amounts using allocation pattern logic
-                deallocations = get_deallocation_amounts(db, booking_date, booking_slot, group_size, raft_ids)
-                
-                # Apply deallocation to each raft following allocation pattern rules
-                for raft_id, amount_to_remove in deallocations:
-                    raft = db.rafts.find_one({'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id})
-                    if not raft:
-                        continue
-                    
-                    current_occupancy = max(0, raft.get('occupancy', 0))
-                    new_occupancy = max(0, current_occupancy - amount_to_remove)
-                    
-                    # Build update following allocation pattern rules
-                    update_data = {'$set': {'occupancy': new_occupancy}}
-                    
-                    # Clear is_special flag following allocation logic rules
-                    if new_occupancy == 0:
-                        update_data['$set']['is_special'] = False
-                    elif new_occupancy != 7:
-                        update_data['$set']['is_special'] = False
-                    
-                    db.rafts.update_one(
-                        {'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id},
-                        update_data
-                    )
-                
-                freed_count += 1
-    
-    # Delete all bookings for the date
-    result = db.bookings.delete_many({'date': date})
-    deleted_count = result.deleted_count
-    
-    # Clean up all rafts for this date: reset negative occupancy, clear special flags for empty rafts
-    # Fix any negative occupancy values (should never happen, but safety check)
-    db.rafts.update_many(
-        {'day': date, 'occupancy': {'$lt': 0}},
-        {'$set': {'occupancy': 0, 'is_special': False}}
+    # Deleted in _id batches; each booking's seats are given back with $inc
+    deleted_count, freed_count = delete_bookings_for_dates(
+        db, date,
+        audit=_audit_entry('delete_bookings_by_date', date=date),
+        use_transaction=current_app.config.get('MONGO_TRANSACTIONS', False),
     )
-    
-    # Clear is_special flag and ensure occupancy is 0 for all rafts on this date with 0 or negative occupancy
-    db.rafts.update_many(
-        {'day': date, '$or': [{'occupancy': {'$lte': 0}}, {'occupancy': {'$exists': False}}]},
-        {'$set': {'occupancy': 0, 'is_special': False}}
-    )
-    
-    # Double-check: If no bookings exist for this date, reset all rafts to clean state
-    remaining_bookings = db.bookings.count_documents({'date': date})
-    if remaining_bookings == 0:
-        # Reset all rafts for this date to clean state
-        db.rafts.update_many(
-            {'day': date},
-            {'$set': {'occupancy': 0, 'is_special': False}}
-        )
+    if not deleted_count:
+        return jsonify({'message': f'No bookings found for {date}'}), 200
     
     return jsonify({
         'message': f'Successfully deleted {deleted_count} booking(s) for {date}. Freed occupancy from {freed_count} confirmed booking(s).',
@@ -589,71 +771,16 @@ def delete_records_by_date_range():
         # If settings dates malformed, deny to be safe
         return jsonify({'error': 'System date configuration invalid; aborting deletion'}), 400
 
-    # Fetch bookings in range
-    bookings_cursor = db.bookings.find({'date': {'$gte': from_date, '$lte': to_date}})
-    bookings = list(bookings_cursor)
-    if not bookings:
+    # Deleted in _id batches across the whole range, audited once
+    deleted_count, freed_count = delete_bookings_for_dates(
+        db, {'$gte': from_date, '$lte': to_date},
+        audit=_audit_entry('delete_records_by_date_range', from_date=from_date, to_date=to_date),
+        use_transaction=current_app.config.get('MONGO_TRANSACTIONS', False),
+        settings=settings,
+    )
+    if not deleted_count:
         return jsonify({'message': f'No bookings found between {from_date} and {to_date}', 'deleted_count': 0}), 200
 
-    # Use booking_ops deallocation to free raft occupancy for confirmed bookings
-    from utils.booking_ops import get_deallocation_amounts
-    freed_count = 0
-    for booking in bookings:
-        if booking.get('status') == 'Confirmed' and booking.get('raft_allocations'):
-            raft_ids = booking.get('raft_allocations', [])
-            group_size = int(booking.get('group_size', 0) or 0)
-            booking_date = booking.get('date')
-            booking_slot = booking.get('slot')
-            if raft_ids and group_size > 0:
-                try:
-                    deallocations = get_deallocation_amounts(db, booking_date, booking_slot, group_size, raft_ids)
-                    for raft_id, amount_to_remove in deallocations:
-                        raft = db.rafts.find_one({'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id})
-                        if not raft:
-                            continue
-                        current_occupancy = max(0, raft.get('occupancy', 0))
-                        new_occupancy = max(0, current_occupancy - amount_to_remove)
-                        update_data = {'$set': {'occupancy': new_occupancy}}
-                        if new_occupancy == 0:
-                            update_data['$set']['is_special'] = False
-                        elif new_occupancy != 7:
-                            update_data['$set']['is_special'] = False
-                        db.rafts.update_one({'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id}, update_data)
-                    freed_count += 1
-                except Exception:
-                    # continue on failure for individual bookings
-                    continue
-
-    # Delete bookings in range
-    res = db.bookings.delete_many({'date': {'$gte': from_date, '$lte': to_date}})
-    deleted_count = res.deleted_count
-
-    # Post-cleanup of rafts (safety)
-    db.rafts.update_many({'day': {'$gte': from_date, '$lte': to_date}, 'occupancy': {'$lt': 0}}, {'$set': {'occupancy': 0, 'is_special': False}})
-    db.rafts.update_many({'day': {'$gte': from_date, '$lte': to_date}, '$or': [{'occupancy': {'$lte': 0}}, {'occupancy': {'$exists': False}}]}, {'$set': {'occupancy': 0, 'is_special': False}})
-
-    # Audit log
-    try:
-        admin_id = None
-        try:
-            admin_id = current_user.get_id()
-        except Exception:
-            admin_id = getattr(current_user, 'id', None) or getattr(current_user, '_id', None) or getattr(current_user, 'email', None)
-        audit = {
-            'action': 'delete_records_by_date_range',
-            'admin_id': str(admin_id),
-            'admin_repr': getattr(current_user, 'email', '') or getattr(current_user, 'username', '') or str(admin_id),
-            'from_date': from_date,
-            'to_date': to_date,
-            'deleted_count': deleted_count,
-            'freed_confirmed_bookings': freed_count,
-            'timestamp': datetime.datetime.utcnow()
-        }
-        db.admin_audit_logs.insert_one(audit)
-    except Exception:
-        # do not fail the operation if logging fails
-        pass
-
     return jsonify({'message': f'Successfully deleted {deleted_count} booking(s) between {from_date} and {to_date}. Freed occupancy from {freed_count} confirmed booking(s).', 'deleted_count': deleted_count}), 200
 
 @admin_bp.route('/occupancy_data')
@@ -712,47 +839,45 @@ def occupancy_data():
 @login_required
 @admin_required
 def occupancy_by_date():
+    """
+    Raft occupancy grouped by day -> slot. Accepts ?day=YYYY-MM-DD or a
+    ?from=&to= range; with neither it covers the whole history. The grouping
+    runs in MongoDB and the JSON is streamed one day at a time.
+    """
+    from datetime import date as _date
     from models.raft_model import ensure_rafts_for_date_slot
     db = current_app.mongo.db
     settings = load_settings(db)
     rafts_per_slot = settings.get('rafts_per_slot', 5)
     capacity = settings.get('capacity', 6)
     qday = request.args.get('day')
-    rafts_query = {'day': qday} if qday else {}
-    
+    from_date = request.args.get('from', '').strip() or None
+    to_date = request.args.get('to', '').strip() or None
+    if qday:
+        from_date = to_date = qday
+
+    try:
+        for d in (from_date, to_date):
+            if d:
+                _date.fromisoformat(d)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    if from_date and to_date and from_date > to_date:
+        return jsonify({'error': 'From Date must not be later than To Date'}), 400
+
     # If a specific day is requested, ensure rafts exist for all slots
     if qday:
         slots = settings.get('time_slots', [])
         for slot in slots:
             ensure_rafts_for_date_slot(db, qday, slot, rafts_per_slot, capacity)
-    
-    rafts = list(db.rafts.find(rafts_query).sort([('day',1), ('slot',1), ('raft_id',1)]))
-    grouped = {}
-    for r in rafts:
-        day = r.get('day', 'Unknown')
-        slot = r.get('slot', 'Unknown')
-        
-        # Initialize day and slot in grouped if not exists
-        if day not in grouped:
-            grouped[day] = {}
-        if slot not in grouped[day]:
-            grouped[day][slot] = []
-        
-        # Only add rafts up to the configured limit per slot
-        if len(grouped[day][slot]) < rafts_per_slot:
-            grouped[day][slot].append({
-                'raft_id': r.get('raft_id', '?'),
-                'occupancy': max(0, r.get('occupancy', 0)),
-                'capacity': capacity
-            })
-    return jsonify(grouped)
+
+    days = iter_occupancy_by_date(db, rafts_per_slot, capacity, from_date, to_date)
+    return Response(stream_with_context(_stream_json_object(days)), mimetype='application/json')
 
 @admin_bp.route('/occupancy_detail')
 @login_required
 @subadmin_or_admin_required
 def occupancy_detail():
-    from datetime import date as _date, timedelta
-
     try:
         db = current_app.mongo.db
         settings = load_settings(db)
@@ -789,120 +914,18 @@ def occupancy_detail():
             cur = cur + timedelta(days=1)
 
         # Ensure rafts exist for all slots with current settings for allowed dates
-        from models.raft_model import ensure_rafts_for_date_slot
-        for date_str in allowed_dates:
-            for slot in slots:
-                ensure_rafts_for_date_slot(db, date_str, slot, rafts_per_slot, capacity)
-
-        # Prepare bookings_by_slot_by_date (only for display of booking details related to rafts)
-        bookings_by_slot = {}
-        # Only show bookings that are actually confirmed; pending / cancelled
-        # bookings should not be counted in the occupancy overview.
-        for b in db.bookings.find(
-            {
-                'date': {'$gte': from_date, '$lte': to_date},
-                'status': 'Confirmed'
-            }
-        ):
-            s = b.get('slot')
-            date_key = b.get('date')
-            bookings_by_slot.setdefault(date_key, {}).setdefault(s, []).append(b)
+        from models.raft_model import ensure_rafts_for_dates
+        ensure_rafts_for_dates(db, allowed_dates, slots, rafts_per_slot, capacity)
 
-        # Build result grouped by date -> slot -> raft_list
+        # Build result grouped by date -> slot -> raft_list.
         # IMPORTANT: Occupancy must be derived **only from confirmed bookings**,
         # not from raw raft occupancy, so that "pending" / unpaid bookings do not
         # appear as booked seats in the admin Occupancy Overview.
-        result = {}
-        for date_str in allowed_dates:
-            result[date_str] = {}
-            for slot in slots:
-                # Fetch configured rafts for this date/slot
-                rafts = list(
-                    db.rafts.find({'day': date_str, 'slot': slot})
-                    .sort('raft_id', 1)
-                    .limit(rafts_per_slot)
-                )
-
-                # All confirmed bookings for this date+slot (prepared above)
-                slot_bookings = bookings_by_slot.get(date_str, {}).get(slot, [])
-
-                # Compute confirmed occupancy per raft_id from bookings only.
-                # This ensures that "pending" bookings (which may still have
-                # provisional raft allocations) do NOT contribute to occupancy.
-                occupancy_by_raft = {}
-                for b in slot_bookings:
-                    group_size = int(b.get('group_size', 0) or 0)
-                    if group_size <= 0:
-                        continue
-
-                    details = b.get('raft_allocation_details') or []
-                    allocations = b.get('raft_allocations') or []
-
-                    if details:
-                        # Preferred path: we know exactly how many seats were placed in each raft
-                        for entry in details:
-                            try:
-                                rid = int(entry.get('raft_id'))
-                                count = int(entry.get('count', 0) or 0)
-                            except Exception:
-                                continue
-                            if count <= 0:
-                                continue
-                            occupancy_by_raft[rid] = occupancy_by_raft.get(rid, 0) + count
-                    elif allocations:
-                        # Fallback: distribute group_size evenly across allocated rafts
-                        try:
-                            raft_ids = [int(rid) for rid in allocations]
-                        except Exception:
-                            continue
-                        if not raft_ids:
-                            continue
-                        per = group_size // len(raft_ids)
-                        rem = group_size % len(raft_ids)
-                        for idx, rid in enumerate(raft_ids):
-                            add = per + (1 if idx < rem else 0)
-                            if add <= 0:
-                                continue
-                            occupancy_by_raft[rid] = occupancy_by_raft.get(rid, 0) + add
-
-                # Build raft list using computed confirmed occupancy
-                raft_list = []
-                for r in rafts:
-                    rid = r.get('raft_id')
-                    try:
-                        rid_int = int(rid)
-                    except Exception:
-                        rid_int = None
-
-                    confirmed_occupancy = max(
-                        0,
-                        occupancy_by_raft.get(rid_int, 0) if rid_int is not None else 0,
-                    )
-
-                    # Mark special rafts only when they actually hold 7 confirmed seats
-                    is_special = confirmed_occupancy == 7
-
-                    raft_bookings = []
-                    for b in slot_bookings:
-                        if b.get('raft_allocations') and rid_int in b.get('raft_allocations', []):
-                            raft_bookings.append({
-                                'id': str(b['_id']),
-                                'name': b.get('user_name') or b.get('name') or '',
-                                'email': b.get('email',''),
-                                'group_size': b.get('group_size'),
-                                'status': b.get('status')
-                            })
-
-                    raft_list.append({
-                        'raft_id': rid,
-                        'occupancy': confirmed_occupancy,
-                        'capacity': capacity,
-                        'is_special': is_special,
-                        'bookings': raft_bookings
-                    })
-
-                result[date_str][slot] = raft_list[:rafts_per_slot]
-
+        days = iter_occupancy_detail(db, allowed_dates, slots, rafts_per_slot, capacity, OCCUPANCY_PROJECTION)
+        if len(allowed_dates) > OCCUPANCY_STREAM_DAYS:
+            # Long ranges are written out one day at a time instead of built in memory
+            return Response(stream_with_context(_stream_json_object(days)), mimetype='application/json')
+        result = dict(days)
         return jsonify(result)
     except Exception as e:
         current_app.logger.error(f'[ERROR] occupancy_detail: {str(e)}')
@@ -919,6 +942,97 @@ def cancel_booking_route(booking_id):
         return jsonify({'error': 'Invalid booking id'}), 400
     print('Cancel called for', booking_id)
     res = cancel_booking(db, oid)
+    if 'error' not in res:
+        # Updated row so the dashboard can redraw it in place
+        res['booking'] = _fetch_booking_row(db, oid)
+    return jsonify(res)
+
+# Upper bound on ids accepted by one bulk cancel request
+MAX_BULK_CANCEL = 500
+
+@admin_bp.route('/cancel_bookings', methods=['POST'])
+@login_required
+@admin_required  # Only admin, not subadmin
+def cancel_bookings_route():
+    """
+    Cancel many bookings in one request (e.g. a trip called off).
+
+    Request JSON: { "booking_ids": ["...", ...] }
+    Returns {cancelled, results: [{id, message | error}, ...]} in request order;
+    ids that are malformed or missing get an error entry, the rest are cancelled.
+    """
+    db = current_app.mongo.db
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    booking_ids = data.get('booking_ids')
+    if not isinstance(booking_ids, list) or not booking_ids:
+        return jsonify({'error': 'booking_ids must be a non-empty list'}), 400
+    if len(booking_ids) > MAX_BULK_CANCEL:
+        return jsonify({'error': f'At most {MAX_BULK_CANCEL} bookings can be cancelled at once'}), 400
+
+    parsed = []
+    for booking_id in booking_ids:
+        try:
+            parsed.append((booking_id, ObjectId(str(booking_id))))
+        except Exception:
+            parsed.append((booking_id, None))
+    res = cancel_bookings(db, [oid for _, oid in parsed if oid is not None])
+    by_id = {r['id']: r for r in res['results']}
+    results = []
+    for booking_id, oid in parsed:
+        results.append(by_id[str(oid)] if oid is not None else {'id': str(booking_id), 'error': 'Invalid booking id'})
+    current_app.logger.info("Bulk cancel: %d of %d booking(s) cancelled", res['cancelled'], len(booking_ids))
+    return jsonify({'cancelled': res['cancelled'], 'results': results})
+
+@admin_bp.route('/reschedule_closure', methods=['POST'])
+@login_required
+@admin_required  # Only admin, not subadmin
+def reschedule_closure_route():
+    """
+    Move every confirmed booking off a closed slot (or a whole closed date).
+
+    Request JSON: { "date": "YYYY-MM-DD", "slot": optional, "target_dates": [..] optional,
+                    "target_slots": [..] optional, "dry_run": bool }
+    Returns {moved, unplaced, dry_run}; see utils.booking_ops.reschedule_closed_slots.
+    """
+    db = current_app.mongo.db
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    date = (data.get('date') or '').strip()
+    slot = (data.get('slot') or '').strip() or None
+    target_dates = data.get('target_dates') or None
+    target_slots = data.get('target_slots') or None
+    if not date:
+        return jsonify({'error': 'date is required'}), 400
+
+    settings = load_settings(db)
+    time_slots = settings.get('time_slots', [])
+    try:
+        for d in [date] + list(target_dates or []):
+            datetime.date.fromisoformat(d)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    for s in ([slot] if slot else []) + list(target_slots or []):
+        if s not in time_slots:
+            return jsonify({'error': f'Invalid time slot. Valid slots: {", ".join(time_slots)}'}), 400
+
+    res = reschedule_closed_slots(db, date, slot, target_dates=target_dates, target_slots=target_slots,
+                                  dry_run=bool(data.get('dry_run')))
+    if 'error' in res:
+        return jsonify(res), 400
+    if res['moved'] and not res['dry_run']:
+        try:
+            db.admin_audit_logs.insert_one(dict(
+                _audit_entry('reschedule_closure', date=date, slot=slot),
+                moved_count=len(res['moved']),
+                unplaced_count=len(res['unplaced']),
+                timestamp=datetime.datetime.utcnow(),
+            ))
+        except Exception:
+            # do not fail the operation if logging fails
+            current_app.logger.exception("Failed to write admin audit log")
     return jsonify(res)
 
 @admin_bp.route('/postpone_booking/<booking_id>', methods=['POST'])
@@ -949,4 +1063,5 @@ def postpone_booking_route(booking_id):
     if 'error' in res:
         return jsonify(res), 400
     
+    res['booking'] = _fetch_booking_row(db, oid)
     return jsonify(res), 200
@@ -1,12 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from datetime import date, datetime, timedelta
-from models.booking_model import create_booking
+from models.booking_model import create_booking, get_slot_index, to_rows, TRACKING_PROJECTION
 from utils.allocation_logic import load_settings
 from utils.amount_calculator import calculate_total_amount
 from models.raft_model import ensure_rafts_for_date_slot
 from bson.objectid import ObjectId
 from datetime import timedelta as _timedelta
 from utils.booking_ops import check_capacity_available
+from utils.daily_stats import record_booking_change
 
 booking_bp = Blueprint('booking', __name__)
 
@@ -204,7 +205,11 @@ def book():
             currency='INR',
             status='Pending',
             payment_status='Pending',
+            slot_index=get_slot_index(settings.get('time_slots'), slot),
+            expires_at=datetime.utcnow() + timedelta(minutes=current_app.config.get('PENDING_BOOKING_EXPIRY_MINUTES', 30)),
+            pricing=amount_calc,
         )
+        record_booking_change(db, None, db.bookings.find_one({'_id': booking_id}), settings)
         flash('Booking created. Please complete payment to confirm your slot.', 'info')
         return redirect(url_for('booking.booking_confirmation', booking_id=booking_id))
     # For GET requests, provide the min_date and max_date so the frontend datepicker can enforce range
@@ -390,32 +395,23 @@ def track_booking():
             return redirect(url_for('booking.track_booking'))
         
         db = current_app.mongo.db
-        # Updated to query ALL matches, not just latest
-        cursor = db.bookings.find({
-            '$or': [{'email': email}, {'phone': phone}]
-        }).sort('created_at', -1)
-        # Note: find_latest_by_contact currently sorts and checks. 
-        # Ideally, we should use a new function `find_all_by_contact` or reuse the cursor if it wasn't limited to 1.
-        # Assuming `find_latest_by_contact` returns a mongo cursor (not find_one), we can iterate it. 
-        # Let's inspect `models/booking_model.py` carefully or just write the find query here to be safe.
-        
-        bookings = list(cursor)
-        
-        if not bookings:
-            flash('No booking found for that contact.', 'error')
-            return redirect(url_for('booking.track_booking'))
-        
-        # Filter out past bookings - only show upcoming bookings (today and future)
+        contact_filter = {'$or': [{'email': email}, {'phone': phone}]}
+        # Only upcoming bookings (today and future) are shown, so filter in the query
+        # and fetch just the fields the result page renders.
         today = date.today().isoformat()
-        upcoming_bookings = [b for b in bookings if b.get('date', '') >= today]
-        
+        upcoming_bookings = to_rows(
+            db.bookings.find(
+                {'$and': [contact_filter, {'date': {'$gte': today}, 'status': {'$ne': 'Expired'}}]},
+                TRACKING_PROJECTION,
+            ).sort('created_at', -1)
+        )
+
         if not upcoming_bookings:
-            flash('No upcoming bookings found. Your bookings are in the past.', 'info')
+            if db.bookings.find_one(contact_filter, {'_id': 1}):
+                flash('No upcoming bookings found. Your bookings are in the past.', 'info')
+            else:
+                flash('No booking found for that contact.', 'error')
             return redirect(url_for('booking.track_booking'))
-        
-        # Convert ObjectId to string for template rendering
-        for b in upcoming_bookings:
-            b['_id'] = str(b.get('_id'))
             
         return render_template('track_booking_result.html', bookings=upcoming_bookings)
     return render_template('track_booking.html')
@@ -3,19 +3,23 @@ Razorpay Payment Integration Blueprint
 """
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from bson import ObjectId
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 from werkzeug.exceptions import BadRequest
-from pymongo import ReturnDocument
 import razorpay
 
+from config import Config
 from models.booking_model import create_booking, update_booking_status, get_booking
-from models.payment_model import insert_payment
-from utils.allocation_logic import load_settings, allocate_raft
+from utils.allocation_logic import load_settings
 from utils.amount_calculator import calculate_total_amount
+from utils.booking_ops import confirm_paid_booking
+from utils.daily_stats import record_booking_change
+from utils.gateway import Gateway, GatewayUnavailable
+from utils.seat_holds import place_hold, release_hold
+from utils.webhook_outbox import enqueue_webhook_event
 
 
 payment_bp = Blueprint("payment", __name__, url_prefix="/payment")
@@ -28,7 +32,17 @@ razorpay_client = razorpay.Client(
     auth=(
         os.environ.get("RAZORPAY_KEY_ID", "rzp_test_SLoMv8ODDZOJqO"),
         os.environ.get("RAZORPAY_KEY_SECRET", "RaGDqalgbz3me6HEIBi5yQxV"),
-    )
+    ),
+    # scripts/fake_razorpay_server.py for local tests and benchmarks
+    base_url=os.environ.get("RAZORPAY_BASE_URL", "https://api.razorpay.com"),
+)
+
+# Network calls to Razorpay go through a bounded pool with deadlines, retries
+# and a circuit breaker, so a slow gateway cannot tie up every web worker
+gateway = Gateway(
+    max_workers=Config.GATEWAY_MAX_WORKERS,
+    deadline=Config.GATEWAY_DEADLINE_SECONDS,
+    retries=Config.GATEWAY_RETRIES,
 )
 
 
@@ -70,6 +84,9 @@ def create_order():
 
     # Basic state guard: do not allow payment for cancelled / already-confirmed bookings
     status = (booking.get("status") or "").lower()
+    if status == "expired":
+        logger.info("Payment requested for expired booking %s", booking_id)
+        return jsonify({"error": "This booking has expired. Please book again."}), 400
     if status in {"cancelled", "failed"}:
         logger.info("Payment requested for non-payable booking %s with status=%s", booking_id, status)
         return jsonify({"error": "Booking is not in a payable state"}), 400
@@ -95,6 +112,14 @@ def create_order():
         logger.warning("Invalid payable amount for %s: %s", booking_id, amount_to_charge)
         raise BadRequest("Invalid amount")
 
+    # Hold the seats while the customer pays, so verify_payment cannot find the
+    # slot full after the money is taken. Bookings with rafts already need none.
+    if booking.get("status") == "Pending" and not booking.get("raft_allocations"):
+        hold = place_hold(db, booking, current_app.config.get("SEAT_HOLD_MINUTES", 15), settings)
+        if hold is None:
+            logger.info("No seats left to hold for booking %s", booking_id)
+            return jsonify({"error": "Sorry, this slot has just filled up. Please choose another slot."}), 409
+
     existing_order_id = booking.get("razorpay_order_id")
     order_id = existing_order_id
 
@@ -104,26 +129,47 @@ def create_order():
         )
     else:
         amount_paise = int(amount_to_charge * 100)
-        order = razorpay_client.order.create(
-            {
-                "amount": amount_paise,
-                "currency": currency,
-                "payment_capture": 1,
-            }
-        )
+        try:
+            order = gateway.call(
+                razorpay_client.order.create,
+                {
+                    "amount": amount_paise,
+                    "currency": currency,
+                    "payment_capture": 1,
+                    # ties orders from repeated creates to this booking in the Razorpay dashboard
+                    "receipt": str(booking["_id"]),
+                },
+                # Not idempotent: a create that timed out may still have made an order,
+                # so a retry could leave two. The customer's next attempt creates it instead.
+                retries=0,
+            )
+        except GatewayUnavailable:
+            logger.exception("Razorpay order create failed for booking %s", booking_id)
+            return jsonify({"error": "Payment gateway is busy. Please try again in a minute."}), 503
         order_id = order["id"]
-        db.bookings.update_one(
-            {"_id": booking["_id"]},
+        # Only the first concurrent create_order stores its order; the others reuse it
+        stored = db.bookings.update_one(
+            {"_id": booking["_id"], "razorpay_order_id": None},
             {
                 "$set": {
                     "razorpay_order_id": order_id,
                     # ensure payment_status is set to Pending on order creation
                     "payment_status": "Pending",
                     "payment_order_created_at": datetime.utcnow(),
+                    # give the customer a full expiry window to finish checkout
+                    "expires_at": datetime.utcnow() + timedelta(
+                        minutes=current_app.config.get("PENDING_BOOKING_EXPIRY_MINUTES", 30)
+                    ),
+                    "updated_at": datetime.utcnow(),
                 }
             },
         )
-        logger.info("Razorpay order %s created for booking %s", order_id, booking_id)
+        if not stored.matched_count:
+            current = db.bookings.find_one({"_id": booking["_id"]}, {"razorpay_order_id": 1}) or {}
+            order_id = current.get("razorpay_order_id") or order_id
+            logger.info("Booking %s got order %s from a concurrent request", booking_id, order_id)
+        else:
+            logger.info("Razorpay order %s created for booking %s", order_id, booking_id)
 
     return jsonify(
         {
@@ -187,7 +233,7 @@ def verify_payment():
         else:
             db.bookings.update_one(
                 {"razorpay_order_id": order_id},
-                {"$set": {"status": "Failed", "payment_status": "Failed"}},
+                {"$set": {"status": "Failed", "payment_status": "Failed", "updated_at": datetime.utcnow()}},
             )
         return jsonify({"success": False, "message": "Payment verification failed"}), 400
 
@@ -228,13 +274,17 @@ def verify_payment():
             409,
         )
 
-    # STEP 1: Allocate rafts AFTER successful payment, so that only
-    # confirmed bookings reserve seats and appear in occupancy.
-    # If this booking already has raft allocations (legacy data), reuse them.
-    raft_allocations = booking.get("raft_allocations") or []
-    raft_details = booking.get("raft_allocation_details") or []
+    if booking.get("status") == "Expired":
+        # The customer paid after the checkout expired; the money is taken, so
+        # still try to confirm the booking like a Pending one.
+        logger.warning("Verified payment for expired booking %s / order %s", booking["_id"], order_id)
 
-    if not raft_allocations:
+    # Allocate rafts AFTER successful payment, so that only confirmed bookings
+    # reserve seats and appear in occupancy, then confirm the booking and record
+    # the payment (in one transaction with MONGO_TRANSACTIONS).
+    # If this booking already has raft allocations (legacy data), reuse them.
+    allocate = None
+    if not booking.get("raft_allocations"):
         booking_date = booking.get("date") or booking.get("booking_details", {}).get("date")
         slot = booking.get("slot") or booking.get("booking_details", {}).get("slot")
         try:
@@ -259,56 +309,43 @@ def verify_payment():
                 ),
                 500,
             )
+        allocate = (booking_date, slot, group_size)
 
-        alloc_res = allocate_raft(db, None, booking_date, slot, group_size)
-        if alloc_res.get("status") != "Confirmed":
-            # Payment succeeded but we could not allocate seats due to race/full capacity.
-            # Do NOT reserve seats; mark booking for manual resolution.
-            logger.error(
-                "Allocation failed after payment. booking_id=%s date=%s slot=%s group_size=%s res=%s",
-                booking["_id"],
-                booking_date,
-                slot,
-                group_size,
-                alloc_res,
-            )
-            update_booking_status(
-                db,
-                str(booking["_id"]),
-                status="Pending",
-                payment_status="Paid",
-                extra_updates={"allocation_error": True},
-            )
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "message": "Payment received but slot is now full. Our team will contact you.",
-                    }
-                ),
-                409,
-            )
-
-        raft_allocations = alloc_res.get("rafts", []) or []
-        raft_details = alloc_res.get("raft_details", []) or []
-
-    # STEP 2: Update booking to Confirmed + Paid in a single atomic operation,
-    # including the final raft assignments used for occupancy and admin flows.
-    updated = db.bookings.find_one_and_update(
+    updated, alloc_res = confirm_paid_booking(
+        db,
+        booking,
         booking_filter,
-        {
-            "$set": {
-                "status": "Confirmed",
-                "payment_status": "Paid",
-                "razorpay_payment_id": payment_id,
-                "payment_verified_at": datetime.utcnow(),
-                "raft_allocations": raft_allocations,
-                "raft_allocation_details": raft_details,
-            }
-        },
-        return_document=ReturnDocument.AFTER,
+        allocate,
+        {"order_id": order_id, "payment_id": payment_id, "signature": signature, "raw_response": data},
+        use_transaction=current_app.config.get("MONGO_TRANSACTIONS", False),
     )
 
+    if alloc_res is not None and alloc_res.get("status") != "Confirmed":
+        # Payment succeeded but we could not allocate seats due to race/full capacity.
+        # Do NOT reserve seats; mark booking for manual resolution.
+        logger.error(
+            "Allocation failed after payment. booking_id=%s date=%s slot=%s group_size=%s res=%s",
+            booking["_id"],
+            *allocate,
+            alloc_res,
+        )
+        flagged = {"status": "Pending", "payment_status": "Paid", "allocation_error": True,
+                   "updated_at": datetime.utcnow()}
+        # daily_stats diff from the state right before this write (the sweeper may have expired it)
+        before = db.bookings.find_one_and_update({"_id": booking["_id"]}, {"$set": flagged})
+        release_hold(db, booking["_id"])
+        if before:
+            record_booking_change(db, before, dict(before, **flagged))
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": "Payment received but slot is now full. Our team will contact you.",
+                }
+            ),
+            409,
+        )
+
     if not updated:
         # Another process may have updated it concurrently; treat as idempotent
         logger.warning(
@@ -316,24 +353,8 @@ def verify_payment():
         )
         return jsonify({"success": True, "message": "Payment already processed"}), 200
 
-    # Record payment in a separate collection (idempotent insert)
-    existing_payment = db.payments.find_one({"payment_id": payment_id})
-    if not existing_payment:
-        insert_payment(
-            db,
-            booking_id=str(updated["_id"]),
-            order_id=order_id,
-            payment_id=payment_id,
-            signature=signature,
-            amount=updated.get("amount"),
-            status="paid",
-            raw_response=data,
-        )
-    else:
-        db.payments.update_one(
-            {"_id": existing_payment["_id"]},
-            {"$set": {"status": "paid", "raw_response": data}},
-        )
+    # The hold has become a real allocation (daily_stats were updated by confirm_paid_booking)
+    release_hold(db, updated["_id"])
 
     logger.info(
         "Payment verified and booking confirmed. booking_id=%s order_id=%s payment_id=%s",
@@ -347,10 +368,12 @@ def verify_payment():
 @payment_bp.route("/webhook", methods=["POST"])
 def razorpay_webhook():
     """
-    Handle Razorpay webhook events (idempotent).
+    Handle Razorpay webhook events.
 
     Webhook is a secondary safety net: it should not conflict with the
-    client-side /verify_payment flow and must be idempotent.
+    client-side /verify_payment flow. Verified events are only queued here
+    (utils.webhook_outbox) and applied by the outbox workers, so Razorpay
+    gets its 200 without waiting on payments / bookings writes.
     """
     payload = request.data
     signature = request.headers.get("X-Razorpay-Signature")
@@ -363,55 +386,9 @@ def razorpay_webhook():
         logger.error("Webhook signature verification failed")
         return jsonify({"success": False}), 400
 
-    body = request.json or {}
-    event = body.get("event")
-    payment_entity = body.get("payload", {}).get("payment", {}).get("entity", {}) or {}
-
-    order_id = payment_entity.get("order_id")
-    payment_id = payment_entity.get("id")
-    status = payment_entity.get("status")
-
-    # Ensure we only process each payment id once
-    payment_record = db.payments.find_one({"payment_id": payment_id})
-    if payment_record and payment_record.get("webhook_verified"):
-        logger.info("Webhook already processed for payment %s", payment_id)
-        return jsonify({"success": True})
-
-    db.payments.update_one(
-        {"payment_id": payment_id},
-        {
-            "$set": {
-                "webhook_verified": True,
-                "status": status,
-                "webhook_payload": body,
-            }
-        },
-        upsert=True,
-    )
-
-    # Best-effort sync to booking using razorpay_order_id
-    if event == "payment.captured" and status == "captured":
-        db.bookings.update_one(
-            {"razorpay_order_id": order_id},
-            {
-                "$set": {
-                    "payment_status": "Paid",
-                    # Do not downgrade a cancelled booking; only confirm if not explicitly cancelled
-                }
-            },
-        )
-    elif event == "payment.failed":
-        db.bookings.update_one(
-            {"razorpay_order_id": order_id},
-            {
-                "$set": {
-                    "payment_status": "Failed",
-                }
-            },
-        )
-
-    logger.info("Webhook processed: %s for payment %s", event, payment_id)
-    return jsonify({"success": True})
+    body = request.get_json(silent=True) or {}
+    queued = enqueue_webhook_event(db, body)
+    return jsonify({"success": True, "queued": queued})
 
 
 @payment_bp.route("/success", methods=["GET"])
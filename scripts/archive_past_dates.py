@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Archive finished dates (bookings, rafts, payments) out of the hot collections, or restore them.
+
+Archived documents go to the *_archive collections, or with --dir to
+gzip-compressed JSON-lines files. Both are moved in batches and an
+interrupted run can be repeated safely (see utils/archive.py).
+
+Usage:
+  python scripts/archive_past_dates.py archive [--older-than-days N] [--dir PATH]
+      [--batch-size N] [--dry-run]
+  python scripts/archive_past_dates.py restore [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+      [--batch-size N] [PATH ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.archive import DEFAULT_BATCH_SIZE, archive_before, archive_cutoff, restore_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    arch = sub.add_parser('archive', help='move dates older than N days out of the hot collections')
+    arch.add_argument('--older-than-days', type=int, default=60)
+    arch.add_argument('--dir', help='write gzip JSON-lines files here instead of *_archive collections')
+    arch.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    arch.add_argument('--dry-run', action='store_true', help='only count what would be archived')
+
+    rest = sub.add_parser('restore', help='move archived dates back into the hot collections')
+    rest.add_argument('--from', dest='from_date')
+    rest.add_argument('--to', dest='to_date')
+    rest.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    rest.add_argument('paths', nargs='*', help='archive files or directories (default: *_archive collections)')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database('raft_booking')
+    started = time.perf_counter()
+
+    if args.command == 'archive':
+        cutoff = archive_cutoff(args.older_than_days)
+        report = archive_before(db, cutoff, directory=args.dir, batch_size=args.batch_size, dry_run=args.dry_run)
+        verb = 'Would archive' if args.dry_run else 'Archived'
+        print(f"[OK] {verb} dates before {cutoff}: {report['bookings']} booking(s), "
+              f"{report['rafts']} raft(s), {report['payments']} payment(s) "
+              f"in {time.perf_counter() - started:.2f}s")
+        for path in report.get('files', []):
+            print(f"  {path}")
+    else:
+        report = restore_archive(db, args.from_date, args.to_date, paths=args.paths or None,
+                                 batch_size=args.batch_size)
+        print(f"[OK] Restored {report['bookings']} booking(s), {report['rafts']} raft(s), "
+              f"{report['payments']} payment(s) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
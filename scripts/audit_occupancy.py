@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Audit raft occupancy against confirmed bookings (utils.occupancy_audit).
+
+Every run is stored in the occupancy_audits collection. --recent only checks
+the slots of bookings changed or deleted since the previous --recent run,
+which is cheap enough to schedule every minute (cron, or --interval 60); once
+an hour it checks every slot from today on instead.
+
+Usage:
+  python scripts/audit_occupancy.py [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--heal]
+  python scripts/audit_occupancy.py --recent [--heal] [--interval SECONDS]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.occupancy_audit import audit_occupancy, audit_recent_changes
+
+
+def print_report(report):
+    healed = f", {report['healed']} healed" if report['heal'] else ''
+    print(f"[AUDIT] {report['slots_checked']} slot(s) checked, {report['drifted_slots']} drifted "
+          f"({report['seat_drift']} seat(s){healed}) in {report['elapsed']:.2f}s")
+    for entry in report['drift']:
+        print(f"  {entry['date']} {entry['slot']}: rafts {entry['stored']}, confirmed {entry['expected']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--from', dest='from_date')
+    parser.add_argument('--to', dest='to_date')
+    parser.add_argument('--recent', action='store_true', help='only slots of bookings changed since the last run')
+    parser.add_argument('--heal', action='store_true', help='recompute the rafts of drifted slots')
+    parser.add_argument('--interval', type=int, default=0, help='with --recent: repeat every N seconds')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database('raft_booking')
+
+    while True:
+        if args.recent:
+            report = audit_recent_changes(db, heal=args.heal)
+        else:
+            report = audit_occupancy(db, args.from_date, args.to_date, heal=args.heal)
+        print_report(report)
+        if not (args.recent and args.interval > 0):
+            break
+        time.sleep(args.interval)
+
+    if report['drifted_slots'] and not args.heal:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
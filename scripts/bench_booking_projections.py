@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bytes transferred and decode time for the admin / tracking list
+queries, full documents vs. the lean projections in models/booking_model.py.
+
+Usage:
+    python scripts/bench_booking_projections.py                # use existing bookings
+    python scripts/bench_booking_projections.py --seed 5000    # seed a scratch database first
+
+--seed writes synthetic bookings into the database given by --db
+(default: raft_booking_bench) and never touches the application database.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient
+
+from config import MONGO_URI
+from models.booking_model import (
+    BookingRow,
+    DASHBOARD_PROJECTION,
+    CALENDAR_PROJECTION,
+    OCCUPANCY_PROJECTION,
+    TRACKING_PROJECTION,
+)
+
+SLOTS = ['7:00–9:00', '10:00–12:00', '13:00–15:00', '15:30–17:30']
+
+
+def seed(db, count, days):
+    """Insert `count` realistic bookings spread over `days` days from today."""
+    db.bookings.delete_many({})
+    start = date.today()
+    docs = []
+    for i in range(count):
+        d = (start + timedelta(days=random.randrange(days))).isoformat()
+        slot = random.choice(SLOTS)
+        size = random.randint(1, 12)
+        details = {
+            'name': f'Guest {i}', 'email': f'guest{i}@example.com', 'phone': f'98{i:08d}',
+            'date': d, 'slot': slot, 'group_size': size,
+            'amount_per_person': 1200, 'total_amount': 1200 * size,
+        }
+        docs.append({
+            'user_id': details['email'], 'booking_details': details,
+            'amount': details['total_amount'], 'currency': 'INR',
+            'status': random.choice(['Confirmed', 'Confirmed', 'Pending', 'Cancelled']),
+            'payment_status': 'Paid', 'razorpay_order_id': f'order_{i:010d}',
+            'created_at': datetime.now(timezone.utc), 'date': d, 'slot': slot,
+            'slot_index': SLOTS.index(slot), 'user_name': details['name'],
+            'phone': details['phone'], 'email': details['email'], 'group_size': size,
+            'raft_allocations': [1, 2], 'raft_allocation_details': [{'raft_id': 1, 'count': size}],
+        })
+        if len(docs) == 1000:
+            db.bookings.insert_many(docs)
+            docs = []
+    if docs:
+        db.bookings.insert_many(docs)
+
+
+def measure(collection, query, projection):
+    """Return (documents, BSON bytes received, seconds to decode and build rows)."""
+    raw = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+    total_bytes = 0
+    count = 0
+    for doc in raw.find(query, projection):
+        total_bytes += len(doc.raw)
+        count += 1
+
+    started = time.perf_counter()
+    for doc in collection.find(query, projection):
+        if projection:
+            BookingRow(doc)
+    elapsed = time.perf_counter() - started
+    return count, total_bytes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=None, help='database name (default: URI database, or raft_booking_bench with --seed)')
+    parser.add_argument('--seed', type=int, default=0, help='seed N synthetic bookings first')
+    parser.add_argument('--days', type=int, default=90, help='date spread for seeded bookings')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    if args.seed:
+        db = client[args.db or 'raft_booking_bench']
+        print(f"Seeding {args.seed} bookings into {db.name}...")
+        seed(db, args.seed, args.days)
+    else:
+        db = client[args.db] if args.db else client.get_default_database('raft_booking')
+
+    today = date.today().isoformat()
+    horizon = (date.today() + timedelta(days=args.days)).isoformat()
+    views = [
+        ('dashboard', {'date': {'$gte': today, '$lte': horizon}}, DASHBOARD_PROJECTION),
+        ('calendar', {'date': {'$gte': today, '$lte': horizon}}, CALENDAR_PROJECTION),
+        ('occupancy_detail', {'date': {'$gte': today, '$lte': horizon}, 'status': 'Confirmed'}, OCCUPANCY_PROJECTION),
+        ('track_booking', {'date': {'$gte': today}}, TRACKING_PROJECTION),
+    ]
+
+    print(f"{'view':<18}{'docs':>8}{'full bytes':>14}{'lean bytes':>14}{'saved':>8}{'full ms':>10}{'lean ms':>10}")
+    for name, query, projection in views:
+        count, full_bytes, full_s = measure(db.bookings, query, None)
+        _, lean_bytes, lean_s = measure(db.bookings, query, projection)
+        saved = (1 - lean_bytes / full_bytes) * 100 if full_bytes else 0
+        print(f"{name:<18}{count:>8}{full_bytes:>14,}{lean_bytes:>14,}{saved:>7.1f}%{full_s * 1000:>10.1f}{lean_s * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: order creation against scripts/fake_razorpay_server.py, called
+directly (as create_order used to) vs. through utils.gateway, with a
+healthy, a slow and a failing gateway.
+
+For each scenario `--clients` threads (standing in for web workers) create
+`--calls` orders each; reported are the per-request latencies, how many
+requests failed and the wall time, i.e. how long workers stayed tied up.
+
+Usage: python scripts/bench_gateway.py [--clients 16] [--calls 5] [--slow 3.0] [--deadline 1.0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import razorpay
+from fake_razorpay_server import start_server
+from utils.gateway import Gateway
+
+ORDER = {'amount': 50000, 'currency': 'INR', 'payment_capture': 1}
+
+
+def run(label, call, clients, calls):
+    latencies, failures = [], 0
+
+    def worker(_):
+        nonlocal failures
+        for _ in range(calls):
+            started = time.perf_counter()
+            try:
+                call()
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(worker, range(clients)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<28} p50 {statistics.median(latencies) * 1000:7.0f} ms  p95 {p95 * 1000:7.0f} ms  "
+          f"max {latencies[-1] * 1000:7.0f} ms  failed {failures:3d}/{len(latencies)}  wall {wall:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--calls', type=int, default=5)
+    parser.add_argument('--slow', type=float, default=3.0, help='gateway latency in the slow scenario (s)')
+    parser.add_argument('--deadline', type=float, default=1.0)
+    args = parser.parse_args()
+
+    server, state = start_server()
+    client = razorpay.Client(auth=('key', 'secret'), base_url=f'http://127.0.0.1:{server.server_port}')
+    scenarios = (('healthy', 0.02, False), ('slow', args.slow, False), ('down', 0.02, True))
+    for name, latency, down in scenarios:
+        state.latency, state.down = latency, down
+        gateway = Gateway(max_workers=8, max_queue=16, deadline=args.deadline, retries=2)
+        run(f"{name} / direct", lambda: client.order.create(ORDER), args.clients, args.calls)
+        run(f"{name} / gateway", lambda: gateway.call(client.order.create, ORDER), args.clients, args.calls)
+        gateway.shutdown(wait=False)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: verify_payment's confirmation step (utils.booking_ops.confirm_paid_booking:
+raft allocation, booking update, payment insert) with and without a transaction.
+
+`--clients` threads confirm `--bookings` Pending bookings spread over
+`--slots` slots, once with plain writes and once with MONGO_TRANSACTIONS;
+reported are per-confirmation latencies and throughput. Fewer slots means
+more write conflicts on the same rafts, which transactions retry.
+
+Needs a replica set. Writes only to the database given by --db
+(default: raft_booking_bench_txn).
+
+Usage: python scripts/bench_payment_transactions.py [--bookings 400] [--clients 8] [--slots 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+
+from config import MONGO_URI
+from utils.booking_ops import confirm_paid_booking
+
+SLOT = '7:00–9:00'
+
+
+def seed(db, count, slots):
+    for name in ('bookings', 'rafts', 'payments', 'seat_holds'):
+        db[name].delete_many({})
+    db.settings.replace_one({'_id': 'system_settings'}, {
+        '_id': 'system_settings', 'capacity': 6, 'rafts_per_slot': 5, 'time_slots': [SLOT],
+    }, upsert=True)
+    start = date.today() + timedelta(days=1)
+    docs = [{
+        'date': (start + timedelta(days=i % slots)).isoformat(), 'slot': SLOT, 'group_size': 1 + i % 3,
+        'status': 'Pending', 'payment_status': 'Pending', 'razorpay_order_id': f'order_{i:08d}',
+    } for i in range(count)]
+    db.bookings.insert_many(docs)
+    return docs
+
+
+def run(db, docs, clients, use_transaction):
+    latencies, confirmed = [], 0
+
+    def confirm(b):
+        nonlocal confirmed
+        started = time.perf_counter()
+        updated, _ = confirm_paid_booking(
+            db, b, {'_id': b['_id']}, (b['date'], b['slot'], b['group_size']),
+            {'order_id': b['razorpay_order_id'], 'payment_id': 'pay' + b['razorpay_order_id'][5:],
+             'signature': 'sig', 'raw_response': {}},
+            use_transaction=use_transaction,
+        )
+        latencies.append(time.perf_counter() - started)
+        confirmed += updated is not None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(confirm, docs))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    label = 'transaction' if use_transaction else 'plain writes'
+    print(f"{label:<14} p50 {statistics.median(latencies) * 1000:6.1f} ms  p95 {p95 * 1000:6.1f} ms  "
+          f"max {latencies[-1] * 1000:6.1f} ms  {len(docs) / wall:7.0f} confirmations/s  "
+          f"confirmed {confirmed}/{len(docs)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bookings', type=int, default=400)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--slots', type=int, default=20)
+    parser.add_argument('--db', default='raft_booking_bench_txn')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    if not client.admin.command('hello').get('setName'):
+        sys.exit("Transactions need a replica set (see scripts/test_payment_transactions.py)")
+    db = client[args.db]
+
+    for use_transaction in (False, True):
+        docs = seed(db, args.bookings, args.slots)
+        run(db, docs, args.clients, use_transaction)
+
+
+if __name__ == '__main__':
+    main()
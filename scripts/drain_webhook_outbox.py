@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Apply queued Razorpay webhook events from the webhook_outbox collection.
+
+The app drains the outbox itself with WEBHOOK_WORKER_THREADS threads; use
+this when those are turned off (WEBHOOK_WORKER_THREADS=0), or with --failed
+to retry events that ran out of attempts.
+
+Usage: python scripts/drain_webhook_outbox.py [--batch-size N] [--interval SECONDS] [--failed]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.webhook_outbox import DEFAULT_BATCH_SIZE, drain_outbox, requeue_failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--interval', type=float, default=0, help='repeat every N seconds')
+    parser.add_argument('--failed', action='store_true', help='requeue failed events first')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database('raft_booking')
+
+    if args.failed:
+        print(f"[OK] {requeue_failed(db)} failed event(s) requeued")
+
+    while True:
+        started = time.perf_counter()
+        processed, failed = drain_outbox(db, args.batch_size)
+        if processed or failed or args.interval <= 0:
+            print(f"[OK] {processed} webhook event(s) applied, {failed} failed "
+                  f"in {time.perf_counter() - started:.2f}s")
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Apply the index registry (models/indexes.py) and backfill booking.slot_index
+and the admin search keys (name_lower / email_lower / phone_digits).
+
+The app only creates missing indexes on startup (ENSURE_INDEXES_ON_STARTUP,
+see models.indexes.ensure_indexes_at_startup) and skips the ones it cannot
+build; this also drops retired indexes, runs the backfills, and reports
+indexes it cannot build and exits 1. Run it after deploying index changes.
+
+Usage: python scripts/ensure_indexes.py
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+from config import MONGO_URI
+from models.indexes import duplicate_values, ensure_indexes
+from models.booking_model import reindex_booking_slot_order, backfill_search_keys
+from utils.allocation_logic import load_settings
+
+
+def main():
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database('raft_booking')
+
+    try:
+        applied = ensure_indexes(db)
+    except OperationFailure as exc:
+        print(f"[ERROR] {exc}")
+        # Unique indexes cannot be built over existing duplicates; list them for cleanup
+        for collection, field in (('bookings', 'razorpay_order_id'), ('payments', 'payment_id'), ('users', 'email')):
+            for value in duplicate_values(db, collection, field):
+                print(f"  duplicate {collection}.{field}: {value}")
+        sys.exit(1)
+    for name in applied:
+        print(f"[OK] index {name}")
+
+    settings = load_settings(db)
+    modified = reindex_booking_slot_order(db, settings.get('time_slots', []))
+    print(f"[OK] slot_index backfilled on {modified} booking(s)")
+
+    modified = backfill_search_keys(db)
+    print(f"[OK] search keys backfilled on {modified} booking(s)")
+
+
+if __name__ == '__main__':
+    main()
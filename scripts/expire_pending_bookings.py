@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Mark abandoned checkouts (unpaid Pending bookings past their expires_at) as Expired.
+
+Bookings created before expires_at existed expire once they are older than
+--max-age-minutes (default: PENDING_BOOKING_EXPIRY_MINUTES). Expired seat
+holds are deleted in the same run. Schedule it from cron, or keep it running
+with --interval.
+
+Usage: python scripts/expire_pending_bookings.py [--max-age-minutes N] [--batch-size N] [--interval SECONDS]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import Config, MONGO_URI
+from utils.booking_ops import expire_pending_bookings
+from utils.seat_holds import release_expired_holds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-age-minutes', type=int, default=Config.PENDING_BOOKING_EXPIRY_MINUTES)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--interval', type=int, default=0, help='repeat every N seconds')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database('raft_booking')
+
+    while True:
+        started = time.perf_counter()
+        expired = expire_pending_bookings(db, args.max_age_minutes, batch_size=args.batch_size)
+        released = release_expired_holds(db)
+        print(f"[OK] {expired} pending booking(s) expired, {released} seat hold(s) released "
+              f"in {time.perf_counter() - started:.2f}s")
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of the Razorpay REST API the app uses, for tests and benchmarks.
+
+Point the app at it with RAZORPAY_BASE_URL=http://127.0.0.1:<port>. Orders
+and payments live in memory. Behaviour can be changed while it runs:
+
+  POST /__control   {"latency": 0.5, "fail_rate": 0.2, "down": false}
+                    latency in seconds before every API answer, fail_rate is
+                    the share of API calls answered with a 502 SERVER_ERROR,
+                    down answers every API call with a 503
+  POST /__payments  {"order_id": "...", "status": "captured"}  add a payment to an order
+                    (optional "created_at", unix seconds)
+
+API: POST /v1/orders, GET /v1/orders/<id>, GET /v1/orders/<id>/payments,
+GET /v1/payments/<id>.
+
+Usage: python scripts/fake_razorpay_server.py [--port 8765] [--latency S] [--fail-rate R]
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeRazorpay:
+    def __init__(self, latency=0.0, fail_rate=0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.down = False
+        self.orders = {}
+        self.payments = {}
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def new_id(self, prefix):
+        with self._lock:
+            return f"{prefix}_fake{next(self._ids):08d}"
+
+    def order_payments(self, order_id):
+        return [p for p in self.payments.values() if p['order_id'] == order_id]
+
+    def order_view(self, order):
+        paid = any(p['status'] == 'captured' for p in self.order_payments(order['id']))
+        attempted = bool(self.order_payments(order['id']))
+        status = 'paid' if paid else ('attempted' if attempted else 'created')
+        return dict(order, status=status, amount_paid=order['amount'] if paid else 0,
+                    attempts=len(self.order_payments(order['id'])))
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            try:
+                return json.loads(raw or b'{}')
+            except ValueError:
+                return {}
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status, code, description):
+            self._send(status, {'error': {'code': code, 'description': description}})
+
+        def _api_gate(self):
+            """Apply the configured latency / failures; False when the call was already answered."""
+            with state._lock:
+                state.calls += 1
+            if state.latency:
+                time.sleep(state.latency)
+            if state.down:
+                self._error(503, 'SERVER_ERROR', 'fake gateway is down')
+                return False
+            if state.fail_rate and random.random() < state.fail_rate:
+                self._error(502, 'SERVER_ERROR', 'fake gateway failure')
+                return False
+            return True
+
+        def do_POST(self):
+            body = self._body()
+            if self.path == '/__control':
+                for key in ('latency', 'fail_rate', 'down'):
+                    if key in body:
+                        setattr(state, key, body[key])
+                return self._send(200, {'latency': state.latency, 'fail_rate': state.fail_rate, 'down': state.down})
+            if self.path == '/__payments':
+                if body.get('order_id') not in state.orders:
+                    return self._error(400, 'BAD_REQUEST_ERROR', 'unknown order')
+                order = state.orders[body['order_id']]
+                payment = {
+                    'id': body.get('id') or state.new_id('pay'), 'entity': 'payment',
+                    'order_id': order['id'], 'amount': order['amount'], 'currency': order['currency'],
+                    'status': body.get('status', 'captured'),
+                    'created_at': body.get('created_at') or int(time.time()),
+                }
+                state.payments[payment['id']] = payment
+                return self._send(200, payment)
+            if self.path.rstrip('/') == '/v1/orders':
+                if not self._api_gate():
+                    return
+                if not isinstance(body.get('amount'), int) or body['amount'] <= 0:
+                    return self._error(400, 'BAD_REQUEST_ERROR', 'The amount must be a positive integer')
+                order = {
+                    'id': state.new_id('order'), 'entity': 'order', 'amount': body['amount'],
+                    'currency': body.get('currency', 'INR'), 'receipt': body.get('receipt'),
+                    'notes': body.get('notes') or {}, 'created_at': int(time.time()),
+                }
+                state.orders[order['id']] = order
+                return self._send(200, state.order_view(order))
+            self._error(404, 'BAD_REQUEST_ERROR', 'The requested URL was not found on the server.')
+
+        def do_GET(self):
+            parts = [p for p in self.path.split('?')[0].split('/') if p]
+            if parts[:1] != ['v1'] or len(parts) < 3:
+                return self._error(404, 'BAD_REQUEST_ERROR', 'The requested URL was not found on the server.')
+            if not self._api_gate():
+                return
+            if parts[1] == 'orders' and parts[2] in state.orders:
+                order = state.orders[parts[2]]
+                if len(parts) == 4 and parts[3] == 'payments':
+                    items = state.order_payments(order['id'])
+                    return self._send(200, {'entity': 'collection', 'count': len(items), 'items': items})
+                return self._send(200, state.order_view(order))
+            if parts[1] == 'payments' and parts[2] in state.payments:
+                return self._send(200, state.payments[parts[2]])
+            self._error(400, 'BAD_REQUEST_ERROR', 'The id provided does not exist')
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up at their deadline close the socket mid-answer
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start_server(port=0, latency=0.0, fail_rate=0.0):
+    """Serve in a background thread. Returns (server, state); base URL is http://127.0.0.1:<server.server_port>."""
+    state = FakeRazorpay(latency, fail_rate)
+    server = _Server(('127.0.0.1', port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    server, _ = start_server(args.port, args.latency, args.fail_rate)
+    print(f"Fake Razorpay listening on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Rebuild the daily_stats rollup collection from every booking.
+
+Safe to run while the app is serving: the new rollups are built in a scratch
+collection and swapped in with a single rename.
+
+Usage: python scripts/rebuild_daily_stats.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.daily_stats import rebuild_daily_stats
+
+
+def main():
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database('raft_booking')
+
+    started = time.perf_counter()
+    rows = rebuild_daily_stats(db)
+    print(f"[OK] daily_stats rebuilt: {rows} (date, slot) row(s) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,62 +1,103 @@
-from pymongo import MongoClient
-import sys
+#!/usr/bin/env python3
+"""
+Recompute raft occupancy from confirmed bookings (utils.occupancy.recompute_occupancy).
+
+Target occupancies come from one aggregation per date range and only rafts
+that differ are written, in chunked bulk writes. The range can be split
+across worker threads; each worker recomputes a disjoint block of dates.
+
+Usage:
+  python scripts/recompute_raft_occupancy.py [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+      [--workers N] [--chunk-size N] [--dry-run] [--allocate-missing]
+"""
+import argparse
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 
-# Use project config to get the MongoDB URI (avoid falling back to localhost on servers)
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
 from config import MONGO_URI
-client = MongoClient(MONGO_URI)
-db = client.get_database("raft_booking")
-
-settings = db.settings.find_one({'_id':'system_settings'}) or {'rafts_per_slot':5,'capacity':6}
-capacity = settings.get('capacity', 6)
-rafts_per_slot = settings.get('rafts_per_slot', 5)
-
-print("Resetting all raft occupancy to 0...")
-db.rafts.update_many({}, {'$set': {'occupancy': 0, 'is_special': False}})
-
-# Ensure rafts exist for all booking dates & slots
-bookings = list(db.bookings.find({}))
-dates_slots = set()
-for b in bookings:
-    dates_slots.add((b.get('date'), b.get('slot')))
-
-def ensure_rafts_for_date_slot(db, date, slot, rafts_per_slot, capacity):
-    existing = list(db.rafts.find({'day': date, 'slot': slot}).sort('raft_id', 1))
-    existing_ids = {r['raft_id'] for r in existing}
-    to_create = []
-    for rid in range(1, rafts_per_slot + 1):
-        if rid not in existing_ids:
-            to_create.append({'day': date, 'slot': slot, 'raft_id': rid, 'occupancy': 0, 'is_special': False})
-    if to_create:
-        db.rafts.insert_many(to_create)
-
-for d, s in dates_slots:
-    ensure_rafts_for_date_slot(db, d, s, rafts_per_slot, capacity)
-
-print("Applying confirmed bookings occupancy and verifying raft_allocations...")
-from utils.allocation_logic import allocate_raft
-for b in db.bookings.find({'status':'Confirmed'}):
-    details = b.get('raft_allocation_details')
-    if details:
-        for entry in details:
-            rid = int(entry.get('raft_id'))
-            add = int(entry.get('count', 0))
-            db.rafts.update_one({'day': b['date'], 'slot': b['slot'], 'raft_id': rid}, {'$inc': {'occupancy': add}})
-    else:
-        rafts = b.get('raft_allocations', [])
-        if rafts:
-            group = int(b.get('group_size', 0))
-            per = group // len(rafts)
-            rem = group % len(rafts)
-            for idx, rid in enumerate(rafts):
-                add = per + (1 if idx < rem else 0)
-                db.rafts.update_one({'day': b['date'], 'slot': b['slot'], 'raft_id': rid}, {'$inc': {'occupancy': add}})
-        else:
-            res = allocate_raft(db, None, b['date'], b['slot'], int(b.get('group_size', 0)))
-            if res.get('status') == 'Confirmed':
-                db.bookings.update_one({'_id': b['_id']}, {'$set': {'raft_allocations': res.get('rafts', []), 'raft_allocation_details': res.get('raft_details', [])}})
-            else:
-                print(f"Confirmed booking {b['_id']} could not be re-allocated automatically.")
-
-print("Recompute complete.")
+from utils.allocation_logic import load_settings
+from utils.occupancy import recompute_occupancy
+
+
+def date_bounds(db):
+    """Earliest and latest day present in rafts or bookings."""
+    days = []
+    for coll, field in ((db.rafts, 'day'), (db.bookings, 'date')):
+        for direction in (1, -1):
+            doc = coll.find_one({field: {'$type': 'string'}}, {field: 1}, sort=[(field, direction)])
+            if doc:
+                days.append(doc[field])
+    return (min(days), max(days)) if days else (None, None)
+
+
+def split_range(from_date, to_date, parts):
+    """Split [from_date, to_date] into up to `parts` contiguous, disjoint date ranges."""
+    start, end = date.fromisoformat(from_date), date.fromisoformat(to_date)
+    total = (end - start).days + 1
+    parts = max(1, min(parts, total))
+    ranges = []
+    for i in range(parts):
+        lo = start + timedelta(days=total * i // parts)
+        hi = start + timedelta(days=total * (i + 1) // parts - 1)
+        ranges.append((lo.isoformat(), hi.isoformat()))
+    return ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--from', dest='from_date')
+    parser.add_argument('--to', dest='to_date')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='only print rafts whose occupancy would change')
+    parser.add_argument('--allocate-missing', action='store_true',
+                        help='allocate rafts for confirmed bookings that have none')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database('raft_booking')
+    settings = load_settings(db)
+
+    lo, hi = date_bounds(db)
+    from_date, to_date = args.from_date or lo, args.to_date or hi
+    if not from_date or not to_date:
+        print("Nothing to recompute: no rafts or bookings.")
+        return
+
+    ranges = split_range(from_date, to_date, args.workers)
+    print(f"Recomputing {from_date} .. {to_date} in {len(ranges)} range(s){' (dry run)' if args.dry_run else ''}...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        reports = list(pool.map(
+            lambda r: recompute_occupancy(db, r[0], r[1], dry_run=args.dry_run, chunk_size=args.chunk_size,
+                                          allocate_missing=args.allocate_missing, settings=settings),
+            ranges,
+        ))
+    elapsed = time.perf_counter() - started
+
+    scanned = changed = 0
+    for rep in reports:
+        scanned += rep['rafts_scanned']
+        changed += rep['rafts_changed']
+        for c in rep['changes']:
+            print(f"  {c['day']} {c['slot']} raft {c['raft_id']}: {c['occupancy']} -> {c['expected']}")
+        for m in rep['missing_rafts']:
+            print(f"  [WARN] {m['day']} {m['slot']} raft {m['raft_id']} holds {m['expected']} seat(s) but has no raft document")
+        for u in rep['unallocated']:
+            state = {True: 'allocated', False: 'could not be allocated'}.get(u.get('allocated'), 'has no raft allocation')
+            print(f"  [WARN] confirmed booking {u['id']} ({u['date']} {u['slot']}) {state}")
+        print(f"  {rep['from']} .. {rep['to']}: {rep['rafts_scanned']} raft(s), {rep['rafts_changed']} changed, {rep['elapsed']:.2f}s")
+
+    rate = scanned / elapsed if elapsed else 0
+    verb = 'would change' if args.dry_run else 'changed'
+    print(f"[OK] {scanned} raft(s) scanned, {changed} {verb} in {elapsed:.2f}s ({rate:,.0f} rafts/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Reconcile unsettled bookings and payments against Razorpay and fix what can be fixed.
+
+Picks up from the stored checkpoint (orders created since the oldest one
+that was still open last run); --since overrides it. Mismatches are printed
+by category with a few booking ids each, see utils/reconciliation.py.
+Exits 1 when mismatches remain that need a person. Uses RAZORPAY_* from the
+environment like the app (RAZORPAY_BASE_URL for scripts/fake_razorpay_server.py).
+
+Usage: python scripts/reconcile_payments.py [--since YYYY-MM-DD] [--page-size N]
+    [--rate CALLS_PER_SECOND] [--concurrency N] [--dry-run] [--interval SECONDS]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from routes.payment import gateway, razorpay_client
+from utils.reconciliation import DEFAULT_PAGE_SIZE, reconcile_payments
+
+# Categories the job cannot fix on its own
+MANUAL = ('paid_awaiting_allocation', 'captured_for_cancelled', 'paid_without_capture', 'authorized_not_captured')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--since', type=datetime.fromisoformat, help='orders created on or after this time')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--rate', type=float, default=5.0, help='gateway calls per second')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--dry-run', action='store_true', help='report only, write nothing')
+    parser.add_argument('--interval', type=int, default=0, help='repeat every N seconds')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database('raft_booking')
+
+    while True:
+        started = time.perf_counter()
+        report = reconcile_payments(db, razorpay_client, gateway, since=args.since, page_size=args.page_size,
+                                    rate=args.rate, concurrency=args.concurrency, dry_run=args.dry_run)
+        print(f"[OK] {report['checked']} unsettled booking(s) since {report['since']:%Y-%m-%d %H:%M}, "
+              f"{report['fixed']} fix(es){' (dry run)' if args.dry_run else ''} "
+              f"in {time.perf_counter() - started:.2f}s")
+        for name, count in sorted(report['categories'].items()):
+            print(f"  {name:<26} {count:6d}  {' '.join(report['examples'][name][:5])}")
+        manual = sum(report['categories'].get(name, 0) for name in MANUAL)
+        if args.interval <= 0:
+            sys.exit(1 if manual else 0)
+        args.since = None
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
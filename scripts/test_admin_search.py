@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Check utils.admin_queries.search_bookings with the sub-admin scope used by
+/admin/api/search: a sub-admin finds today's confirmed booking but not the
+same customer's booking from last week, which an admin still finds.
+
+Runs against a scratch database (raft_booking_search_test) on MONGO_URI.
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from models.booking_model import search_keys
+from routes.admin_routes import _subadmin_booking_filter
+from utils.admin_queries import search_bookings
+
+
+def test_subadmin_search_scope():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_search_test']
+    db.bookings.delete_many({})
+
+    def booking(day, status):
+        doc = {'user_name': 'Asha Rao', 'email': 'asha@example.com', 'phone': '+91 98765 43210',
+               'date': day.isoformat(), 'slot': '7:00–9:00', 'group_size': 2, 'status': status}
+        doc.update(search_keys(doc['user_name'], doc['email'], doc['phone']))
+        return db.bookings.insert_one(doc).inserted_id
+
+    today = date.today()
+    current = booking(today, 'Confirmed')
+    last_week = booking(today - timedelta(days=7), 'Confirmed')
+    pending = booking(today, 'Pending')
+
+    ok = True
+    scope = _subadmin_booking_filter({})
+    for q in ('asha', '9876543210', 'asha@example.com', str(last_week)):
+        found = {b['_id'] for b in search_bookings(db, q, scope=scope)[0]}
+        ok &= last_week not in found and pending not in found
+    ok &= {b['_id'] for b in search_bookings(db, 'asha', scope=scope)[0]} == {current}
+    ok &= {b['_id'] for b in search_bookings(db, 'asha')[0]} == {current, last_week, pending}
+
+    client.drop_database('raft_booking_search_test')
+    print("[OK] sub-admin search is limited to today and tomorrow" if ok else "[FAIL] sub-admin search scope")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_subadmin_search_scope()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Check utils.archive: past dates are moved out of bookings / rafts / payments
+into the *_archive collections or gzip JSON-lines files, recent dates stay,
+and restore_archive brings back exactly the documents that were archived.
+
+Runs against a scratch database (raft_booking_archive_test) on MONGO_URI.
+"""
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.archive import archive_before, archive_cutoff, restore_archive
+from utils.daily_stats import rebuild_daily_stats
+
+SLOTS = ['7:00–9:00', '10:00–12:00']
+
+
+def seed(db):
+    for name in ('bookings', 'rafts', 'payments', 'bookings_archive', 'rafts_archive', 'payments_archive',
+                 'daily_stats'):
+        db[name].delete_many({})
+    today = date.today()
+    for offset in range(-100, 10, 5):
+        day = (today + timedelta(days=offset)).isoformat()
+        for slot in SLOTS:
+            db.rafts.insert_many([{'day': day, 'slot': slot, 'raft_id': rid, 'occupancy': 0, 'capacity': 6}
+                                  for rid in range(1, 6)])
+            oid = db.bookings.insert_one({
+                'date': day, 'slot': slot, 'group_size': 4, 'status': 'Confirmed',
+                'razorpay_order_id': f'order_{day}_{slot}', 'created_at': datetime.utcnow(),
+            }).inserted_id
+            db.payments.insert_one({'booking_id': str(oid), 'order_id': f'order_{day}_{slot}',
+                                    'payment_id': f'pay_{oid}', 'status': 'paid'})
+
+
+def snapshot(db):
+    return {
+        'bookings': sorted(str(b['_id']) for b in db.bookings.find()),
+        'rafts': sorted((r['day'], r['slot'], r['raft_id']) for r in db.rafts.find()),
+        'payments': sorted(p['payment_id'] for p in db.payments.find()),
+    }
+
+
+def rollups(db):
+    return sorted((r['date'], r['slot'], r['bookings'], r['headcount']) for r in db.daily_stats.find())
+
+
+def test_archive_roundtrip():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_archive_test']
+    ok = True
+    cutoff = archive_cutoff(30)
+
+    for directory in (None, tempfile.mkdtemp()):
+        seed(db)
+        rebuild_daily_stats(db)
+        before, stats = snapshot(db), rollups(db)
+        dry = archive_before(db, cutoff, directory=directory, batch_size=7, dry_run=True)
+        report = archive_before(db, cutoff, directory=directory, batch_size=7)
+        rebuild_daily_stats(db)
+        ok &= rollups(db) == stats
+        ok &= all(dry[k] == report[k] > 0 for k in ('bookings', 'rafts', 'payments'))
+        ok &= db.bookings.count_documents({'date': {'$lt': cutoff}}) == 0
+        ok &= db.rafts.count_documents({'day': {'$lt': cutoff}}) == 0
+        ok &= db.bookings.count_documents({}) + report['bookings'] == len(before['bookings'])
+        ok &= db.payments.count_documents({}) + report['payments'] == len(before['payments'])
+
+        restored = restore_archive(db, paths=[directory] if directory else None, batch_size=7)
+        ok &= all(restored[k] == report[k] for k in ('bookings', 'rafts', 'payments'))
+        ok &= snapshot(db) == before
+        if directory is None:
+            ok &= db.bookings_archive.count_documents({}) == 0
+
+    client.drop_database('raft_booking_archive_test')
+    print("[OK] archive and restore round-trip" if ok else "[FAIL] archive round-trip")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_archive_roundtrip()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Check that utils.booking_ops.cancel_bookings leaves rafts, bookings and
+daily_stats exactly as cancelling the same bookings one by one with
+cancel_booking would, for bookings with and without raft_allocation_details.
+
+Runs against two scratch databases (raft_booking_cancel_bulk_test and
+raft_booking_cancel_seq_test) on MONGO_URI.
+"""
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.allocation_logic import allocate_raft
+from utils.booking_ops import cancel_booking, cancel_bookings
+from utils.daily_stats import STAT_FIELDS, rebuild_daily_stats
+
+SETTINGS = {
+    '_id': 'system_settings',
+    'capacity': 6,
+    'rafts_per_slot': 5,
+    'time_slots': ['7:00–9:00', '10:00–12:00'],
+    'weekday_amount': 1200,
+    'saturday_amount': 1500,
+}
+
+
+def seed(db, seed_value):
+    """Same pseudo-random confirmed bookings in both databases."""
+    for name in ('bookings', 'rafts', 'settings', 'daily_stats'):
+        db[name].delete_many({})
+    db.settings.insert_one(dict(SETTINGS))
+    rng = random.Random(seed_value)
+    start = date.today()
+    ids = []
+    for i in range(30):
+        day = (start + timedelta(days=i % 3)).isoformat()
+        slot = SETTINGS['time_slots'][i % 2]
+        group = rng.choice([2, 4, 5, 6, 7, 8, 9])
+        res = allocate_raft(db, None, day, slot, group)
+        doc = {
+            'date': day, 'slot': slot, 'group_size': group,
+            'status': 'Confirmed' if res.get('rafts') else 'Pending', 'payment_status': 'Paid',
+            'raft_allocations': res.get('rafts', []),
+            # Every third booking predates raft_allocation_details
+            'raft_allocation_details': res.get('raft_details', []) if i % 3 else [],
+        }
+        ids.append(db.bookings.insert_one(doc).inserted_id)
+    rebuild_daily_stats(db)
+    return ids
+
+
+def state(db):
+    rafts = sorted((r['day'], r['slot'], r['raft_id'], r.get('occupancy', 0), r.get('is_special', False))
+                   for r in db.rafts.find())
+    bookings = sorted((b['date'], b['slot'], b['group_size'], b['status'], tuple(b.get('raft_allocations') or []))
+                      for b in db.bookings.find())
+    stats = sorted((r['date'], r['slot'], tuple(r.get(f, 0) for f in STAT_FIELDS)) for r in db.daily_stats.find())
+    return rafts, bookings, stats
+
+
+def test_bulk_cancel_matches_sequential():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    bulk_db = client['raft_booking_cancel_bulk_test']
+    seq_db = client['raft_booking_cancel_seq_test']
+
+    bulk_ids = seed(bulk_db, 7)
+    seq_ids = seed(seq_db, 7)
+    picks = list(range(0, 30, 2)) + [1, 5]
+
+    for i in picks:
+        cancel_booking(seq_db, seq_ids[i])
+    res = cancel_bookings(bulk_db, [bulk_ids[i] for i in picks])
+
+    ok = res['cancelled'] == len(picks) and state(bulk_db) == state(seq_db)
+    client.drop_database(bulk_db.name)
+    client.drop_database(seq_db.name)
+    print("[OK] bulk cancel matches one-by-one cancel" if ok else "[FAIL] bulk cancel diverged")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_bulk_cancel_matches_sequential()
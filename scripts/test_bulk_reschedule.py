@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Close a whole day with utils.booking_ops.reschedule_closed_slots and check:
+- the dry run plans exactly the moves the real run makes;
+- every raft's occupancy equals the seats its confirmed bookings hold;
+- daily_stats still match a full rebuild;
+- bookings that did not fit are reported and left in place.
+
+Runs against a scratch database (raft_booking_reschedule_test) on MONGO_URI.
+"""
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.allocation_logic import allocate_raft
+from utils.booking_ops import reschedule_closed_slots
+from utils.daily_stats import STAT_FIELDS, rebuild_daily_stats
+from utils.occupancy import booking_seats_by_raft
+
+SLOTS = ['7:00–9:00', '10:00–12:00', '13:00–15:00']
+SETTINGS = {
+    '_id': 'system_settings',
+    'capacity': 6,
+    'rafts_per_slot': 5,
+    'time_slots': SLOTS,
+    'weekday_amount': 1200,
+    'saturday_amount': 1500,
+}
+
+
+def stats(db):
+    return sorted((r['date'], r['slot'], tuple(r.get(f, 0) for f in STAT_FIELDS)) for r in db.daily_stats.find())
+
+
+def occupancy_drift(db):
+    """(day, slot, raft_id, stored, from bookings) for every raft that disagrees."""
+    expected = {}
+    for b in db.bookings.find({'status': 'Confirmed'}):
+        for rid, seats in booking_seats_by_raft(b).items():
+            key = (b['date'], b['slot'], rid)
+            expected[key] = expected.get(key, 0) + seats
+    drift = []
+    for r in db.rafts.find():
+        key = (r['day'], r['slot'], r['raft_id'])
+        if r.get('occupancy', 0) != expected.get(key, 0):
+            drift.append(key + (r.get('occupancy', 0), expected.get(key, 0)))
+    return drift
+
+
+def test_reschedule_closed_day():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_reschedule_test']
+    for name in ('bookings', 'rafts', 'settings', 'daily_stats'):
+        db[name].delete_many({})
+    db.settings.insert_one(dict(SETTINGS))
+
+    rng = random.Random(3)
+    closed_day = (date.today() + timedelta(days=1)).isoformat()
+    spare_day = (date.today() + timedelta(days=2)).isoformat()
+    empty_day = (date.today() + timedelta(days=3)).isoformat()
+    for i in range(26):
+        day = closed_day if i % 2 else spare_day
+        slot = SLOTS[i % len(SLOTS)]
+        group = rng.choice([2, 3, 4, 5, 6, 7, 9, 12])
+        res = allocate_raft(db, None, day, slot, group)
+        if res.get('status') == 'Confirmed':
+            db.bookings.insert_one({
+                'date': day, 'slot': slot, 'group_size': group, 'status': 'Confirmed', 'payment_status': 'Paid',
+                'raft_allocations': res['rafts'], 'raft_allocation_details': res.get('raft_details', []),
+            })
+    rebuild_daily_stats(db)
+    assert not occupancy_drift(db)
+
+    planned = reschedule_closed_slots(db, closed_day, target_dates=[spare_day, empty_day], dry_run=True)
+    res = reschedule_closed_slots(db, closed_day, target_dates=[spare_day, empty_day])
+
+    incremental = stats(db)
+    rebuild_daily_stats(db)
+    drift = occupancy_drift(db)
+    left = db.bookings.count_documents({'date': closed_day, 'status': 'Confirmed'})
+
+    ok = True
+    if planned['moved'] != res['moved'] or planned['unplaced'] != res['unplaced']:
+        print("[FAIL] dry run plan differs from the committed moves")
+        ok = False
+    if drift:
+        print(f"[FAIL] raft occupancy drifted: {drift}")
+        ok = False
+    if incremental != stats(db):
+        print("[FAIL] daily_stats differ from a rebuild")
+        ok = False
+    if left != len(res['unplaced']):
+        print(f"[FAIL] {left} booking(s) left on {closed_day}, {len(res['unplaced'])} reported unplaced")
+        ok = False
+
+    past_day = (date.today() - timedelta(days=1)).isoformat()
+    if 'error' not in reschedule_closed_slots(db, closed_day, target_dates=[past_day], dry_run=True):
+        print("[FAIL] bookings planned onto a past date")
+        ok = False
+
+    client.drop_database(db.name)
+    print(f"[OK] moved {len(res['moved'])}, unplaced {len(res['unplaced'])}" if ok else "[FAIL] reschedule check failed")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_reschedule_closed_day()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Check utils.exports.stream_csv: text cells a spreadsheet would run as a
+formula (=, +, -, @, tab, carriage return) come out with a leading apostrophe,
+while numbers, negative amounts included, and ordinary text are unchanged.
+
+Needs no database.
+"""
+import csv
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.exports import BOOKING_EXPORT_HEADER, CSV_BOM, booking_export_row, stream_csv
+
+
+def parse(chunks):
+    text = ''.join(chunks)
+    assert text.startswith(CSV_BOM)
+    return list(csv.reader(io.StringIO(text[len(CSV_BOM):])))
+
+
+def test_formula_cells_are_escaped():
+    booking = {
+        '_id': 'b1', 'date': '2026-10-20', 'slot': '7:00–9:00',
+        'user_name': '=HYPERLINK("http://evil.example","click")', 'phone': '+919876543210',
+        'email': '@SUM(A1:A2)', 'group_size': 4, 'raft_allocations': [1, 2],
+        'status': '-2+3', 'payment_status_display': '\tPaid',
+        'total_amount': -500, 'advance_amount': 0, 'balance_amount': 1200.5,
+        'created_at_ist': '19-10-2026 10:14 AM',
+    }
+    header, row = parse(stream_csv(BOOKING_EXPORT_HEADER, [booking_export_row(booking)]))
+    ok = header == BOOKING_EXPORT_HEADER
+    ok &= row[3] == '\'=HYPERLINK("http://evil.example","click")'
+    ok &= row[4] == "'+919876543210"
+    ok &= row[5] == "'@SUM(A1:A2)"
+    ok &= row[8] == "'-2+3"
+    ok &= row[9] == "'\tPaid"
+    # Numbers stay numbers, and ordinary text is left alone
+    ok &= row[6] == '4' and row[10] == '-500' and row[12] == '1200.5'
+    ok &= row[:3] == ['b1', '2026-10-20', '7:00–9:00'] and row[7] == '1 2'
+    print("[OK] CSV export escapes formula cells" if ok else "[FAIL] CSV export let a formula through")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_formula_cells_are_escaped()
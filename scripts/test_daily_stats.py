@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Check that incremental daily_stats updates (utils/daily_stats.record_booking_change)
+end up identical to a full rebuild_daily_stats over the same bookings,
+including weekend pricing, cancellations and postponements.
+
+Runs against a scratch database (raft_booking_stats_test) on MONGO_URI.
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.daily_stats import STAT_FIELDS, record_booking_change, rebuild_daily_stats
+
+SETTINGS = {
+    'weekday_amount': 1200,
+    'saturday_amount': 1500,
+    'weekday_advance_percent': 25,
+    'saturday_advance_percent': 35,
+}
+SLOTS = ['7:00–9:00', '10:00–12:00']
+
+
+def snapshot(db):
+    rows = {}
+    for r in db.daily_stats.find():
+        values = {f: r.get(f, 0) for f in STAT_FIELDS if r.get(f, 0)}
+        if values:
+            rows[(r['date'], r['slot'])] = values
+    return rows
+
+
+def test_incremental_matches_rebuild():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_stats_test']
+    db.bookings.delete_many({})
+    db.daily_stats.delete_many({})
+
+    start = date.today()
+    ids = []
+    for i in range(21):
+        doc = {'date': (start + timedelta(days=i % 7)).isoformat(), 'slot': SLOTS[i % 2],
+               'group_size': i % 6 + 1, 'status': 'Pending', 'payment_status': 'Pending'}
+        doc['_id'] = db.bookings.insert_one(doc).inserted_id
+        record_booking_change(db, None, doc, SETTINGS)
+        ids.append(doc['_id'])
+
+    def change(oid, updates):
+        before = db.bookings.find_one({'_id': oid})
+        db.bookings.update_one({'_id': oid}, {'$set': updates})
+        record_booking_change(db, before, db.bookings.find_one({'_id': oid}), SETTINGS)
+
+    for oid in ids[::2]:
+        change(oid, {'status': 'Confirmed', 'payment_status': 'Paid'})
+    for oid in ids[:4]:
+        change(oid, {'status': 'Cancelled'})
+    for oid in ids[6:12:2]:
+        b = db.bookings.find_one({'_id': oid})
+        change(oid, {'date': (start + timedelta(days=10)).isoformat(), 'slot': SLOTS[0],
+                     'postponed_from': {'date': b['date'], 'slot': b['slot']}})
+    before = db.bookings.find_one({'_id': ids[-1]})
+    db.bookings.delete_one({'_id': ids[-1]})
+    record_booking_change(db, before, None, SETTINGS)
+
+    incremental = snapshot(db)
+    rebuild_daily_stats(db, SETTINGS)
+    rebuilt = snapshot(db)
+
+    ok = incremental == rebuilt
+    for key in sorted(set(incremental) | set(rebuilt)):
+        if incremental.get(key) != rebuilt.get(key):
+            print(f"[FAIL] {key}: incremental {incremental.get(key)}, rebuilt {rebuilt.get(key)}")
+
+    client.drop_database('raft_booking_stats_test')
+    print("[OK] incremental daily_stats match a full rebuild" if ok else "[FAIL] daily_stats drifted")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_incremental_matches_rebuild()
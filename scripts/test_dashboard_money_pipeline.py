@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Check that the dashboard aggregation (utils/admin_queries.money_stages) prices
+bookings exactly like utils/amount_calculator.calculate_total_amount.
+
+Runs against a scratch database (raft_booking_money_test) on MONGO_URI.
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.admin_queries import fetch_dashboard_page
+from utils.amount_calculator import calculate_total_amount
+
+SETTINGS = {
+    'weekday_amount': 1200,
+    'saturday_amount': 1500,
+    'weekday_advance_percent': 25,
+    'saturday_advance_percent': 35,
+}
+
+
+def test_money_pipeline_matches_calculator():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_money_test']
+    db.bookings.delete_many({})
+
+    start = date.today()
+    docs = []
+    for i in range(14):
+        d = (start + timedelta(days=i)).isoformat()
+        docs.append({'date': d, 'slot_index': 0, 'group_size': i + 1, 'status': 'Confirmed',
+                     'payment_status': 'Paid' if i % 2 else 'Pending'})
+    docs.append({'date': 'not-a-date', 'slot_index': 0, 'group_size': 3, 'status': 'Pending', 'payment_status': 'Pending'})
+    docs.append({'date': start.isoformat(), 'slot_index': 0, 'group_size': 5, 'status': 'Cancelled', 'payment_status': 'Paid'})
+    db.bookings.insert_many(docs)
+
+    rows, _, totals = fetch_dashboard_page(db, {}, SETTINGS, page_size=None)
+    expected_range = {'headcount': 0, 'revenue': 0, 'advance_collected': 0, 'outstanding_balance': 0}
+    ok = True
+    for row in rows:
+        amt = calculate_total_amount(SETTINGS, row['date'], int(row['group_size']))
+        total = amt.get('total_amount', 0)
+        advance = amt.get('advance_amount', 0)
+        paid = row['payment_status'].lower() == 'paid'
+        balance = max(total - advance, 0) if paid else total
+        got = (row['total_amount'], row['advance_amount'], row['balance_amount'])
+        want = (total, advance, balance)
+        if any(abs(g - w) > 1e-6 for g, w in zip(got, want)):
+            ok = False
+            print(f"[FAIL] {row['date']} x{row['group_size']}: got {got}, want {want}")
+        if row['status'] != 'Cancelled':
+            expected_range['headcount'] += int(row['group_size'])
+            expected_range['revenue'] += total
+            expected_range['advance_collected'] += advance if paid else 0
+            expected_range['outstanding_balance'] += balance
+
+    for key, want in expected_range.items():
+        if abs(totals['range'][key] - want) > 1e-6:
+            ok = False
+            print(f"[FAIL] range {key}: got {totals['range'][key]}, want {want}")
+
+    client.drop_database('raft_booking_money_test')
+    print("[OK] aggregation matches calculate_total_amount" if ok else "[FAIL] mismatches found")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_money_pipeline_matches_calculator()
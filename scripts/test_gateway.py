@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Check utils.gateway against scripts/fake_razorpay_server.py: deadlines are
+kept when the gateway is slow, transient failures are retried, the circuit
+breaker opens and fails fast, client errors are not retried and the queue is
+bounded. Needs no database.
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import razorpay
+from fake_razorpay_server import start_server
+from utils.gateway import CircuitBreaker, Gateway, GatewayUnavailable
+
+ORDER = {'amount': 50000, 'currency': 'INR', 'payment_capture': 1}
+
+
+def expect_unavailable(fn):
+    started = time.monotonic()
+    try:
+        fn()
+    except GatewayUnavailable:
+        return time.monotonic() - started
+    raise AssertionError("GatewayUnavailable not raised")
+
+
+def test_gateway():
+    server, state = start_server()
+    client = razorpay.Client(auth=('key', 'secret'), base_url=f'http://127.0.0.1:{server.server_port}')
+    create = client.order.create
+    ok = True
+
+    gw = Gateway(max_workers=4, deadline=2.0, retries=3, backoff=0.05, breaker=CircuitBreaker(failure_threshold=100))
+    ok &= gw.call(create, ORDER)['status'] == 'created'
+
+    # Slow gateway: the caller gets control back at the deadline
+    state.latency = 1.0
+    waited = expect_unavailable(lambda: gw.call(create, ORDER, deadline=0.3))
+    ok &= waited < 0.6
+    state.latency = 0.0
+
+    # Down for a moment: retries get through once it is back
+    state.down = True
+    threading.Timer(0.1, lambda: setattr(state, 'down', False)).start()
+    ok &= gw.call(create, ORDER, retries=10)['id'].startswith('order_')
+
+    # Client errors are raised as-is and not retried
+    calls = state.calls
+    try:
+        gw.call(create, dict(ORDER, amount=0))
+        ok = False
+    except razorpay.errors.BadRequestError:
+        ok &= state.calls == calls + 1
+
+    # Breaker: opens after 3 failures, fails fast without calling out, recovers after reset
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.3)
+    gw2 = Gateway(max_workers=2, deadline=1.0, retries=0, breaker=breaker)
+    state.down = True
+    for _ in range(3):
+        expect_unavailable(lambda: gw2.call(create, ORDER))
+    calls = state.calls
+    ok &= breaker.state == 'open'
+    ok &= expect_unavailable(lambda: gw2.call(create, ORDER)) < 0.05 and state.calls == calls
+    state.down = False
+    time.sleep(0.35)
+    ok &= breaker.state == 'half-open' and gw2.call(create, ORDER)['id'] and breaker.state == 'closed'
+
+    # Bounded queue: with one worker and no queue a second concurrent call is refused
+    gw3 = Gateway(max_workers=1, max_queue=0, deadline=2.0, retries=0)
+    state.latency = 0.5
+    first = threading.Thread(target=lambda: gw3.call(create, ORDER))
+    first.start()
+    time.sleep(0.1)
+    ok &= expect_unavailable(lambda: gw3.call(create, ORDER)) < 0.05
+    first.join()
+    state.latency = 0.0
+
+    for g in (gw, gw2, gw3):
+        g.shutdown()
+    server.shutdown()
+    print("[OK] gateway deadlines, retries and circuit breaker" if ok else "[FAIL] gateway")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_gateway()
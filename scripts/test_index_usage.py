@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Check that every hot query shape is served by an index from the registry
+(models/indexes.py): the registry is applied to a scratch database, a few
+documents are seeded and each query is explained; any COLLSCAN in the
+winning plan fails the test.
+
+Needs a real mongod (explain is not emulated); runs against a scratch
+database (raft_booking_explain_test) on MONGO_URI.
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import MongoClient
+from config import MONGO_URI
+from models.indexes import ensure_indexes
+from utils.reconciliation import UNSETTLED_FILTER
+from utils.webhook_outbox import _ready_filter
+
+SLOT = '7:00–9:00'
+
+
+def hot_queries():
+    """(label, collection, filter, sort) for the queries the request paths and jobs run."""
+    today = date.today().isoformat()
+    later = (date.today() + timedelta(days=30)).isoformat()
+    now = datetime.utcnow()
+    return [
+        ('allocate_raft: slot rafts', 'rafts', {'day': today, 'slot': SLOT}, [('raft_id', 1)]),
+        ('postpone: one raft', 'rafts', {'day': today, 'slot': SLOT, 'raft_id': 3}, None),
+        ('ensure_rafts_for_dates', 'rafts', {'day': {'$in': [today, later]}, 'slot': {'$in': [SLOT]}}, None),
+        ('calendar occupancy: rafts', 'rafts', {'day': {'$gte': today, '$lte': later}, 'slot': {'$in': [SLOT]}},
+         [('day', 1), ('raft_id', 1)]),
+        ('recompute occupancy', 'bookings', {'status': 'Confirmed', 'date': today, 'slot': SLOT}, None),
+        ('calendar occupancy: bookings', 'bookings', {'date': {'$gte': today, '$lte': later}, 'status': 'Confirmed'},
+         [('date', 1)]),
+        ('verify_payment / webhook', 'bookings', {'razorpay_order_id': 'order_00000001'}, None),
+        ('track booking', 'bookings', {'$and': [
+            {'$or': [{'email': 'guest1@example.com'}, {'phone': '9800000001'}]},
+            {'date': {'$gte': today}, 'status': {'$ne': 'Expired'}},
+        ]}, [('created_at', -1)]),
+        ('admin search: phone', 'bookings', {'phone_digits': '9800000001'}, [('date', -1)]),
+        ('dashboard delta', 'bookings', {'updated_at': {'$gt': now - timedelta(minutes=1)}}, None),
+        ('pending expiry', 'bookings', {'status': 'Pending', 'expires_at': {'$lte': now}}, None),
+        ('reconciliation page', 'bookings', dict(UNSETTLED_FILTER, payment_order_created_at={'$gte': now}),
+         [('_id', 1)]),
+        ('login', 'users', {'email': 'admin@example.com'}, None),
+        ('payment by id', 'payments', {'payment_id': 'pay_00000001'}, None),
+        ('payments of orders', 'payments', {'order_id': {'$in': ['order_00000001', 'order_00000002']}}, None),
+        ('seat holds', 'seat_holds', {'date': today, 'slot': SLOT, 'expires_at': {'$gt': now}}, None),
+        ('outbox claim', 'webhook_outbox', _ready_filter(now), [('received_at', 1)]),
+        ('daily_stats row', 'daily_stats', {'date': today, 'slot': SLOT}, None),
+    ]
+
+
+def seed(db):
+    today = date.today()
+    bookings, rafts = [], []
+    for i in range(300):
+        day = (today + timedelta(days=i % 30)).isoformat()
+        bookings.append({
+            'date': day, 'slot': SLOT, 'status': 'Confirmed', 'group_size': 2,
+            'email': f'guest{i}@example.com', 'phone': f'98{i:08d}', 'phone_digits': f'98{i:08d}',
+            'razorpay_order_id': f'order_{i:08d}', 'payment_status': 'Paid', 'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(), 'payment_order_created_at': datetime.utcnow(),
+        })
+        rafts.append({'day': day, 'slot': SLOT, 'raft_id': i % 5 + 1, 'occupancy': 0})
+    db.bookings.insert_many(bookings)
+    db.rafts.insert_many(rafts)
+    db.users.insert_many([{'email': f'user{i}@example.com'} for i in range(50)])
+    db.payments.insert_many([{'payment_id': f'pay_{i:08d}', 'order_id': f'order_{i:08d}',
+                              'booking_id': str(ObjectId())} for i in range(100)])
+
+
+def collscans(plan):
+    """Stages of an explain plan tree that scan the whole collection."""
+    found = ['COLLSCAN'] if plan.get('stage') == 'COLLSCAN' else []
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            found += collscans(plan[key])
+    for child in plan.get('inputStages', []):
+        found += collscans(child)
+    return found
+
+
+def test_index_usage():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    client.drop_database('raft_booking_explain_test')
+    db = client['raft_booking_explain_test']
+    ensure_indexes(db)
+    seed(db)
+
+    failures = []
+    for label, collection, query, sort in hot_queries():
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = cursor.explain()['queryPlanner']['winningPlan']
+        if collscans(winning):
+            failures.append(label)
+            print(f"  COLLSCAN: {label} ({collection} {query})")
+
+    client.drop_database('raft_booking_explain_test')
+    print("[OK] every hot query uses an index" if not failures else f"[FAIL] {len(failures)} query shape(s) scan")
+    assert not failures
+
+
+if __name__ == '__main__':
+    test_index_usage()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Check utils.occupancy_audit: corrupted raft occupancies are reported per
+(date, slot), healed back to what the confirmed bookings imply, and
+audit_recent_changes only looks at slots of bookings changed or deleted since
+its checkpoint, apart from its periodic full audit.
+
+Runs against a scratch database (raft_booking_audit_test) on MONGO_URI.
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from models.booking_model import record_booking_tombstones
+from utils.allocation_logic import allocate_raft
+from utils.occupancy_audit import audit_occupancy, audit_recent_changes
+
+SETTINGS = {
+    '_id': 'system_settings',
+    'capacity': 6,
+    'rafts_per_slot': 5,
+    'time_slots': ['7:00–9:00', '10:00–12:00'],
+}
+
+
+def seed(db):
+    for name in ('bookings', 'rafts', 'settings', 'occupancy_audits', 'job_checkpoints', 'booking_tombstones'):
+        db[name].delete_many({})
+    db.settings.insert_one(dict(SETTINGS))
+    start = date.today()
+    for i, group in enumerate([4, 6, 7, 9, 5, 12]):
+        day = (start + timedelta(days=i % 3)).isoformat()
+        slot = SETTINGS['time_slots'][i % 2]
+        res = allocate_raft(db, None, day, slot, group)
+        db.bookings.insert_one({
+            'date': day, 'slot': slot, 'group_size': group, 'status': 'Confirmed',
+            'raft_allocations': res.get('rafts', []), 'raft_allocation_details': res.get('raft_details', []),
+            'updated_at': datetime.utcnow() - timedelta(hours=1, minutes=-i),
+        })
+
+
+def test_audit_and_heal():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_audit_test']
+    seed(db)
+    ok = True
+
+    clean = audit_occupancy(db)
+    ok &= clean['drifted_slots'] == 0 and clean['slots_checked'] > 0
+
+    day = date.today().isoformat()
+    slot = SETTINGS['time_slots'][0]
+    db.rafts.update_one({'day': day, 'slot': slot, 'raft_id': 1}, {'$inc': {'occupancy': 3}})
+    drifted = audit_occupancy(db)
+    ok &= drifted['drifted_slots'] == 1 and drifted['seat_drift'] == 3
+    ok &= [(e['date'], e['slot']) for e in drifted['drift']] == [(day, slot)]
+
+    healed = audit_occupancy(db, heal=True)
+    ok &= healed['healed'] == 1 and audit_occupancy(db)['drifted_slots'] == 0
+    ok &= db.occupancy_audits.count_documents({}) == 4
+
+    # First --recent run sets the checkpoint; later runs only see changed slots
+    audit_recent_changes(db)
+    other = ((date.today() + timedelta(days=1)).isoformat(), SETTINGS['time_slots'][1])
+    db.rafts.update_one({'day': other[0], 'slot': other[1], 'raft_id': 1}, {'$inc': {'occupancy': 2}})
+    quiet = audit_recent_changes(db)
+    # (the newest booking is re-read within the overlap, its slot is clean)
+    ok &= quiet['changed_bookings'] == 1 and quiet['drifted_slots'] == 0
+
+    db.bookings.update_one({'date': other[0], 'slot': other[1]}, {'$set': {'updated_at': datetime.utcnow()}})
+    recent = audit_recent_changes(db, heal=True)
+    ok &= recent['changed_bookings'] == 2 and recent['slots_checked'] == 2
+    ok &= [(e['date'], e['slot'], e['healed']) for e in recent['drift']] == [other + (True,)]
+    ok &= audit_occupancy(db, slots=[other])['drifted_slots'] == 0
+
+    # A deleted booking leaves its seats behind: found through booking_tombstones
+    gone = db.bookings.find_one({'date': other[0], 'slot': other[1]})
+    db.bookings.delete_one({'_id': gone['_id']})
+    record_booking_tombstones(db, [gone])
+    deleted = audit_recent_changes(db)
+    ok &= deleted['changed_bookings'] == 0 and not deleted['full']
+    ok &= [(e['date'], e['slot']) for e in deleted['drift']] == [other]
+
+    # Drift no booking change points at is left to the periodic full audit
+    audit_occupancy(db, heal=True)
+    db.rafts.update_one({'day': day, 'slot': slot, 'raft_id': 2}, {'$inc': {'occupancy': 1}})
+    ok &= audit_recent_changes(db)['drifted_slots'] == 0
+    full = audit_recent_changes(db, full_every=timedelta(0))
+    ok &= full['full'] and [(e['date'], e['slot']) for e in full['drift']] == [(day, slot)]
+
+    client.drop_database('raft_booking_audit_test')
+    print("[OK] occupancy audit reports and heals drift" if ok else "[FAIL] occupancy audit")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_audit_and_heal()
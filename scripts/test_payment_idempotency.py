@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Check the unique payment_id / razorpay_order_id indexes and the upserts
+that rely on them: many bookings may still have no order, a payment
+verified and delivered by webhook concurrently ends up as one payments
+document, and an order id cannot be stored on two bookings.
+
+Runs against a scratch database (raft_booking_idempotency_test) on MONGO_URI.
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+from config import MONGO_URI
+from models.indexes import INDEXES, ensure_indexes
+from models.payment_model import insert_payment
+from utils.webhook_outbox import process_webhook_event
+
+
+def test_payment_idempotency():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_idempotency_test']
+    for name in ('bookings', 'payments', 'daily_stats'):
+        db[name].drop()
+    ensure_indexes(db, {name: INDEXES[name] for name in ('bookings', 'payments')})
+
+    ok = True
+    # Bookings without an order yet (None) do not collide
+    db.bookings.insert_many([{'razorpay_order_id': None, 'status': 'Pending'} for _ in range(3)])
+    db.bookings.insert_one({'razorpay_order_id': 'order_1', 'status': 'Pending', 'payment_status': 'Pending'})
+    try:
+        db.bookings.insert_one({'razorpay_order_id': 'order_1'})
+        ok = False
+    except DuplicateKeyError:
+        pass
+
+    # verify_payment and the webhook race for the same payment
+    def verify(_):
+        insert_payment(db, 'b1', 'order_1', 'pay_1', 'sig', 1000, 'paid', {})
+
+    def webhook(_):
+        process_webhook_event(db, {'event': 'payment.captured', 'payment_id': 'pay_1', 'order_id': 'order_1',
+                                   'status': 'captured', 'received_at': datetime.utcnow()})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: (verify if i % 2 else webhook)(i), range(16)))
+    payments = list(db.payments.find({'payment_id': 'pay_1'}))
+    ok &= len(payments) == 1
+    ok &= payments[0].get('booking_id') == 'b1' and payments[0].get('webhook_verified') is True
+
+    client.drop_database('raft_booking_idempotency_test')
+    print("[OK] payment writes are idempotent per payment id" if ok else "[FAIL] payment idempotency")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_payment_idempotency()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Check utils.reconciliation against scripts/fake_razorpay_server.py: missed
+captures and failures are fixed, a missing payments document is inserted,
+paid-but-unconfirmed bookings are flagged (unless the capture is recent
+enough for verify_payment to still be running), the checkpoint moves
+forward and a second run finds nothing left to fix.
+
+Runs against a scratch database (raft_booking_reconcile_test) on MONGO_URI.
+"""
+import json
+import os
+import sys
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import razorpay
+from pymongo import MongoClient
+from config import MONGO_URI
+from fake_razorpay_server import start_server
+from utils.checkpoints import load_checkpoint
+from utils.gateway import CircuitBreaker, Gateway
+from utils.reconciliation import CHECKPOINT_JOB, reconcile_payments
+
+SETTINGS = {'_id': 'system_settings', 'capacity': 6, 'rafts_per_slot': 5, 'time_slots': ['7:00–9:00']}
+
+
+def test_payment_reconciliation():
+    server, state = start_server()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    rzp = razorpay.Client(auth=('key', 'secret'), base_url=base_url)
+    gw = Gateway(max_workers=4, deadline=2.0, retries=1, backoff=0.05, breaker=CircuitBreaker(failure_threshold=100))
+
+    def pay(order_id, status, age=timedelta(minutes=10)):
+        body = {'order_id': order_id, 'status': status, 'created_at': int(time.time() - age.total_seconds())}
+        req = urllib.request.Request(f'{base_url}/__payments', json.dumps(body).encode(),
+                                     {'Content-Type': 'application/json'})
+        return json.load(urllib.request.urlopen(req))['id']
+
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_reconcile_test']
+    for name in ('bookings', 'payments', 'settings', 'daily_stats', 'job_checkpoints'):
+        db[name].delete_many({})
+    db.settings.insert_one(dict(SETTINGS))
+
+    def booking(name, **fields):
+        order = rzp.order.create({'amount': 50000, 'currency': 'INR'})
+        doc = dict({'name': name, 'date': '2099-01-01', 'slot': SETTINGS['time_slots'][0], 'group_size': 2,
+                    'status': 'Pending', 'payment_status': 'Pending', 'razorpay_order_id': order['id'],
+                    'payment_order_created_at': datetime.utcnow() - timedelta(minutes=15)}, **fields)
+        db.bookings.insert_one(doc)
+        return doc
+
+    missed_webhook = booking('missed_webhook')
+    pay(missed_webhook['razorpay_order_id'], 'captured')
+    missed_verify = booking('missed_verify', payment_status='Paid')
+    captured = pay(missed_verify['razorpay_order_id'], 'captured')
+    db.payments.insert_one({'payment_id': captured, 'order_id': missed_verify['razorpay_order_id']})
+    declined = booking('declined')
+    pay(declined['razorpay_order_id'], 'failed')
+    booking('unpaid')
+    booking('unknown_order', razorpay_order_id='order_missing')
+    in_flight = booking('in_flight', payment_status='Paid')
+    pay(in_flight['razorpay_order_id'], 'captured', age=timedelta(seconds=5))
+
+    report = reconcile_payments(db, rzp, gw, rate=50)
+    expected = {'captured_not_marked_paid': 1, 'payment_record_missing': 1, 'paid_not_confirmed': 1,
+                'failed_not_marked': 1, 'awaiting_payment': 1, 'gateway_error': 1, 'awaiting_confirmation': 1}
+    ok = report['categories'] == expected and report['checked'] == 6
+
+    by_name = {b['name']: b for b in db.bookings.find()}
+    ok &= by_name['missed_webhook']['payment_status'] == 'Paid' and by_name['missed_webhook']['allocation_error']
+    ok &= by_name['missed_verify']['allocation_error'] and by_name['missed_verify']['razorpay_payment_id'] == captured
+    ok &= by_name['declined']['payment_status'] == 'Failed'
+    ok &= not by_name['in_flight'].get('allocation_error')
+    ok &= db.payments.count_documents({'source': 'reconciliation'}) == 1
+
+    # The checkpoint stays at the oldest order still waiting for the gateway
+    checkpoint = load_checkpoint(db, CHECKPOINT_JOB)
+    ok &= checkpoint['orders_since'] <= by_name['unpaid']['payment_order_created_at']
+
+    # Nothing left to fix; flagged bookings are reported for a person
+    again = reconcile_payments(db, rzp, gw, rate=50)
+    ok &= again['fixed'] == 0 and again['categories'].get('paid_awaiting_allocation') == 2
+
+    gw.shutdown()
+    server.shutdown()
+    client.drop_database('raft_booking_reconcile_test')
+    print("[OK] payment reconciliation fixes missed updates" if ok else f"[FAIL] payment reconciliation {report}")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_payment_reconciliation()
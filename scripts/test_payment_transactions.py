@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Check utils.booking_ops.confirm_paid_booking with use_transaction: the
+rafts, booking and payment are written together, when the booking no
+longer matches (changed concurrently) the raft writes are rolled back, and
+a payment the webhook records in the middle of the transaction is updated
+instead of failing the confirmation.
+
+Needs a replica set, e.g. a local single-node one:
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval 'rs.initiate()'
+Runs against a scratch database (raft_booking_txn_test) on MONGO_URI.
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+import utils.booking_ops as booking_ops
+from utils.booking_ops import confirm_paid_booking
+
+SETTINGS = {'_id': 'system_settings', 'capacity': 6, 'rafts_per_slot': 5, 'time_slots': ['7:00–9:00']}
+
+
+def test_payment_transactions():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    if not client.admin.command('hello').get('setName'):
+        print("[SKIP] payment transactions need a replica set")
+        return
+    db = client['raft_booking_txn_test']
+    for name in ('bookings', 'rafts', 'payments', 'settings', 'seat_holds'):
+        db[name].delete_many({})
+    db.settings.insert_one(dict(SETTINGS))
+    day, slot = (date.today() + timedelta(days=2)).isoformat(), SETTINGS['time_slots'][0]
+
+    def booking(group, order_id):
+        doc = {'date': day, 'slot': slot, 'group_size': group, 'status': 'Pending',
+               'payment_status': 'Pending', 'razorpay_order_id': order_id}
+        doc['_id'] = db.bookings.insert_one(doc).inserted_id
+        return doc
+
+    def payment(order_id, payment_id):
+        return {'order_id': order_id, 'payment_id': payment_id, 'signature': 'sig', 'raw_response': {}}
+
+    ok = True
+    b = booking(4, 'order_a')
+    updated, res = confirm_paid_booking(db, b, {'razorpay_order_id': 'order_a'}, (day, slot, 4),
+                                        payment('order_a', 'pay_a'), use_transaction=True)
+    ok &= updated is not None and updated['status'] == 'Confirmed' and res['status'] == 'Confirmed'
+    ok &= sum(r['occupancy'] for r in db.rafts.find()) == 4
+    ok &= db.payments.count_documents({'payment_id': 'pay_a'}) == 1
+
+    # The booking was confirmed by someone else in the meantime: the seats go back
+    b = booking(6, 'order_b')
+    updated, res = confirm_paid_booking(db, b, {'razorpay_order_id': 'order_b', 'status': 'Pending-elsewhere'},
+                                        (day, slot, 6), payment('order_b', 'pay_b'), use_transaction=True)
+    ok &= updated is None and res is None
+    ok &= sum(r['occupancy'] for r in db.rafts.find()) == 4
+    ok &= db.payments.count_documents({'payment_id': 'pay_b'}) == 0
+
+    # No room: nothing is written
+    b = booking(40, 'order_c')
+    updated, res = confirm_paid_booking(db, b, {'razorpay_order_id': 'order_c'}, (day, slot, 40),
+                                        payment('order_c', 'pay_c'), use_transaction=True)
+    ok &= updated is None and res['status'] != 'Confirmed'
+    ok &= sum(r['occupancy'] for r in db.rafts.find()) == 4
+
+    # The webhook inserts the payment while the transaction is running
+    b = booking(2, 'order_d')
+    real_insert_payment = booking_ops.insert_payment
+    raced = []
+
+    def racing_insert_payment(db_, **kwargs):
+        if not raced:
+            raced.append(True)
+            db.payments.insert_one({'payment_id': 'pay_d', 'order_id': 'order_d', 'webhook_verified': True})
+        return real_insert_payment(db_, **kwargs)
+
+    booking_ops.insert_payment = racing_insert_payment
+    try:
+        updated, res = confirm_paid_booking(db, b, {'razorpay_order_id': 'order_d'}, (day, slot, 2),
+                                            payment('order_d', 'pay_d'), use_transaction=True)
+    finally:
+        booking_ops.insert_payment = real_insert_payment
+    ok &= updated is not None and updated['status'] == 'Confirmed'
+    ok &= sum(r['occupancy'] for r in db.rafts.find()) == 6
+    recorded = list(db.payments.find({'payment_id': 'pay_d'}))
+    ok &= len(recorded) == 1 and recorded[0].get('booking_id') == str(b['_id']) and recorded[0].get('webhook_verified')
+
+    client.drop_database('raft_booking_txn_test')
+    print("[OK] payment confirmation commits atomically" if ok else "[FAIL] payment transactions")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_payment_transactions()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Check utils.booking_ops.expire_pending_bookings: only unpaid Pending bookings
+past expires_at (or, without expires_at, older than the max age) become
+Expired, in batches, and daily_stats still match a full rebuild afterwards,
+also when a payment read before the sweep confirms an expired booking.
+
+Runs against a scratch database (raft_booking_expiry_test) on MONGO_URI.
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.booking_ops import confirm_paid_booking, expire_pending_bookings
+from utils.daily_stats import STAT_FIELDS, rebuild_daily_stats
+
+SETTINGS = {'_id': 'system_settings', 'weekday_amount': 1200, 'saturday_amount': 1500}
+
+
+def stats(db):
+    return {(r['date'], r['slot']): {f: r.get(f, 0) for f in STAT_FIELDS if r.get(f, 0)}
+            for r in db.daily_stats.find()}
+
+
+def test_expire_pending():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_expiry_test']
+    for name in ('bookings', 'settings', 'daily_stats', 'payments'):
+        db[name].delete_many({})
+    db.settings.insert_one(dict(SETTINGS))
+
+    now = datetime.utcnow()
+    day = (date.today() + timedelta(days=3)).isoformat()
+    cases = {
+        # name: (status, payment_status, expires_at, created_at, expected status)
+        'expired': ('Pending', 'Pending', now - timedelta(minutes=1), now - timedelta(hours=1), 'Expired'),
+        'fresh': ('Pending', 'Pending', now + timedelta(minutes=10), now, 'Pending'),
+        'paid': ('Pending', 'Paid', now - timedelta(minutes=1), now - timedelta(hours=1), 'Pending'),
+        'confirmed': ('Confirmed', 'Paid', now - timedelta(minutes=1), now - timedelta(hours=1), 'Confirmed'),
+        'legacy_old': ('Pending', 'Pending', None, now - timedelta(hours=2), 'Expired'),
+        'legacy_new': ('Pending', 'Pending', None, now - timedelta(minutes=5), 'Pending'),
+    }
+    for i in range(7):
+        for name, (status, paid, expires_at, created_at, _) in cases.items():
+            doc = {'name': name, 'date': day, 'slot': '7:00–9:00', 'group_size': 3,
+                   'status': status, 'payment_status': paid, 'created_at': created_at}
+            if expires_at is not None or i % 2:
+                doc['expires_at'] = expires_at
+            db.bookings.insert_one(doc)
+    rebuild_daily_stats(db)
+
+    expired = expire_pending_bookings(db, max_age_minutes=30, batch_size=3)
+    ok = expired == 14
+    for name, case in cases.items():
+        statuses = {b['status'] for b in db.bookings.find({'name': name})}
+        if statuses != {case[-1]}:
+            print(f"[FAIL] {name}: {statuses}")
+            ok = False
+    ok &= expire_pending_bookings(db, max_age_minutes=30) == 0
+
+    # verify_payment read the booking while it was Pending; the sweeper expired it since
+    stale = dict(db.bookings.find_one({'name': 'expired'}), status='Pending')
+    stale.pop('expired_at', None)
+    updated, _ = confirm_paid_booking(
+        db, stale, {'_id': stale['_id']}, None,
+        {'order_id': 'order_late', 'payment_id': 'pay_late', 'signature': 'sig', 'raw_response': {}},
+    )
+    ok &= updated is not None and updated['status'] == 'Confirmed'
+
+    incremental = stats(db)
+    rebuild_daily_stats(db)
+    ok &= incremental == stats(db)
+
+    client.drop_database('raft_booking_expiry_test')
+    print("[OK] abandoned pending bookings expired" if ok else "[FAIL] pending expiry")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_expire_pending()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Check utils.seat_holds: held seats count in check_capacity_available and
+allocate_raft, a booking's own hold turns into its allocation, of two
+checkouts racing for the last seats the later hold backs out and the earlier
+one is kept, and expired holds stop counting.
+
+Runs against a scratch database (raft_booking_holds_test) on MONGO_URI.
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.allocation_logic import allocate_raft
+from utils.booking_ops import check_capacity_available
+from utils import seat_holds
+from utils.seat_holds import place_hold, release_hold
+
+SETTINGS = {'_id': 'system_settings', 'capacity': 6, 'rafts_per_slot': 5, 'time_slots': ['7:00–9:00']}
+
+
+def test_seat_holds():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_holds_test']
+    for name in ('bookings', 'rafts', 'settings', 'seat_holds'):
+        db[name].delete_many({})
+    db.settings.insert_one(dict(SETTINGS))
+    day, slot = (date.today() + timedelta(days=2)).isoformat(), SETTINGS['time_slots'][0]
+
+    def booking(group):
+        doc = {'date': day, 'slot': slot, 'group_size': group, 'status': 'Pending'}
+        doc['_id'] = db.bookings.insert_one(doc).inserted_id
+        return doc
+
+    ok = True
+    held = [booking(6) for _ in range(4)]
+    ok &= all(place_hold(db, b, 15) is not None for b in held)
+    ok &= db.rafts.count_documents({'occupancy': {'$gt': 0}}) == 0
+    # Four rafts are held: one more 6 fits, a 12 does not
+    ok &= check_capacity_available(db, day, slot, 6) and not check_capacity_available(db, day, slot, 12)
+    ok &= place_hold(db, booking(12), 15) is None
+
+    # Placing the same booking again only extends its hold
+    ok &= place_hold(db, held[0], 30) is not None and db.seat_holds.count_documents({}) == 4
+
+    # Two checkouts race for the last raft: both plan, then both write, then
+    # both re-check. The later hold backs out and the earlier one is kept
+    barrier = threading.Barrier(2)
+    plan_hold = seat_holds._plan_hold
+    placed = {}
+
+    def in_lockstep(*args, **kwargs):
+        if kwargs.get('placed_before') is not None:
+            hold = kwargs['placed_before']
+            placed[hold['booking_id']] = (hold['created_at'], hold['_id'])
+            barrier.wait()
+            return plan_hold(*args, **kwargs)
+        details = plan_hold(*args, **kwargs)
+        barrier.wait()
+        return details
+
+    seat_holds._plan_hold = in_lockstep
+    racers = [booking(6), booking(6)]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        kept = list(pool.map(lambda b: place_hold(db, b, 15), racers))
+    seat_holds._plan_hold = plan_hold
+    earlier = min(placed, key=placed.get)
+    ok &= [hold is not None for hold in kept] == [b['_id'] == earlier for b in racers]
+    ok &= [h['booking_id'] for h in db.seat_holds.find({'booking_id': {'$in': list(placed)}})] == [earlier]
+    release_hold(db, [b['_id'] for b in racers])
+
+    # Another checkout placed its hold on the last raft first: ours backs out
+    rival = booking(6)
+    db.seat_holds.insert_one({'booking_id': rival['_id'], 'date': day, 'slot': slot,
+                              'raft_details': [{'raft_id': 5, 'count': 6, 'special': False}],
+                              'expires_at': datetime.utcnow() + timedelta(minutes=5)})
+    ok &= place_hold(db, booking(6), 15) is None and not check_capacity_available(db, day, slot, 6)
+
+    # verify_payment: allocate with the booking's own hold left out, then drop the hold
+    res = allocate_raft(db, None, day, slot, 6, hold_booking_id=held[0]['_id'])
+    ok &= res.get('status') == 'Confirmed'
+    release_hold(db, held[0]['_id'])
+    ok &= sum(r['occupancy'] for r in db.rafts.find()) == 6
+    ok &= allocate_raft(db, None, day, slot, 6).get('status') != 'Confirmed'
+
+    # Expired holds no longer count
+    db.seat_holds.update_many({}, {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+    ok &= check_capacity_available(db, day, slot, 12)
+
+    client.drop_database('raft_booking_holds_test')
+    print("[OK] seat holds reserve and convert seats" if ok else "[FAIL] seat holds")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_seat_holds()
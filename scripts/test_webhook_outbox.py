@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Check utils.webhook_outbox: a repeated webhook is queued once, a drained
+capture marks the booking Paid, a late failure does not downgrade it, an
+expired lease is reclaimed and a failing event backs off.
+
+Runs against a scratch database (raft_booking_outbox_test) on MONGO_URI.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config import MONGO_URI
+from utils.webhook_outbox import claim_batch, drain_outbox, enqueue_webhook_event
+
+
+def webhook(event, payment_id, order_id, status):
+    return {'event': event, 'payload': {'payment': {'entity': {
+        'id': payment_id, 'order_id': order_id, 'status': status}}}}
+
+
+def test_webhook_outbox():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    db = client['raft_booking_outbox_test']
+    for name in ('bookings', 'payments', 'webhook_outbox', 'daily_stats', 'settings'):
+        db[name].delete_many({})
+    db.bookings.insert_one({'date': '2099-01-01', 'slot': '7:00–9:00', 'group_size': 2, 'status': 'Pending',
+                            'payment_status': 'Pending', 'razorpay_order_id': 'order_1'})
+
+    ok = True
+    captured = webhook('payment.captured', 'pay_1', 'order_1', 'captured')
+    ok &= enqueue_webhook_event(db, captured) and not enqueue_webhook_event(db, captured)
+    ok &= enqueue_webhook_event(db, webhook('payment.failed', 'pay_0', 'order_1', 'failed'))
+    ok &= db.webhook_outbox.count_documents({}) == 2
+
+    ok &= drain_outbox(db) == (2, 0)
+    booking = db.bookings.find_one({'razorpay_order_id': 'order_1'})
+    ok &= booking['payment_status'] == 'Paid'
+    ok &= db.payments.find_one({'payment_id': 'pay_1'})['webhook_verified'] is True
+    ok &= db.webhook_outbox.count_documents({'state': 'done'}) == 2
+
+    # A worker that died holding a batch: its lease runs out and the events are claimed again
+    enqueue_webhook_event(db, webhook('payment.authorized', 'pay_2', 'order_1', 'authorized'))
+    first = claim_batch(db)
+    ok &= len(first) == 1 and claim_batch(db) == []
+    db.webhook_outbox.update_one({'_id': first[0]['_id']},
+                                 {'$set': {'lease_until': datetime.utcnow() - timedelta(seconds=1)}})
+    ok &= drain_outbox(db) == (1, 0)
+
+    # An event that cannot be applied goes back with a backoff instead of blocking the queue
+    db.webhook_outbox.insert_one({'_id': 'broken', 'state': 'pending', 'attempts': 0,
+                                  'received_at': datetime.utcnow(), 'next_attempt_at': datetime.utcnow()})
+    ok &= drain_outbox(db) == (0, 1)
+    broken = db.webhook_outbox.find_one({'_id': 'broken'})
+    ok &= broken['state'] == 'pending' and broken['next_attempt_at'] > datetime.utcnow()
+
+    client.drop_database('raft_booking_outbox_test')
+    print("[OK] webhook outbox queues and applies events" if ok else "[FAIL] webhook outbox")
+    assert ok
+
+
+if __name__ == '__main__':
+    test_webhook_outbox()
@@ -0,0 +1,390 @@
+# utils/admin_queries.py
+"""
+Query helpers for the admin booking lists.
+
+Bookings are ordered server-side by (date ASC, slot_index ASC, created_at DESC, _id DESC)
+and paged with an opaque keyset cursor, so a page never depends on how many rows
+came before it (no skip/limit, no hard row cap).
+
+Money columns (total / advance / balance) are computed inside MongoDB with the same
+rules as utils.amount_calculator.calculate_total_amount, so range totals never need
+every row in the web worker.
+"""
+import base64
+import json
+import re
+from datetime import date, datetime, timedelta
+
+from bson.objectid import ObjectId
+
+from models.booking_model import DASHBOARD_PROJECTION, TOMBSTONE_TTL, normalize_phone
+
+BOOKING_SORT = [('date', 1), ('slot_index', 1), ('created_at', -1), ('_id', -1)]
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Delta refresh re-reads this much before `since` so writes committed while the
+# previous poll was running are not skipped (duplicates are harmless upserts)
+DELTA_OVERLAP = timedelta(seconds=2)
+# Bookings in these states no longer count towards bookings / headcount / money
+INACTIVE_STATUSES = ('Cancelled', 'Expired')
+
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a page size query param and keep it within 1..MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(booking):
+    """Build the cursor pointing just after `booking` in BOOKING_SORT order."""
+    created = booking.get('created_at')
+    payload = [
+        booking.get('date'),
+        booking.get('slot_index'),
+        created.isoformat() if isinstance(created, datetime) else None,
+        str(booking['_id']),
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        date_val, slot_index, created_iso, oid = json.loads(raw)
+        created = datetime.fromisoformat(created_iso) if created_iso else None
+        return date_val, slot_index, created, ObjectId(oid)
+    except Exception as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def _sorts_after(value):
+    """Condition for values after `value` in ascending order ($gt null matches nothing)."""
+    return {'$ne': None} if value is None else {'$gt': value}
+
+
+def keyset_filter(cursor):
+    """Mongo filter selecting rows strictly after the cursor position."""
+    date_val, slot_index, created, oid = decode_cursor(cursor)
+    same_slot = {'date': date_val, 'slot_index': slot_index}
+    # null / missing sorts first in ASC order, so every set value follows it
+    branches = [
+        {'date': _sorts_after(date_val)},
+        {'date': date_val, 'slot_index': _sorts_after(slot_index)},
+    ]
+    # Missing created_at sorts last in DESC order, so nothing "older" can follow it
+    if created is not None:
+        branches.append(dict(same_slot, created_at={'$lt': created}))
+    branches.append(dict(same_slot, created_at=created, _id={'$lt': oid}))
+    return {'$or': branches}
+
+
+def fetch_bookings_page(db, query_filter, cursor=None, page_size=DEFAULT_PAGE_SIZE, projection=None):
+    """
+    Fetch one page of bookings matching `query_filter`.
+    Returns (bookings, next_cursor); next_cursor is None on the last page.
+    """
+    page_filter = dict(query_filter)
+    if cursor:
+        page_filter = {'$and': [query_filter, keyset_filter(cursor)]}
+    # Fetch one extra row to know whether another page exists
+    docs = list(db.bookings.find(page_filter, projection).sort(BOOKING_SORT).limit(page_size + 1))
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = encode_cursor(docs[-1])
+    return docs, next_cursor
+
+
+def money_stages(settings):
+    """
+    Aggregation stages adding total_amount, advance_amount, advance_percent and
+    balance_amount to each booking. Amounts stored on the booking when it was
+    priced win; older bookings are priced like calculate_total_amount: Mon–Fri use the
+    weekday price / advance percent, Sat–Sun the weekend ones, an unparseable date
+    prices at 0. Balance is total minus advance once paid, else the full total.
+    """
+    weekday_amount = settings.get('weekday_amount', 0)
+    weekend_amount = settings.get('saturday_amount', weekday_amount)
+    weekday_percent = settings.get('weekday_advance_percent', 25)
+    weekend_percent = settings.get('saturday_advance_percent', 35)
+
+    # $dayOfWeek: 1 = Sunday ... 7 = Saturday
+    dow = {'$dayOfWeek': {'$dateFromString': {
+        'dateString': '$date', 'format': '%Y-%m-%d', 'onError': None, 'onNull': None,
+    }}}
+    return [
+        {'$addFields': {
+            '_dow': {'$cond': [{'$eq': [{'$type': '$date'}, 'string']}, dow, None]},
+            '_group': {'$convert': {'input': '$group_size', 'to': 'int', 'onError': 0, 'onNull': 0}},
+            '_paid': {'$eq': [{'$toLower': {'$ifNull': ['$payment_status', '']}}, 'paid']},
+        }},
+        {'$addFields': {
+            '_weekend': {'$in': ['$_dow', [1, 7]]},
+            '_valid_date': {'$ne': ['$_dow', None]},
+        }},
+        {'$addFields': {
+            'total_amount': {'$ifNull': ['$total_amount', {'$cond': ['$_valid_date', {'$multiply': [
+                {'$cond': ['$_weekend', weekend_amount, weekday_amount]}, '$_group',
+            ]}, 0]}]},
+            'advance_percent': {'$ifNull': ['$advance_percent', {'$cond': [
+                '$_valid_date', {'$cond': ['$_weekend', weekend_percent, weekday_percent]}, 0,
+            ]}]},
+        }},
+        {'$addFields': {
+            'advance_amount': {'$ifNull': [
+                '$advance_amount', {'$multiply': ['$total_amount', {'$divide': ['$advance_percent', 100]}]},
+            ]},
+        }},
+        {'$addFields': {
+            'balance_amount': {'$cond': [
+                '$_paid',
+                {'$max': [{'$subtract': ['$total_amount', '$advance_amount']}, 0]},
+                '$total_amount',
+            ]},
+        }},
+    ]
+
+
+def _money_totals_group(group_id):
+    """$group summing headcount and money columns; cancelled / expired bookings count for nothing."""
+    active = {'$not': [{'$in': ['$status', list(INACTIVE_STATUSES)]}]}
+    return {'$group': {
+        '_id': group_id,
+        'bookings': {'$sum': {'$cond': [active, 1, 0]}},
+        'headcount': {'$sum': {'$cond': [active, '$_group', 0]}},
+        'revenue': {'$sum': {'$cond': [active, '$total_amount', 0]}},
+        'advance_collected': {'$sum': {'$cond': [{'$and': [active, '$_paid']}, '$advance_amount', 0]}},
+        'outstanding_balance': {'$sum': {'$cond': [active, '$balance_amount', 0]}},
+    }}
+
+
+EMPTY_TOTALS = {'bookings': 0, 'headcount': 0, 'revenue': 0, 'advance_collected': 0, 'outstanding_balance': 0}
+
+
+def fetch_dashboard_page(db, query_filter, settings, cursor=None, page_size=DEFAULT_PAGE_SIZE,
+                         projection=None, with_totals=True):
+    """
+    The dashboard page: a page of bookings with computed money fields plus
+    (optionally) the totals for the whole filtered range, overall and per date.
+
+    The page is read like fetch_bookings_page (keyset $match, $sort and $limit
+    first, so the sort index serves it) and money is only computed on those
+    rows; the totals are a separate aggregation, run only with with_totals.
+
+    page_size=None returns every matching row (single-day lists).
+    Returns (bookings, next_cursor, totals) where totals is
+    {'range': {...}, 'by_date': {date: {...}}} or None when with_totals is False.
+    """
+    page_filter = query_filter
+    if cursor:
+        page_filter = {'$and': [query_filter, keyset_filter(cursor)]}
+    rows = [{'$match': page_filter}, {'$sort': dict(BOOKING_SORT)}]
+    if page_size is not None:
+        # Fetch one extra row to know whether another page exists
+        rows.append({'$limit': page_size + 1})
+    rows.extend(money_stages(settings))
+    if projection:
+        keep = dict(projection)
+        keep.update({'total_amount': 1, 'advance_amount': 1, 'advance_percent': 1, 'balance_amount': 1})
+        rows.append({'$project': keep})
+
+    docs = list(db.bookings.aggregate(rows, allowDiskUse=True))
+    next_cursor = None
+    if page_size is not None and len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = encode_cursor(docs[-1])
+
+    totals = None
+    if with_totals:
+        totals = fetch_dashboard_totals(db, query_filter, settings)
+    return docs, next_cursor, totals
+
+
+def fetch_dashboard_totals(db, query_filter, settings):
+    """Money and headcount totals of every booking matching `query_filter`: {'range': {...}, 'by_date': {...}}."""
+    facets = {
+        'totals': [_money_totals_group(None)],
+        'by_date': [_money_totals_group('$date'), {'$sort': {'_id': 1}}],
+    }
+    pipeline = [{'$match': query_filter}] + money_stages(settings) + [{'$facet': facets}]
+    result = next(db.bookings.aggregate(pipeline, allowDiskUse=True))
+    range_totals = dict(EMPTY_TOTALS)
+    if result['totals']:
+        range_totals.update({k: v for k, v in result['totals'][0].items() if k != '_id'})
+    return {
+        'range': range_totals,
+        'by_date': {d.pop('_id'): d for d in result['by_date']},
+    }
+
+
+def fetch_dashboard_delta(db, query_filter, settings, since, projection=None, limit=MAX_PAGE_SIZE, until=None):
+    """
+    Bookings whose updated_at is after `since`, split into the rows that match
+    `query_filter` (with money fields, like fetch_dashboard_page) and the ids of
+    bookings the client should drop: changed ones that no longer match
+    (cancelled out of a status filter, postponed out of the date range, ...)
+    and ones deleted since then (booking_tombstones).
+
+    `until` is the client's next_cursor: rows after it belong to pages the
+    client has not loaded and are left to "Load more" (a loaded row that moved
+    there is reported as removed).
+
+    Returns (rows, removed_ids, complete); complete is False when more than
+    `limit` bookings changed, or `since` is older than the tombstones go back,
+    and the caller should reload instead.
+    """
+    after = since - DELTA_OVERLAP
+    if after < datetime.utcnow() - TOMBSTONE_TTL:
+        return [], [], False
+    changed = [
+        d['_id'] for d in db.bookings.find(
+            {'updated_at': {'$gt': after}}, {'_id': 1},
+        ).sort('updated_at', 1).limit(limit + 1)
+    ]
+    tombstone_filter = {'deleted_at': {'$gt': after}}
+    until_date = decode_cursor(until)[0] if until else None
+    if until_date is not None:
+        tombstone_filter['date'] = {'$lte': until_date}
+    deleted = [
+        d['_id'] for d in db.booking_tombstones.find(tombstone_filter, {'_id': 1}).limit(limit + 1)
+    ]
+    if len(changed) + len(deleted) > limit:
+        return [], [], False
+    if not changed:
+        return [], deleted, True
+    row_filter = {'$and': [query_filter, {'_id': {'$in': changed}}]}
+    if until:
+        row_filter['$and'].append({'$nor': [keyset_filter(until)]})
+    rows, _, _ = fetch_dashboard_page(
+        db, row_filter, settings, page_size=None, projection=projection, with_totals=False,
+    )
+    kept = {r['_id'] for r in rows}
+    removed = [oid for oid in changed if oid not in kept]
+    removed.extend(oid for oid in deleted if oid not in kept)
+    return rows, removed, True
+
+
+def fetch_calendar_entries(db, dates, projection=None):
+    """
+    All bookings for the given (sorted) dates in a single range query, grouped by date.
+    Returns {date: [booking, ...]} with every requested date present, newest first per day.
+    """
+    calendar = {d: [] for d in dates}
+    if not dates:
+        return calendar
+    cursor = db.bookings.find(
+        {'date': {'$gte': dates[0], '$lte': dates[-1]}},
+        projection,
+    ).sort([('date', 1), ('created_at', -1)])
+    for booking in cursor:
+        entries = calendar.get(booking.get('date'))
+        if entries is not None:
+            entries.append(booking)
+    return calendar
+
+
+def fetch_calendar_summary(db, dates):
+    """
+    Per-day booking summary for the given (sorted) dates via one $group.
+    Returns {date: {'count', 'headcount', 'confirmed', 'pending'}} with every date present.
+    """
+    summary = {d: {'count': 0, 'headcount': 0, 'confirmed': 0, 'pending': 0} for d in dates}
+    if not dates:
+        return summary
+    pipeline = [
+        {'$match': {'date': {'$gte': dates[0], '$lte': dates[-1]}}},
+        {'$group': {
+            '_id': '$date',
+            'count': {'$sum': 1},
+            'headcount': {'$sum': {'$convert': {'input': '$group_size', 'to': 'int', 'onError': 0, 'onNull': 0}}},
+            'confirmed': {'$sum': {'$cond': [{'$eq': ['$status', 'Confirmed']}, 1, 0]}},
+            'pending': {'$sum': {'$cond': [{'$eq': ['$status', 'Pending']}, 1, 0]}},
+        }},
+    ]
+    for row in db.bookings.aggregate(pipeline):
+        if row['_id'] in summary:
+            summary[row.pop('_id')] = row
+    return summary
+
+
+def iter_dashboard_rows(db, query_filter, settings, projection=None, batch_size=500):
+    """
+    Every booking matching `query_filter` in BOOKING_SORT order with the money
+    fields of fetch_dashboard_page, read through a batched aggregation cursor
+    (no $facet, so the result is not bound by the 16 MB document limit).
+    """
+    pipeline = [{'$match': query_filter}, {'$sort': dict(BOOKING_SORT)}]
+    pipeline.extend(money_stages(settings))
+    if projection:
+        keep = dict(projection)
+        keep.update({'total_amount': 1, 'advance_amount': 1, 'advance_percent': 1, 'balance_amount': 1})
+        pipeline.append({'$project': keep})
+    return db.bookings.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+SEARCH_PROJECTION = dict(DASHBOARD_PROJECTION, razorpay_order_id=1, razorpay_payment_id=1)
+
+
+def _search_tiers(q):
+    """
+    Classify a search string into (kind, [(rank, filter), ...]); lower rank is a
+    better match. Every filter is an equality or anchored prefix on an indexed field.
+    """
+    if ObjectId.is_valid(q):
+        return 'id', [(0, {'_id': ObjectId(q)})]
+    if q.startswith('order_'):
+        return 'order', [(0, {'razorpay_order_id': q})]
+    if q.startswith('pay_'):
+        return 'payment', [(0, {'razorpay_payment_id': q})]
+
+    lower = q.lower()
+    if '@' in lower:
+        field, key = 'email_lower', lower
+        kind = 'email'
+    elif re.fullmatch(r'[\d\s+()-]+', q) and len(normalize_phone(q)) >= 4:
+        field, key = 'phone_digits', normalize_phone(q)
+        kind = 'phone'
+    elif len(lower) >= 2:
+        field, key = 'name_lower', lower
+        kind = 'name'
+    else:
+        return 'none', []
+    return kind, [(0, {field: key}), (1, {field: {'$regex': '^' + re.escape(key)}})]
+
+
+def search_bookings(db, q, limit=SEARCH_LIMIT, scope=None):
+    """
+    Bounded, ranked booking search by name prefix, phone digits, email, booking id
+    or Razorpay order / payment id. Exact matches rank above prefix matches; within
+    a rank today's and upcoming bookings come first (soonest first), then past ones.
+    `scope`, when given, is ANDed into every tier (e.g. the sub-admin filter).
+    Returns (bookings, kind).
+    """
+    q = (q or '').strip()
+    kind, tiers = _search_tiers(q)
+    today = date.today().toordinal()
+
+    def proximity(booking):
+        try:
+            day = date.fromisoformat(booking.get('date')).toordinal()
+        except (TypeError, ValueError):
+            return (2, 0)
+        return (0, day - today) if day >= today else (1, today - day)
+
+    ranked = {}
+    for rank, query_filter in tiers:
+        if scope:
+            query_filter = {'$and': [query_filter, scope]}
+        for b in db.bookings.find(query_filter, SEARCH_PROJECTION).sort('date', -1).limit(limit):
+            ranked.setdefault(b['_id'], (rank, b))
+        if len(ranked) >= limit:
+            break
+    results = sorted(ranked.values(), key=lambda item: (item[0], proximity(item[1])))
+    return [b for _, b in results[:limit]], kind
@@ -65,39 +65,35 @@ def get_allocation_pattern(people, max_per_slot):
             allocation = [6] * (rafts_needed - 1) + [6 + surplus]
     return allocation
 
-def try_merge_into_existing_rafts(db, rafts, people, capacity):
-    """Try to merge `people` into any partially filled, non-special raft.
-    Returns raft_id if merged (and updates DB), else None.
-    """
+def _merge_target(rafts, people, capacity):
+    """First partially filled, non-special raft with room for `people`, else None."""
     for r in rafts:
         if not r.get('is_special', False) and r.get('occupancy', 0) > 0:
             vacancy = capacity - r['occupancy']
             if vacancy >= people:
-                db.rafts.update_one({'_id': r['_id']}, {'$inc': {'occupancy': people}})
-                return r['raft_id']
+                return r
     return None
 
-def allocate_raft(db, user_id, date, slot, group_size):
-    """Implements C-style allocation:
+def plan_raft_allocation(rafts, group_size, settings):
+    """Decide where `group_size` people go in one slot without touching the DB.
+
+    `rafts` is the slot's raft list (sorted by raft_id, at most rafts_per_slot
+    entries, each with raft_id / occupancy / is_special). The rules are the
+    ones allocate_raft applies:
     - small groups (<4) try merging
     - 4-7 single raft
     - 8..10 specific splits
     - >10 split into 6/7 patterns
-    Returns {'status','rafts','message'}
+    - more than rafts_per_slot * capacity only into an empty slot (7-person mode)
+    On success the raft dicts are updated in place, so the same list can be
+    used to plan several bookings in a row. Nothing is changed on failure.
+    Returns {'status','rafts','raft_details','message'} like allocate_raft.
     """
-    settings = load_settings(db)
     capacity = settings['capacity']
     # Calculate max_people_per_slot dynamically: rafts_per_slot * (capacity + 1)
     # The +1 accounts for special 7-person rafts when capacity is 6
     max_people_per_slot = settings.get('rafts_per_slot', 5) * (capacity + 1)
-
-    # Ensure rafts exist for this date/slot
-    from models.raft_model import ensure_rafts_for_date_slot
-    ensure_rafts_for_date_slot(db, date, slot, settings.get('rafts_per_slot', 5), capacity)
-    
-    # fetch rafts for date+slot sorted, limit to configured number
     rafts_per_slot = settings.get('rafts_per_slot', 5)
-    rafts = list(db.rafts.find({'day': date, 'slot': slot}).sort('raft_id', 1).limit(rafts_per_slot))
     if not rafts:
         return {'status': 'Pending', 'rafts': [], 'message': 'No rafts initialized for this slot.'}
 
@@ -121,11 +117,12 @@ def allocate_raft(db, user_id, date, slot, group_size):
         rem = group_size % rafts_per_slot
         placed = []
         placement_details = []
-        # Ensure deterministic ordering (already sorted above)
+        # Ensure deterministic ordering (already sorted by the caller)
         for idx, r in enumerate(rafts):
             occ = base + (1 if idx < rem else 0)
             # Mark all rafts as special (7-capacity mode) and set occupancy
-            db.rafts.update_one({'_id': r['_id']}, {'$set': {'occupancy': occ, 'is_special': True}})
+            r['occupancy'] = occ
+            r['is_special'] = True
             placed.append(r['raft_id'])
             placement_details.append({'raft_id': r['raft_id'], 'count': occ})
 
@@ -145,8 +142,10 @@ def allocate_raft(db, user_id, date, slot, group_size):
 
     # small groups (<4) - merge into any partially filled raft
     if group_size < 4:
-        merged_raft = try_merge_into_existing_rafts(db, rafts, group_size, capacity)
-        if merged_raft:
+        target = _merge_target(rafts, group_size, capacity)
+        if target:
+            target['occupancy'] += group_size
+            merged_raft = target['raft_id']
             return {'status': 'Confirmed', 'rafts': [merged_raft], 'raft_details': [{'raft_id': merged_raft, 'count': group_size}], 'message': f'Merged into Raft {merged_raft}'}
         return {'status': 'Pending', 'rafts': [], 'message': 'No suitable raft to merge small group.'}
 
@@ -155,34 +154,79 @@ def allocate_raft(db, user_id, date, slot, group_size):
     if not allocation:
         return {'status': 'Pending', 'rafts': [], 'message': 'Invalid group size or allocation pattern.'}
 
-    # Try merging each allocation piece into existing rafts first
+    # Try merging each allocation piece into existing rafts first (on copies,
+    # so a group that does not fit leaves the slot untouched)
+    planned = {id(r): dict(r) for r in rafts}
+    working = [planned[id(r)] for r in rafts]
     placed = []
     placement_details = []
     for i, part in enumerate(list(allocation)):
         if part <= 0:
             continue
-        merged = try_merge_into_existing_rafts(db, rafts, part, capacity)
-        if merged:
-            placed.append(merged)
-            placement_details.append({'raft_id': merged, 'count': part})
+        target = _merge_target(working, part, capacity)
+        if target:
+            target['occupancy'] += part
+            placed.append(target['raft_id'])
+            placement_details.append({'raft_id': target['raft_id'], 'count': part})
             allocation[i] = 0  # mark placed
 
     # Collect unplaced parts
     unplaced = [p for p in allocation if p > 0]
+    if unplaced:
+        # Find empty rafts
+        empty_rafts = [r for r in working if r.get('occupancy', 0) == 0]
+        if len(empty_rafts) < len(unplaced):
+            return {'status': 'Pending', 'rafts': [], 'message': 'Not enough empty rafts available.'}
+
+        # Allocate unplaced parts to empty rafts (mark is_special for 7)
+        for idx, part in enumerate(unplaced):
+            target = empty_rafts[idx]
+            target['occupancy'] = part
+            target['is_special'] = (part == 7)
+            placed.append(target['raft_id'])
+            placement_details.append({'raft_id': target['raft_id'], 'count': part})
+
+    for r in rafts:
+        r.update(planned[id(r)])
     if not unplaced:
         return {'status': 'Confirmed', 'rafts': placed, 'raft_details': placement_details, 'message': f'All merged ({placed})'}
-
-    # Find empty rafts
-    empty_rafts = [r for r in rafts if r.get('occupancy', 0) == 0]
-    if len(empty_rafts) < len(unplaced):
-        return {'status': 'Pending', 'rafts': [], 'message': 'Not enough empty rafts available.'}
-
-    # Allocate unplaced parts to empty rafts (mark is_special for 7)
-    for idx, part in enumerate(unplaced):
-        target = empty_rafts[idx]
-        db.rafts.update_one({'_id': target['_id']}, {'$set': {'occupancy': part, 'is_special': (part == 7)}})
-        placed.append(target['raft_id'])
-        placement_details.append({'raft_id': target['raft_id'], 'count': part})
-
     return {'status': 'Confirmed', 'rafts': placed, 'raft_details': placement_details, 'message': f'Allocated to rafts: {placed}'}
 
+def allocate_raft(db, user_id, date, slot, group_size, hold_booking_id=None, session=None):
+    """Implements C-style allocation (see plan_raft_allocation for the rules)
+    and writes the placement to the slot's rafts.
+    Seats held by checkouts in progress (utils.seat_holds) count as taken,
+    except the hold of `hold_booking_id`, which this allocation replaces.
+    Raft reads and writes run in `session` when given (the missing rafts of
+    the slot are created outside it).
+    Returns {'status','rafts','message'}
+    """
+    settings = load_settings(db)
+    capacity = settings['capacity']
+
+    # Ensure rafts exist for this date/slot
+    from models.raft_model import ensure_rafts_for_date_slot
+    ensure_rafts_for_date_slot(db, date, slot, settings.get('rafts_per_slot', 5), capacity)
+    
+    # fetch rafts for date+slot sorted, limit to configured number
+    rafts_per_slot = settings.get('rafts_per_slot', 5)
+    rafts = list(db.rafts.find({'day': date, 'slot': slot}, session=session).sort('raft_id', 1).limit(rafts_per_slot))
+    from utils.seat_holds import active_holds, overlay_holds
+    overlay_holds(rafts, active_holds(db, date, slot, exclude_booking_id=hold_booking_id, session=session))
+    before = {r['raft_id']: r.get('occupancy', 0) for r in rafts}
+
+    res = plan_raft_allocation(rafts, group_size, settings)
+    if res.get('status') != 'Confirmed':
+        return res
+
+    by_id = {r['raft_id']: r for r in rafts}
+    for raft_id in dict.fromkeys(res['rafts']):
+        r = by_id[raft_id]
+        if before[raft_id] > 0:
+            # Merged into a partially filled raft: add only this group's seats
+            added = r['occupancy'] - before[raft_id]
+            db.rafts.update_one({'_id': r['_id']}, {'$inc': {'occupancy': added}}, session=session)
+        else:
+            db.rafts.update_one({'_id': r['_id']}, {'$set': {'occupancy': r['occupancy'], 'is_special': r.get('is_special', False)}},
+                                session=session)
+    return res
@@ -0,0 +1,226 @@
+# utils/archive.py
+"""
+Archival of finished dates.
+
+Bookings and rafts for dates before a cutoff, and the payments of those
+bookings, are moved out of the hot collections in batches. The target is
+either the `<collection>_archive` collections or gzip-compressed JSON-lines
+files (one per collection, MongoDB extended JSON so ObjectIds and datetimes
+survive). Every batch is copied before it is deleted, so an interrupted run
+can simply be repeated. restore_archive moves documents back the same way.
+
+daily_stats rows are left alone, so the rollups of archived dates stay
+readable; rebuild_daily_stats counts bookings_archive as well and keeps the
+rows of dates archived to files.
+"""
+import glob
+import gzip
+import os
+from datetime import date, datetime, timedelta
+
+from bson import json_util
+from pymongo import ReplaceOne
+
+from models.booking_model import record_booking_tombstones
+
+ARCHIVED = ('bookings', 'rafts', 'payments')
+DEFAULT_BATCH_SIZE = 500
+
+
+def archive_cutoff(older_than_days, today=None):
+    """First date that is kept hot: everything strictly before it is archived."""
+    return ((today or date.today()) - timedelta(days=older_than_days)).isoformat()
+
+
+def _replace_ops(name, docs):
+    """Upserts that make re-copying a batch harmless; rafts are keyed by (day, slot, raft_id)."""
+    ops = []
+    for doc in docs:
+        if name == 'rafts':
+            body = {k: v for k, v in doc.items() if k != '_id'}
+            ops.append(ReplaceOne({'day': doc.get('day'), 'slot': doc.get('slot'),
+                                   'raft_id': doc.get('raft_id')}, body, upsert=True))
+        else:
+            ops.append(ReplaceOne({'_id': doc['_id']}, doc, upsert=True))
+    return ops
+
+
+def _payments_filter(bookings):
+    ids = [str(b['_id']) for b in bookings]
+    order_ids = [b['razorpay_order_id'] for b in bookings if b.get('razorpay_order_id')]
+    return {'$or': [{'booking_id': {'$in': ids}}, {'order_id': {'$in': order_ids}}]}
+
+
+class _CollectionSink:
+    def __init__(self, db):
+        self.db = db
+
+    def write(self, name, docs):
+        if docs:
+            self.db[f'{name}_archive'].bulk_write(_replace_ops(name, docs), ordered=False)
+
+    def close(self):
+        pass
+
+
+class _FileSink:
+    def __init__(self, directory, cutoff):
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        self.paths = {name: os.path.join(directory, f'{name}-before-{cutoff}-{stamp}.jsonl.gz')
+                      for name in ARCHIVED}
+        self.files = {}
+
+    def write(self, name, docs):
+        if not docs:
+            return
+        if name not in self.files:
+            self.files[name] = gzip.open(self.paths[name], 'at', encoding='utf-8')
+        fh = self.files[name]
+        for doc in docs:
+            fh.write(json_util.dumps(doc) + '\n')
+        # The batch must be on disk before it is deleted from MongoDB
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    def close(self):
+        for fh in self.files.values():
+            fh.close()
+
+
+def archive_before(db, cutoff, directory=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Move bookings with date < cutoff (with their payments) and rafts with
+    day < cutoff out of the hot collections, batch_size documents at a time.
+
+    With `directory` the documents go to gzip JSON-lines files there, otherwise
+    to the *_archive collections. dry_run only counts. Returns
+    {'cutoff', 'bookings', 'rafts', 'payments'[, 'files']}.
+    """
+    report = {'cutoff': cutoff, 'bookings': 0, 'rafts': 0, 'payments': 0}
+    booking_filter = {'date': {'$lt': cutoff}}
+    raft_filter = {'day': {'$lt': cutoff}}
+    if dry_run:
+        report['bookings'] = db.bookings.count_documents(booking_filter)
+        report['rafts'] = db.rafts.count_documents(raft_filter)
+        batch = []
+        for b in db.bookings.find(booking_filter, {'razorpay_order_id': 1}).batch_size(batch_size):
+            batch.append(b)
+            if len(batch) >= batch_size:
+                report['payments'] += db.payments.count_documents(_payments_filter(batch))
+                batch = []
+        if batch:
+            report['payments'] += db.payments.count_documents(_payments_filter(batch))
+        return report
+
+    sink = _FileSink(directory, cutoff) if directory else _CollectionSink(db)
+    try:
+        while True:
+            # Archived documents are deleted, so the next batch is always the first one left
+            bookings = list(db.bookings.find(booking_filter).sort('_id', 1).limit(batch_size))
+            if not bookings:
+                break
+            payments = list(db.payments.find(_payments_filter(bookings)))
+            sink.write('bookings', bookings)
+            sink.write('payments', payments)
+            if payments:
+                db.payments.delete_many({'_id': {'$in': [p['_id'] for p in payments]}})
+            db.bookings.delete_many({'_id': {'$in': [b['_id'] for b in bookings]}})
+            record_booking_tombstones(db, bookings)
+            report['bookings'] += len(bookings)
+            report['payments'] += len(payments)
+
+        while True:
+            rafts = list(db.rafts.find(raft_filter).sort('_id', 1).limit(batch_size))
+            if not rafts:
+                break
+            sink.write('rafts', rafts)
+            db.rafts.delete_many({'_id': {'$in': [r['_id'] for r in rafts]}})
+            report['rafts'] += len(rafts)
+    finally:
+        sink.close()
+
+    if directory:
+        report['files'] = [path for path in sink.paths.values() if os.path.exists(path)]
+    return report
+
+
+def _in_range(value, from_date, to_date):
+    return isinstance(value, str) and (not from_date or value >= from_date) and (not to_date or value <= to_date)
+
+
+def _iter_file_batches(paths, batch_size):
+    """Yield (collection, [doc, ...]) batches from archive files, bookings files first."""
+    def order(path):
+        name = os.path.basename(path).split('-', 1)[0]
+        return ARCHIVED.index(name) if name in ARCHIVED else len(ARCHIVED)
+
+    for path in sorted(paths, key=order):
+        name = os.path.basename(path).split('-', 1)[0]
+        if name not in ARCHIVED:
+            continue
+        batch = []
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                if line.strip():
+                    batch.append(json_util.loads(line))
+                if len(batch) >= batch_size:
+                    yield name, batch
+                    batch = []
+        if batch:
+            yield name, batch
+
+
+def restore_archive(db, from_date=None, to_date=None, paths=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Move archived bookings / rafts for [from_date, to_date] (all when both are
+    None) back into the hot collections, with the payments of the restored
+    bookings.
+
+    Without `paths` they come out of the *_archive collections and are removed
+    there. With `paths` (archive files or directories of them) the files are
+    read and left in place. Returns {'bookings', 'rafts', 'payments'} counts.
+    """
+    report = dict.fromkeys(ARCHIVED, 0)
+    if paths is None:
+        date_field = {'bookings': 'date', 'rafts': 'day'}
+        for name in ('bookings', 'rafts'):
+            query = {date_field[name]: {'$type': 'string'}}
+            if from_date:
+                query[date_field[name]]['$gte'] = from_date
+            if to_date:
+                query[date_field[name]]['$lte'] = to_date
+            archive = db[f'{name}_archive']
+            while True:
+                docs = list(archive.find(query).sort('_id', 1).limit(batch_size))
+                if not docs:
+                    break
+                db[name].bulk_write(_replace_ops(name, docs), ordered=False)
+                if name == 'bookings':
+                    payments = list(db.payments_archive.find(_payments_filter(docs)))
+                    if payments:
+                        db.payments.bulk_write(_replace_ops('payments', payments), ordered=False)
+                        db.payments_archive.delete_many({'_id': {'$in': [p['_id'] for p in payments]}})
+                    report['payments'] += len(payments)
+                archive.delete_many({'_id': {'$in': [d['_id'] for d in docs]}})
+                report[name] += len(docs)
+        return report
+
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, '*.jsonl.gz'))) if os.path.isdir(path) else [path])
+
+    booking_ids, order_ids = set(), set()
+    for name, docs in _iter_file_batches(files, batch_size):
+        if name == 'bookings':
+            docs = [d for d in docs if _in_range(d.get('date'), from_date, to_date)]
+            booking_ids.update(str(d['_id']) for d in docs)
+            order_ids.update(d['razorpay_order_id'] for d in docs if d.get('razorpay_order_id'))
+        elif name == 'rafts':
+            docs = [d for d in docs if _in_range(d.get('day'), from_date, to_date)]
+        else:
+            docs = [d for d in docs if d.get('booking_id') in booking_ids or d.get('order_id') in order_ids]
+        if docs:
+            db[name].bulk_write(_replace_ops(name, docs), ordered=False)
+            report[name] += len(docs)
+    return report
@@ -1,9 +1,18 @@
 from bson.objectid import ObjectId
-from utils.allocation_logic import allocate_raft, load_settings, get_allocation_pattern
-from models.raft_model import ensure_rafts_for_date_slot
-from datetime import datetime, date
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from utils.allocation_logic import allocate_raft, load_settings, get_allocation_pattern, plan_raft_allocation
+from models.raft_model import ensure_rafts_for_date_slot, ensure_rafts_for_dates
+from models.booking_model import get_slot_index, record_booking_tombstones
+from models.payment_model import insert_payment
+from utils.daily_stats import record_booking_change, record_booking_changes
+from utils.occupancy import booking_seats_by_raft
+from utils.seat_holds import active_holds, overlay_holds, release_hold
+from datetime import datetime, date, timedelta
 import logging
 
+logger = logging.getLogger("booking_ops")
+
 def get_deallocation_amounts(db, date, slot, group_size, raft_ids):
     """
     Determine how many people to remove from each raft.
@@ -13,9 +22,6 @@ def get_deallocation_amounts(db, date, slot, group_size, raft_ids):
     Returns a list of tuples: [(raft_id, amount_to_remove), ...]
     """
     settings = load_settings(db)
-    capacity = settings['capacity']
-    rafts_per_slot = settings.get('rafts_per_slot', 5)
-    max_people_per_slot = settings.get('rafts_per_slot', 5) * (capacity + 1)
     
     # Fetch current raft states (occupancy) for the given raft_ids
     raft_map = {}
@@ -24,6 +30,18 @@ def get_deallocation_amounts(db, date, slot, group_size, raft_ids):
         if raft:
             raft_map[int(rid)] = max(0, raft.get('occupancy', 0))
     
+    return deallocation_amounts(settings, raft_map, group_size, raft_ids)
+
+def deallocation_amounts(settings, raft_map, group_size, raft_ids):
+    """
+    get_deallocation_amounts on already-loaded data: raft_map is
+    {raft_id: current occupancy} for the booking's rafts that exist.
+    Returns a list of tuples: [(raft_id, amount_to_remove), ...]
+    """
+    capacity = settings['capacity']
+    rafts_per_slot = settings.get('rafts_per_slot', 5)
+    max_people_per_slot = settings.get('rafts_per_slot', 5) * (capacity + 1)
+    
     if not raft_map:
         return []
     
@@ -97,120 +115,445 @@ def cancel_booking(db, booking_oid):
     Cancel a booking following the same allocation pattern logic used during booking.
     Uses get_allocation_pattern as the source of truth for deallocation amounts.
     """
-    b = db.bookings.find_one({'_id': booking_oid})
-    if not b:
-        return {'error': 'Booking not found'}
-    if b.get('status') == 'Cancelled':
-        return {'message': 'Already cancelled'}
-    
-    # Only process confirmed bookings with raft allocations
-    raft_ids = b.get('raft_allocations', [])
-    group_size = int(b.get('group_size', 0))
-    booking_date = b.get('date')
-    booking_slot = b.get('slot')
-    
-    if not raft_ids or b.get('status') != 'Confirmed':
-        # No raft allocations to free, just mark as cancelled
-        db.bookings.update_one({'_id': booking_oid}, {'$set': {'status': 'Cancelled', 'raft_allocations': [], 'cancelled_by_admin': True}})
-        return {'message': 'Booking cancelled (no raft allocations to free).'}
-    
-    # Prefer explicit per-raft allocation details if present on the booking
-    details = b.get('raft_allocation_details')
+    result = cancel_bookings(db, [booking_oid])['results'][0]
+    result.pop('id', None)
+    return result
+
+
+def _booking_deallocations(settings, booking, occupancy):
+    """
+    [(raft_id, amount_to_remove), ...] for one booking against the in-memory
+    occupancy {raft_id: seats} of its slot. raft_allocation_details wins when
+    present, otherwise the allocation pattern is reversed (deallocation_amounts).
+    """
+    details = booking.get('raft_allocation_details')
     if details:
-        for entry in details:
-            raft_id = int(entry.get('raft_id'))
-            amount_to_remove = int(entry.get('count', 0))
-            raft = db.rafts.find_one({'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id})
-            if not raft:
-                continue
-            current_occupancy = max(0, raft.get('occupancy', 0))
-            new_occupancy = max(0, current_occupancy - amount_to_remove)
-            update_data = {'$set': {'occupancy': new_occupancy}}
-            if new_occupancy == 0:
-                update_data['$set']['is_special'] = False
-            elif new_occupancy != 7:
-                update_data['$set']['is_special'] = False
-            db.rafts.update_one({'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id}, update_data)
-    else:
-        # Get deallocation amounts using the same pattern logic as allocation
-        settings = load_settings(db)
-        capacity = settings['capacity']
-        
-        deallocations = get_deallocation_amounts(db, booking_date, booking_slot, group_size, raft_ids)
-        
-        # Apply deallocation to each raft following allocation pattern rules
-        for raft_id, amount_to_remove in deallocations:
-            raft = db.rafts.find_one({'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id})
-            if not raft:
-                continue
-            
-            current_occupancy = max(0, raft.get('occupancy', 0))
-            new_occupancy = max(0, current_occupancy - amount_to_remove)
-            
-            # Build update following allocation pattern rules
-            update_data = {'$set': {'occupancy': new_occupancy}}
-            
+        return [(int(entry.get('raft_id')), int(entry.get('count', 0))) for entry in details]
+    raft_ids = booking.get('raft_allocations', [])
+    raft_map = {int(rid): occupancy[int(rid)] for rid in raft_ids if int(rid) in occupancy}
+    return deallocation_amounts(settings, raft_map, int(booking.get('group_size', 0)), raft_ids)
+
+
+def cancel_bookings(db, booking_oids):
+    """
+    Cancel several bookings at once.
+
+    Bookings are read with one query and grouped by (date, slot). For each slot
+    the bookings are cancelled with one bulk_write guarded on the status, date
+    and slot that were read, so one cancelled or moved in the meantime is left
+    alone. The rafts are read once, every cancelled booking's deallocation is
+    worked out in memory in request order (so later bookings see the seats
+    freed by earlier ones, exactly like cancelling them one by one), and the
+    seats are given back with one rafts bulk_write ($inc, so seats booked
+    since the read are kept). daily_stats are updated with a single
+    record_booking_changes call.
+
+    Returns {'cancelled': n, 'results': [{'id', 'message' | 'error'}, ...]}
+    with one result per requested id, in request order.
+    """
+    booking_oids = list(dict.fromkeys(booking_oids))
+    bookings = {b['_id']: b for b in db.bookings.find({'_id': {'$in': booking_oids}})}
+    results = {}
+    by_slot = {}
+    for oid in booking_oids:
+        b = bookings.get(oid)
+        if not b:
+            results[oid] = {'error': 'Booking not found'}
+        elif b.get('status') == 'Cancelled':
+            results[oid] = {'message': 'Already cancelled'}
+        else:
+            by_slot.setdefault((b.get('date'), b.get('slot')), []).append(b)
+
+    settings = load_settings(db) if by_slot else None
+    changes = []
+    for (booking_date, booking_slot), slot_bookings in by_slot.items():
+        now = datetime.utcnow()
+        update = {'status': 'Cancelled', 'raft_allocations': [], 'cancelled_by_admin': True, 'updated_at': now}
+        result = db.bookings.bulk_write([
+            UpdateOne({'_id': b['_id'], 'status': b.get('status'), 'date': booking_date, 'slot': booking_slot},
+                      {'$set': update})
+            for b in slot_bookings
+        ], ordered=False)
+        if result.matched_count < len(slot_bookings):
+            cancelled_ids = {
+                d['_id'] for d in db.bookings.find(
+                    {'_id': {'$in': [b['_id'] for b in slot_bookings]}, 'status': 'Cancelled', 'updated_at': now},
+                    {'_id': 1},
+                )
+            }
+            for b in slot_bookings:
+                if b['_id'] not in cancelled_ids:
+                    results[b['_id']] = {'error': 'Booking changed while being cancelled; left as it is'}
+            slot_bookings = [b for b in slot_bookings if b['_id'] in cancelled_ids]
+
+        # Only confirmed bookings with raft allocations hold seats
+        freeing = [b for b in slot_bookings if b.get('raft_allocations') and b.get('status') == 'Confirmed']
+        if freeing:
+            occupancy = {
+                r['raft_id']: max(0, r.get('occupancy', 0))
+                for r in db.rafts.find({'day': booking_date, 'slot': booking_slot}, {'raft_id': 1, 'occupancy': 1})
+            }
+            freed_by_raft = {}
+            for b in freeing:
+                for raft_id, amount_to_remove in _booking_deallocations(settings, b, occupancy):
+                    if raft_id not in occupancy:
+                        continue
+                    amount_to_remove = min(amount_to_remove, occupancy[raft_id])
+                    occupancy[raft_id] -= amount_to_remove
+                    freed_by_raft[raft_id] = freed_by_raft.get(raft_id, 0) + amount_to_remove
+            ops = [
+                UpdateOne({'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id},
+                          {'$inc': {'occupancy': -amount}})
+                for raft_id, amount in sorted(freed_by_raft.items()) if amount
+            ]
+            if ops:
+                db.rafts.bulk_write(ops, ordered=False)
+                # Clear is_special flag following allocation logic rules
+                db.rafts.update_many(
+                    {'day': booking_date, 'slot': booking_slot, 'raft_id': {'$in': sorted(freed_by_raft)},
+                     'is_special': True, 'occupancy': {'$ne': 7}},
+                    {'$set': {'is_special': False}},
+                )
+
+        freed = {b['_id'] for b in freeing}
+        for b in slot_bookings:
+            changes.append((b, dict(b, **update)))
+            if b['_id'] in freed:
+                results[b['_id']] = {'message': 'Booking cancelled and capacity freed using allocation pattern logic.'}
+            else:
+                results[b['_id']] = {'message': 'Booking cancelled (no raft allocations to free).'}
+
+    if changes:
+        release_hold(db, [b['_id'] for b, _ in changes])
+        record_booking_changes(db, changes, settings)
+    return {
+        'cancelled': len(changes),
+        'results': [dict(results[oid], id=str(oid)) for oid in booking_oids],
+    }
+
+
+# Booking fields needed to back a deleted booking out of daily_stats and its rafts
+DELETE_PROJECTION = {
+    'date': 1, 'slot': 1, 'status': 1, 'payment_status': 1, 'updated_at': 1,
+    'group_size': 1, 'raft_allocations': 1, 'raft_allocation_details': 1, 'postponed_from': 1,
+    'total_amount': 1, 'advance_amount': 1,
+}
+DELETE_BATCH_SIZE = 1000
+# Times a booking changed between its read and its delete is read again and retried
+DELETE_RETRIES = 3
+
+
+def _delete_booking_batch(db, batch, date_filter, session=None):
+    """
+    Delete one batch of bookings as they were read. Each booking is first
+    claimed with an update guarded on its updated_at and status, and only the
+    claimed ones are deleted; one changed since the read is read again and
+    retried (DELETE_RETRIES times) unless it moved off the dates. The seats of
+    the deleted Confirmed bookings are given back with $inc
+    (booking_seats_by_raft) and tombstones are left for them.
+    Returns the bookings deleted, as they were read.
+    """
+    deleted = []
+    for _ in range(DELETE_RETRIES):
+        if not batch:
+            break
+        token = ObjectId()
+        result = db.bookings.bulk_write([
+            UpdateOne({'_id': b['_id'], 'updated_at': b.get('updated_at'), 'status': b.get('status')},
+                      {'$set': {'deleting': token}})
+            for b in batch
+        ], ordered=False, session=session)
+        claimed = {b['_id'] for b in batch}
+        if result.matched_count < len(batch):
+            claimed = {d['_id'] for d in db.bookings.find({'_id': {'$in': list(claimed)}, 'deleting': token},
+                                                          {'_id': 1}, session=session)}
+        db.bookings.delete_many({'_id': {'$in': list(claimed)}, 'deleting': token}, session=session)
+        deleted.extend(b for b in batch if b['_id'] in claimed)
+        left = [b['_id'] for b in batch if b['_id'] not in claimed]
+        batch = list(db.bookings.find({'_id': {'$in': left}, 'date': date_filter}, DELETE_PROJECTION,
+                                      session=session)) if left else []
+    if batch:
+        logger.warning("Delete: %d booking(s) kept changing and were left in place", len(batch))
+
+    raft_inc = {}
+    for b in deleted:
+        if b.get('status') != 'Confirmed':
+            continue
+        for raft_id, seats in booking_seats_by_raft(b).items():
+            key = (b.get('date'), b.get('slot'), raft_id)
+            raft_inc[key] = raft_inc.get(key, 0) + seats
+    if raft_inc:
+        db.rafts.bulk_write([
+            UpdateOne({'day': day, 'slot': slot, 'raft_id': raft_id}, {'$inc': {'occupancy': -seats}})
+            for (day, slot, raft_id), seats in raft_inc.items()
+        ], ordered=False, session=session)
+        touched = {}
+        for day, slot, raft_id in raft_inc:
+            touched.setdefault((day, slot), []).append(raft_id)
+        for (day, slot), raft_ids in touched.items():
             # Clear is_special flag following allocation logic rules
-            if new_occupancy == 0:
-                update_data['$set']['is_special'] = False
-            elif new_occupancy != 7:
-                update_data['$set']['is_special'] = False
-            db.rafts.update_one({'day': booking_date, 'slot': booking_slot, 'raft_id': raft_id}, update_data)
-    
-    # Update booking document
-    db.bookings.update_one(
-        {'_id': booking_oid},
-        {'$set': {'status': 'Cancelled', 'raft_allocations': [], 'cancelled_by_admin': True}}
-    )
-    
-    return {'message': 'Booking cancelled and capacity freed using allocation pattern logic.'}
+            db.rafts.update_many(
+                {'day': day, 'slot': slot, 'raft_id': {'$in': raft_ids}, 'is_special': True, 'occupancy': {'$ne': 7}},
+                {'$set': {'is_special': False}},
+                session=session,
+            )
+    record_booking_tombstones(db, deleted, session=session)
+    return deleted
+
+
+def delete_bookings_for_dates(db, date_filter, audit=None, use_transaction=False, settings=None):
+    """
+    Delete every booking whose date matches `date_filter` (a date string or a
+    {'$gte': ..., '$lte': ...} range) and free their rafts.
+
+    Bookings are read DELETE_BATCH_SIZE at a time in _id order and deleted by
+    _delete_booking_batch, which only deletes them as they were read and gives
+    exactly their seats back with $inc, so a booking confirmed meanwhile keeps
+    its seats. Seat holds on those dates are dropped as well, and the deleted
+    bookings are left in booking_tombstones for the dashboard delta refresh.
+    `audit`, when given, is written once to admin_audit_logs with the counts
+    added when anything was deleted. With use_transaction everything commits
+    together (needs a replica set).
+
+    daily_stats are backed out for exactly the deleted bookings, batch by
+    batch (after the commit with use_transaction).
+    Returns (deleted_count, freed_count) where freed_count is the number of
+    confirmed bookings that held rafts.
+    """
+    def apply(session=None, on_batch=None):
+        deleted_count = freed = 0
+        removed = []
+        last_id = None
+        while True:
+            batch_filter = {'date': date_filter}
+            if last_id is not None:
+                batch_filter['_id'] = {'$gt': last_id}
+            batch = list(db.bookings.find(batch_filter, DELETE_PROJECTION, session=session)
+                         .sort('_id', 1).limit(DELETE_BATCH_SIZE))
+            if not batch:
+                break
+            last_id = batch[-1]['_id']
+            deleted = _delete_booking_batch(db, batch, date_filter, session=session)
+            deleted_count += len(deleted)
+            freed += sum(1 for b in deleted if b.get('status') == 'Confirmed' and b.get('raft_allocations'))
+            if on_batch is not None:
+                on_batch(deleted)
+            else:
+                removed.extend(deleted)
+        db.seat_holds.delete_many({'date': date_filter}, session=session)
+        if audit is not None and deleted_count:
+            try:
+                db.admin_audit_logs.insert_one(dict(
+                    audit,
+                    deleted_count=deleted_count,
+                    freed_confirmed_bookings=freed,
+                    timestamp=datetime.utcnow(),
+                ), session=session)
+            except Exception:
+                # do not fail the operation if logging fails
+                if session is not None:
+                    raise
+                logging.exception("Failed to write admin audit log")
+        return removed, deleted_count, freed
+
+    if use_transaction:
+        with db.client.start_session() as session:
+            removed, deleted_count, freed = session.with_transaction(apply)
+        record_booking_changes(db, [(b, None) for b in removed], settings)
+    else:
+        settings = settings or load_settings(db)
+        _, deleted_count, freed = apply(
+            on_batch=lambda deleted: record_booking_changes(db, [(b, None) for b in deleted], settings),
+        )
+    return deleted_count, freed
+
+
+# An unpaid Pending booking may be expired when this matches
+ABANDONED_FILTER = {'status': 'Pending', 'payment_status': {'$ne': 'Paid'}}
 
 
-def recompute_occupancy_for_slot(db, date, slot):
+def expire_pending_bookings(db, max_age_minutes, batch_size=500, settings=None):
+    """
+    Mark abandoned checkouts Expired: unpaid Pending bookings whose expires_at
+    has passed, or, for bookings created before expires_at existed, whose
+    created_at is older than max_age_minutes.
+
+    Works batch_size bookings at a time with one update_many per batch that
+    re-checks ABANDONED_FILTER, so a payment verified in the meantime wins.
+    Pending bookings hold no rafts; their seat holds are dropped and
+    daily_stats updated.
+    Returns the number of bookings expired.
+    """
+    now = datetime.utcnow()
+    query = dict(ABANDONED_FILTER, **{'$or': [
+        {'expires_at': {'$lte': now}},
+        {'expires_at': None, 'created_at': {'$lte': now - timedelta(minutes=max_age_minutes)}},
+    ]})
+    settings = settings or load_settings(db)
+    expired = 0
+    while True:
+        ids = [b['_id'] for b in db.bookings.find(query, {'_id': 1}).limit(batch_size)]
+        if not ids:
+            break
+        stamp = datetime.utcnow()
+        db.bookings.update_many(
+            dict(ABANDONED_FILTER, _id={'$in': ids}),
+            {'$set': {'status': 'Expired', 'expired_at': stamp, 'updated_at': stamp}},
+        )
+        changed = list(db.bookings.find({'_id': {'$in': ids}, 'status': 'Expired', 'expired_at': stamp},
+                                        DELETE_PROJECTION))
+        record_booking_changes(db, [(dict(b, status='Pending'), b) for b in changed], settings)
+        release_hold(db, [b['_id'] for b in changed])
+        expired += len(changed)
+    return expired
+
+
+class _BookingChanged(Exception):
+    """The booking no longer matched while its payment was being confirmed (aborts the transaction)."""
+
+
+PAYMENT_TRANSACTION_ATTEMPTS = 3
+
+
+def confirm_paid_booking(db, booking, booking_filter, allocate, payment, use_transaction=False):
+    """
+    Confirm a booking whose payment was verified: allocate its rafts (when
+    `allocate` is a (date, slot, group_size) tuple; None keeps the booking's
+    existing raft_allocations), set it Confirmed/Paid through
+    `booking_filter` and record `payment` ({order_id, payment_id, signature,
+    raw_response}) in payments.
+
+    With use_transaction the raft writes, the booking update and the payment
+    write commit together (needs a replica set), so a crash or a concurrent
+    update in between never leaves seats taken without a confirmed booking;
+    transient errors and unknown commit results are retried by
+    with_transaction, and a payment document inserted concurrently (duplicate
+    key on the upsert) by running the transaction again.
+
+    daily_stats are updated from the booking as it was right before the
+    confirming write (not the caller's earlier read, which e.g. the expiry
+    sweeper may have changed since), after the commit with use_transaction.
+
+    Returns (updated booking, allocation result). updated is None when the
+    allocation failed (nothing written) or the booking changed underneath;
+    the allocation result is None when no allocation was needed.
+    """
+    def apply(session=None):
+        raft_allocations = booking.get('raft_allocations') or []
+        raft_details = booking.get('raft_allocation_details') or []
+        alloc_res = None
+        if allocate:
+            date, slot, group_size = allocate
+            # The booking's own seat hold (if still active) is what makes room here
+            alloc_res = allocate_raft(db, None, date, slot, group_size,
+                                      hold_booking_id=booking['_id'], session=session)
+            if alloc_res.get('status') != 'Confirmed':
+                return None, alloc_res, None
+            raft_allocations = alloc_res.get('rafts', []) or []
+            raft_details = alloc_res.get('raft_details', []) or []
+
+        now = datetime.utcnow()
+        confirmed = {
+            'status': 'Confirmed',
+            'payment_status': 'Paid',
+            'razorpay_payment_id': payment['payment_id'],
+            'payment_verified_at': now,
+            'updated_at': now,
+            'raft_allocations': raft_allocations,
+            'raft_allocation_details': raft_details,
+        }
+        before = db.bookings.find_one_and_update(
+            booking_filter,
+            {'$set': confirmed},
+            return_document=ReturnDocument.BEFORE,
+            session=session,
+        )
+        if not before:
+            if session is not None:
+                # Undo the raft writes along with everything else
+                raise _BookingChanged()
+            return None, alloc_res, None
+        updated = dict(before, **confirmed)
+
+        # Record payment in a separate collection (one idempotent upsert)
+        insert_payment(
+            db,
+            booking_id=str(updated['_id']),
+            order_id=payment['order_id'],
+            payment_id=payment['payment_id'],
+            signature=payment.get('signature'),
+            amount=updated.get('amount'),
+            status='paid',
+            raw_response=payment.get('raw_response'),
+            session=session,
+        )
+        return updated, alloc_res, before
+
+    if not use_transaction:
+        updated, alloc_res, before = apply()
+    else:
+        for attempt in range(PAYMENT_TRANSACTION_ATTEMPTS):
+            try:
+                with db.client.start_session() as session:
+                    updated, alloc_res, before = session.with_transaction(apply)
+                break
+            except _BookingChanged:
+                return None, None
+            except DuplicateKeyError:
+                # The webhook recorded this payment between our read and the upsert.
+                # Everything was rolled back; a fresh transaction updates that document.
+                if attempt == PAYMENT_TRANSACTION_ATTEMPTS - 1:
+                    raise
+    if updated:
+        record_booking_change(db, before, updated)
+    return updated, alloc_res
+
+
+def recompute_occupancy_for_slot(db, date, slot, settings=None):
     """Recompute raft occupancies for a specific date+slot from confirmed bookings.
-    This mirrors the logic in scripts/recompute_raft_occupancy.py but scoped to a single
+    This mirrors utils.occupancy.recompute_occupancy but scoped to a single
     date/slot so it can be used after single-booking moves to keep occupancy consistent.
+
+    Seats are summed in memory from one projected booking query and only rafts
+    whose value changes are written, with a single bulk_write of $set, so
+    readers never see the slot zeroed part-way through.
     """
-    settings = load_settings(db)
+    settings = settings or load_settings(db)
     rafts_per_slot = settings.get('rafts_per_slot', 5)
     capacity = settings.get('capacity', 6)
 
-    # Ensure rafts exist for this slot
-    ensure_rafts_for_date_slot(db, date, slot, rafts_per_slot, capacity)
+    rafts = list(db.rafts.find({'day': date, 'slot': slot}, {'raft_id': 1, 'occupancy': 1, 'is_special': 1}))
+    if len(rafts) < rafts_per_slot:
+        # Ensure rafts exist for this slot
+        ensure_rafts_for_date_slot(db, date, slot, rafts_per_slot, capacity)
+        rafts = list(db.rafts.find({'day': date, 'slot': slot}, {'raft_id': 1, 'occupancy': 1, 'is_special': 1}))
 
-    # Reset occupancies for this slot
-    db.rafts.update_many({'day': date, 'slot': slot}, {'$set': {'occupancy': 0, 'is_special': False}})
-
-    # Re-apply all confirmed bookings for this date+slot
-    for b in db.bookings.find({'status': 'Confirmed', 'date': date, 'slot': slot}):
-        details = b.get('raft_allocation_details')
-        group = int(b.get('group_size', 0))
-        if details:
-            # Use exact stored per-raft counts
-            for entry in details:
-                rid = int(entry.get('raft_id'))
-                add = int(entry.get('count', 0))
-                if add:
-                    db.rafts.update_one({'day': date, 'slot': slot, 'raft_id': rid}, {'$inc': {'occupancy': add}})
-        else:
-            rafts = b.get('raft_allocations', [])
-            if rafts:
-                per = group // len(rafts) if len(rafts) else 0
-                rem = group % len(rafts) if len(rafts) else 0
-                for idx, rid in enumerate(rafts):
-                    add = per + (1 if idx < rem else 0)
-                    db.rafts.update_one({'day': date, 'slot': slot, 'raft_id': rid}, {'$inc': {'occupancy': add}})
-            else:
-                # If a confirmed booking has no stored raft allocations, try to allocate and persist
-                res = allocate_raft(db, None, b['date'], b['slot'], int(b.get('group_size', 0)))
-                if res.get('status') == 'Confirmed':
-                    db.bookings.update_one({'_id': b['_id']}, {'$set': {'raft_allocations': res.get('rafts', []), 'raft_allocation_details': res.get('raft_details', [])}})
-                    new_details = res.get('raft_details', [])
-                    for entry in new_details:
-                        rid = int(entry.get('raft_id'))
-                        add = int(entry.get('count', 0))
-                        if add:
-                            db.rafts.update_one({'day': date, 'slot': slot, 'raft_id': rid}, {'$inc': {'occupancy': add}})
+    # Sum all confirmed bookings for this date+slot per raft
+    occupancy = {}
+    unallocated = []
+    for b in db.bookings.find(
+        {'status': 'Confirmed', 'date': date, 'slot': slot},
+        {'group_size': 1, 'raft_allocations': 1, 'raft_allocation_details': 1},
+    ):
+        if not b.get('raft_allocation_details') and not b.get('raft_allocations'):
+            unallocated.append(b)
+            continue
+        for rid, seats in booking_seats_by_raft(b).items():
+            occupancy[rid] = occupancy.get(rid, 0) + seats
+
+    ops = []
+    for r in rafts:
+        target = occupancy.get(r.get('raft_id'), 0)
+        if r.get('occupancy', 0) != target or r.get('is_special', False):
+            ops.append(UpdateOne({'_id': r['_id']}, {'$set': {'occupancy': target, 'is_special': False}}))
+    if ops:
+        db.rafts.bulk_write(ops, ordered=False)
+
+    # If a confirmed booking has no stored raft allocations, try to allocate and persist
+    for b in unallocated:
+        res = allocate_raft(db, None, date, slot, int(b.get('group_size', 0)))
+        if res.get('status') == 'Confirmed':
+            db.bookings.update_one({'_id': b['_id']}, {'$set': {'raft_allocations': res.get('rafts', []), 'raft_allocation_details': res.get('raft_details', []), 'updated_at': datetime.utcnow()}})
 
 def check_capacity_available(db, date, slot, group_size):
     """
@@ -227,10 +570,12 @@ def check_capacity_available(db, date, slot, group_size):
     # Ensure rafts exist for this date/slot
     ensure_rafts_for_date_slot(db, date, slot, rafts_per_slot, capacity)
     
-    # Fetch rafts for date+slot sorted, limit to configured number
+    # Fetch rafts for date+slot sorted, limit to configured number;
+    # seats held by checkouts in progress count as taken
     rafts = list(db.rafts.find({'day': date, 'slot': slot}).sort('raft_id', 1).limit(rafts_per_slot))
     if not rafts:
         return False
+    overlay_holds(rafts, active_holds(db, date, slot))
     
     # ---------- Bulk booking check (mirrors allocate_raft logic) ----------
     if group_size > (rafts_per_slot * capacity):
@@ -436,26 +781,30 @@ def postpone_booking(db, booking_oid, new_date, new_slot):
         update_data = {
             'date': new_date,
             'slot': new_slot,
+            'slot_index': get_slot_index(settings.get('time_slots'), new_slot),
             'status': 'Confirmed',  # Always confirmed since we checked capacity
             'raft_allocations': res.get('rafts', []),
             'raft_allocation_details': res.get('raft_details', []),
-            'rescheduled_by_admin': True
+            'rescheduled_by_admin': True,
+            'postponed_from': {'date': old_date, 'slot': old_slot},
+            'updated_at': datetime.utcnow(),
         }
         db.bookings.update_one({'_id': booking_oid}, {'$set': update_data})
         print(f"[POSTPONE-LOG] booking updated {booking_oid} -> {update_data}")
         # Recompute occupancies for old and new slots so raft counts stay consistent
         try:
             # old slot should no longer include this booking after update
-            recompute_occupancy_for_slot(db, old_date, old_slot)
+            recompute_occupancy_for_slot(db, old_date, old_slot, settings)
         except Exception:
             print(f"[POSTPONE-LOG] recompute failed for old slot {old_date} {old_slot}")
         try:
-            recompute_occupancy_for_slot(db, new_date, new_slot)
+            recompute_occupancy_for_slot(db, new_date, new_slot, settings)
         except Exception:
             print(f"[POSTPONE-LOG] recompute failed for new slot {new_date} {new_slot}")
 
         # Fetch updated booking to return
         updated_booking = db.bookings.find_one({'_id': booking_oid})
+        record_booking_change(db, b, updated_booking, settings)
         
         return {
             'message': f'Booking rescheduled to {new_date} at {new_slot}',
@@ -485,3 +834,207 @@ def postpone_booking(db, booking_oid, new_date, new_slot):
                 )
                 print(f"[POSTPONE-LOG] rolled back raft {raft_id} to {original_state}")
         return {'error': f'Postpone failed: {str(e)}'}
+
+
+def _plan_closure_moves(settings, bookings, source_occupancy, candidates, target_rafts):
+    """
+    Placement plan for reschedule_closed_slots, computed entirely in memory.
+
+    Largest groups go first (they have the fewest places they can fit); each
+    takes the first candidate (date, slot) where plan_raft_allocation accepts
+    it, which also updates that slot's in-memory rafts for the next booking.
+    Returns (moves, unplaced); each move carries the booking, its target, the
+    allocation result, the seats it frees per source raft and the target
+    rafts it turned special.
+    """
+    moves, unplaced = [], []
+    for b in sorted(bookings, key=lambda b: -int(b.get('group_size', 0) or 0)):
+        group_size = int(b.get('group_size', 0) or 0)
+        for target in candidates:
+            rafts = target_rafts.get(target, [])
+            res = plan_raft_allocation(rafts, group_size, settings)
+            if res.get('status') == 'Confirmed':
+                break
+        else:
+            unplaced.append({'id': str(b['_id']), 'group_size': group_size, 'slot': b.get('slot'),
+                             'error': f'No target slot has room for {group_size} people'})
+            continue
+
+        freed = {}
+        occupancy = source_occupancy.setdefault(b.get('slot'), {})
+        if b.get('raft_allocations'):
+            for raft_id, amount_to_remove in _booking_deallocations(settings, b, occupancy):
+                if raft_id not in occupancy:
+                    continue
+                removed = min(occupancy[raft_id], amount_to_remove)
+                occupancy[raft_id] -= removed
+                freed[raft_id] = freed.get(raft_id, 0) + removed
+        special = {r['raft_id'] for r in target_rafts[target] if r.get('is_special') and r['raft_id'] in res['rafts']}
+        moves.append({'booking': b, 'target': target, 'result': res, 'freed': freed, 'special': special})
+    return moves, unplaced
+
+
+def reschedule_closed_slots(db, date, slot=None, target_dates=None, target_slots=None,
+                            batch_size=200, dry_run=False):
+    """
+    Move every Confirmed booking off a closed (date, slot), or off the whole
+    date when slot is None, e.g. when the river is shut for weather.
+
+    Candidate targets are target_dates x target_slots (defaults: the same date
+    and all configured slots), minus the closed slots, tried in that order.
+    Source bookings and all candidate rafts are loaded once, the placement is
+    planned in memory (_plan_closure_moves) and then committed in batches of
+    `batch_size` bookings: one rafts bulk_write ($inc, so bookings made on the
+    target slots meanwhile are kept), one bookings bulk_write and one
+    daily_stats update per batch. Nothing is written with dry_run.
+
+    Seats held by checkouts in progress (utils.seat_holds) on the targets
+    count as taken. The closed date and target dates must not be in the past.
+
+    Returns {'moved': [...], 'unplaced': [...], 'dry_run': bool}, or {'error'};
+    unplaced bookings stay where they are.
+    """
+    settings = load_settings(db)
+    time_slots = settings.get('time_slots', [])
+    rafts_per_slot = settings.get('rafts_per_slot', 5)
+    capacity = settings['capacity']
+
+    closed = {(date, slot)} if slot else {(date, s) for s in time_slots}
+    candidate_dates = list(dict.fromkeys(target_dates or [date]))
+    candidate_slots = list(dict.fromkeys(target_slots or time_slots))
+    candidates = [(d, s) for d in candidate_dates for s in candidate_slots if (d, s) not in closed]
+    # `date` is the closed date here; bookings are only ever moved onto days still to come
+    today = datetime.now().date().isoformat()
+    if date < today or any(d < today for d in candidate_dates):
+        return {'error': 'Dates must not be in the past'}
+
+    source_filter = {'date': date, 'status': 'Confirmed'}
+    if slot:
+        source_filter['slot'] = slot
+    bookings = list(db.bookings.find(source_filter))
+    if not bookings:
+        return {'moved': [], 'unplaced': [], 'dry_run': dry_run}
+
+    if not dry_run:
+        ensure_rafts_for_dates(db, candidate_dates, candidate_slots, rafts_per_slot, capacity)
+    target_rafts = {}
+    for r in db.rafts.find(
+        {'day': {'$in': candidate_dates}, 'slot': {'$in': candidate_slots}},
+        {'day': 1, 'slot': 1, 'raft_id': 1, 'occupancy': 1, 'is_special': 1},
+    ).sort([('day', 1), ('slot', 1), ('raft_id', 1)]):
+        key = (r['day'], r['slot'])
+        if key in closed:
+            continue
+        slot_rafts = target_rafts.setdefault(key, [])
+        if len(slot_rafts) < rafts_per_slot:
+            r['occupancy'] = max(0, r.get('occupancy', 0))
+            slot_rafts.append(r)
+    if dry_run:
+        # Rafts that ensure_rafts_for_dates would create start out empty
+        for key in candidates:
+            slot_rafts = target_rafts.setdefault(key, [])
+            have = {r['raft_id'] for r in slot_rafts}
+            slot_rafts.extend({'raft_id': rid, 'occupancy': 0, 'is_special': False}
+                              for rid in range(1, rafts_per_slot + 1) if rid not in have)
+            slot_rafts.sort(key=lambda r: r['raft_id'])
+            del slot_rafts[rafts_per_slot:]
+    # Seats held by checkouts in progress count as taken, as in allocate_raft
+    holds = {}
+    for hold in db.seat_holds.find(
+        {'date': {'$in': candidate_dates}, 'slot': {'$in': candidate_slots}, 'expires_at': {'$gt': datetime.utcnow()}},
+        {'date': 1, 'slot': 1, 'raft_details': 1},
+    ):
+        holds.setdefault((hold['date'], hold['slot']), []).append(hold)
+    for key, slot_holds in holds.items():
+        overlay_holds(target_rafts.get(key, []), slot_holds)
+
+    source_occupancy = {}
+    for r in db.rafts.find(dict({'day': date}, **({'slot': slot} if slot else {})), {'slot': 1, 'raft_id': 1, 'occupancy': 1}):
+        source_occupancy.setdefault(r['slot'], {})[r['raft_id']] = max(0, r.get('occupancy', 0))
+    remaining = {s: dict(occ) for s, occ in source_occupancy.items()}
+
+    moves, unplaced = _plan_closure_moves(settings, bookings, source_occupancy, candidates, target_rafts)
+
+    report = []
+    for m in moves:
+        b, (new_date, new_slot) = m['booking'], m['target']
+        report.append({
+            'id': str(b['_id']), 'group_size': b.get('group_size'),
+            'from': {'date': date, 'slot': b.get('slot')},
+            'to': {'date': new_date, 'slot': new_slot},
+            'raft_allocations': m['result'].get('rafts', []),
+        })
+    if dry_run:
+        return {'moved': report, 'unplaced': unplaced, 'dry_run': True}
+
+    skipped = set()
+    for start in range(0, len(moves), batch_size):
+        batch = moves[start:start + batch_size]
+        now = datetime.utcnow()
+        booking_writes = []
+        for m in batch:
+            b, (new_date, new_slot) = m['booking'], m['target']
+            m['update'] = {
+                'date': new_date,
+                'slot': new_slot,
+                'slot_index': get_slot_index(time_slots, new_slot),
+                'status': 'Confirmed',
+                'raft_allocations': m['result'].get('rafts', []),
+                'raft_allocation_details': m['result'].get('raft_details', []),
+                'rescheduled_by_admin': True,
+                'postponed_from': {'date': date, 'slot': b.get('slot')},
+                'updated_at': now,
+            }
+            booking_writes.append(UpdateOne(
+                {'_id': b['_id'], 'status': 'Confirmed', 'date': date, 'slot': b.get('slot')},
+                {'$set': m['update']},
+            ))
+
+        # Bookings first: one cancelled or postponed since it was read does not
+        # match, and its seats must then stay where they are
+        result = db.bookings.bulk_write(booking_writes, ordered=False)
+        if result.matched_count < len(batch):
+            moved_ids = {
+                d['_id'] for d in db.bookings.find(
+                    {'_id': {'$in': [m['booking']['_id'] for m in batch]}, 'updated_at': now,
+                     'postponed_from.date': date},
+                    {'_id': 1},
+                )
+            }
+            skipped.update(m['booking']['_id'] for m in batch if m['booking']['_id'] not in moved_ids)
+            batch = [m for m in batch if m['booking']['_id'] in moved_ids]
+
+        raft_inc = {}
+        special = set()
+        for m in batch:
+            new_date, new_slot = m['target']
+            for entry in m['result'].get('raft_details', []):
+                key = (new_date, new_slot, entry['raft_id'])
+                raft_inc[key] = raft_inc.get(key, 0) + int(entry.get('count', 0))
+            special.update((new_date, new_slot, raft_id) for raft_id in m['special'])
+            old_slot = m['booking'].get('slot')
+            for raft_id, amount in m['freed'].items():
+                key = (date, old_slot, raft_id)
+                raft_inc[key] = raft_inc.get(key, 0) - amount
+                remaining[old_slot][raft_id] -= amount
+
+        raft_ops = []
+        for (day, raft_slot, raft_id), delta in raft_inc.items():
+            update = {'$inc': {'occupancy': delta}}
+            if (day, raft_slot, raft_id) in special:
+                update['$set'] = {'is_special': True}
+            elif (day, raft_slot) in closed and remaining[raft_slot][raft_id] != 7:
+                # Clear is_special flag following allocation logic rules
+                update['$set'] = {'is_special': False}
+            raft_ops.append(UpdateOne({'day': day, 'slot': raft_slot, 'raft_id': raft_id}, update))
+        if raft_ops:
+            db.rafts.bulk_write(raft_ops, ordered=False)
+        record_booking_changes(db, [(m['booking'], dict(m['booking'], **m['update'])) for m in batch], settings)
+        logger.info("Reschedule: batch %d-%d of %d move(s) off %s %s committed",
+                    start + 1, min(start + batch_size, len(moves)), len(moves), date, slot or '(all slots)')
+
+    if skipped:
+        report = [r for r in report if ObjectId(r['id']) not in skipped]
+        unplaced.extend({'id': str(oid), 'error': 'Booking changed while being rescheduled; left as it is'}
+                        for oid in skipped)
+    return {'moved': report, 'unplaced': unplaced, 'dry_run': False}
@@ -0,0 +1,20 @@
+# utils/checkpoints.py
+"""
+Progress markers for background jobs, one document per job in `job_checkpoints`
+keyed by the job name, so a job started from cron or a loop picks up where the
+previous run stopped.
+"""
+from datetime import datetime
+
+
+def load_checkpoint(db, job):
+    """The stored checkpoint fields for `job`, or {} when it never ran."""
+    doc = db.job_checkpoints.find_one({'_id': job}) or {}
+    doc.pop('_id', None)
+    return doc
+
+
+def save_checkpoint(db, job, **fields):
+    """Store `fields` for `job` (merged into what is already there)."""
+    fields['saved_at'] = datetime.utcnow()
+    db.job_checkpoints.update_one({'_id': job}, {'$set': fields}, upsert=True)
@@ -0,0 +1,220 @@
+# utils/daily_stats.py
+"""
+Materialised per (date, slot) rollups in the `daily_stats` collection.
+
+Every booking contributes a fixed set of numbers to the row for its date and
+slot, derived from its current state only (see booking_contribution). Mutation
+paths call record_booking_change(s) with the booking before and after the
+change and the difference is applied with $inc, so the rollups always equal
+what rebuild_daily_stats would compute from scratch.
+
+Money follows the dashboard rules (utils.admin_queries): revenue is the trip
+total of every non-cancelled booking, advance collected is the advance of the
+non-cancelled bookings that are paid.
+"""
+import logging
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from models.indexes import INDEXES, ensure_indexes
+from utils.admin_queries import INACTIVE_STATUSES, money_stages
+from utils.allocation_logic import load_settings
+from utils.amount_calculator import calculate_total_amount
+
+logger = logging.getLogger("daily_stats")
+
+STAT_FIELDS = (
+    'bookings', 'headcount', 'confirmed_seats', 'revenue',
+    'advance_collected', 'cancellations', 'postponements',
+)
+# Counted on the booking's own (date, slot); postponements go to the slot it left
+BOOKING_FIELDS = tuple(f for f in STAT_FIELDS if f != 'postponements')
+
+
+def _group_size(booking):
+    try:
+        return int(booking.get('group_size') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def booking_amounts(booking, settings):
+    """
+    The booking's total and advance: the amounts stored when it was priced, or
+    for older bookings without them, the current prices (calculate_total_amount).
+    """
+    total, advance = booking.get('total_amount'), booking.get('advance_amount')
+    if total is None or advance is None:
+        amounts = calculate_total_amount(settings, booking.get('date'), _group_size(booking))
+        total = amounts.get('total_amount', 0) if total is None else total
+        advance = amounts.get('advance_amount', 0) if advance is None else advance
+    return {'total_amount': total, 'advance_amount': advance}
+
+
+def booking_contribution(booking, settings):
+    """
+    What one booking adds to daily_stats, as {(date, slot): {field: value}}.
+    Postponements are counted against the slot the booking was moved away from.
+    """
+    contribution = {}
+    if not booking:
+        return contribution
+
+    date, slot = booking.get('date'), booking.get('slot')
+    if isinstance(date, str):
+        status = booking.get('status')
+        group = _group_size(booking)
+        fields = {}
+        if status in INACTIVE_STATUSES:
+            if status == 'Cancelled':
+                fields['cancellations'] = 1
+        else:
+            amounts = booking_amounts(booking, settings)
+            fields['bookings'] = 1
+            fields['headcount'] = group
+            fields['revenue'] = amounts['total_amount']
+            if str(booking.get('payment_status') or '').lower() == 'paid':
+                fields['advance_collected'] = amounts['advance_amount']
+            if status == 'Confirmed':
+                fields['confirmed_seats'] = group
+        contribution[(date, slot)] = fields
+
+    origin = booking.get('postponed_from') or {}
+    if isinstance(origin.get('date'), str):
+        key = (origin['date'], origin.get('slot'))
+        contribution.setdefault(key, {})
+        contribution[key]['postponements'] = contribution[key].get('postponements', 0) + 1
+    return contribution
+
+
+def record_booking_changes(db, changes, settings=None):
+    """
+    Apply [(before, after), ...] booking changes to daily_stats in one bulk write.
+    `before` is None for a new booking and `after` is None for a deleted one.
+    Failures are logged and never propagate into the booking flow; a rebuild
+    brings the rollups back in line.
+    """
+    try:
+        settings = settings or load_settings(db)
+        deltas = {}
+        for before, after in changes:
+            for sign, booking in ((-1, before), (1, after)):
+                for key, fields in booking_contribution(booking, settings).items():
+                    row = deltas.setdefault(key, {})
+                    for field, value in fields.items():
+                        row[field] = row.get(field, 0) + sign * value
+
+        now = datetime.now(timezone.utc)
+        ops = []
+        for (date, slot), row in deltas.items():
+            inc = {field: value for field, value in row.items() if value}
+            if inc:
+                ops.append(UpdateOne(
+                    {'date': date, 'slot': slot},
+                    {'$inc': inc, '$set': {'updated_at': now}},
+                    upsert=True,
+                ))
+        if ops:
+            db.daily_stats.bulk_write(ops, ordered=False)
+    except Exception:
+        logger.exception("Failed to update daily_stats")
+
+
+def record_booking_change(db, before, after, settings=None):
+    """Single-booking form of record_booking_changes."""
+    record_booking_changes(db, [(before, after)], settings)
+
+
+def _oldest_hot_date(db):
+    """Oldest booking date still in `bookings` (today when there is none or it is later)."""
+    today = datetime.now().date().isoformat()
+    first = next(db.bookings.find({'date': {'$type': 'string'}}, {'date': 1}).sort('date', 1).limit(1), None)
+    return min(first['date'], today) if first else today
+
+
+def rebuild_daily_stats(db, settings=None):
+    """
+    Recompute daily_stats from every booking, in `bookings` and in
+    `bookings_archive` (utils.archive), with two aggregations each, build the
+    result in a scratch collection and swap it in with one rename. Rows for
+    dates before the oldest hot booking that neither collection covers (dates
+    archived to files) are carried over as they are.
+    Returns the number of (date, slot) rows written.
+    """
+    settings = settings or load_settings(db)
+    inactive = {'$in': ['$status', list(INACTIVE_STATUSES)]}
+    confirmed = {'$eq': ['$status', 'Confirmed']}
+    pipeline = [{'$match': {'date': {'$type': 'string'}}}] + money_stages(settings) + [
+        {'$group': {
+            '_id': {'date': '$date', 'slot': '$slot'},
+            'bookings': {'$sum': {'$cond': [inactive, 0, 1]}},
+            'headcount': {'$sum': {'$cond': [inactive, 0, '$_group']}},
+            'confirmed_seats': {'$sum': {'$cond': [confirmed, '$_group', 0]}},
+            'revenue': {'$sum': {'$cond': [inactive, 0, '$total_amount']}},
+            'advance_collected': {'$sum': {'$cond': [inactive, 0, {'$cond': ['$_paid', '$advance_amount', 0]}]}},
+            'cancellations': {'$sum': {'$cond': [{'$eq': ['$status', 'Cancelled']}, 1, 0]}},
+        }},
+    ]
+    postponed = [
+        {'$match': {'postponed_from.date': {'$type': 'string'}}},
+        {'$group': {
+            '_id': {'date': '$postponed_from.date', 'slot': '$postponed_from.slot'},
+            'postponements': {'$sum': 1},
+        }},
+    ]
+
+    rows = {}
+    for collection in (db.bookings, db.bookings_archive):
+        for stages, fields in ((pipeline, BOOKING_FIELDS), (postponed, ('postponements',))):
+            for doc in collection.aggregate(stages, allowDiskUse=True):
+                key = (doc['_id']['date'], doc['_id'].get('slot'))
+                row = rows.setdefault(key, dict.fromkeys(STAT_FIELDS, 0))
+                for field in fields:
+                    row[field] += doc.get(field, 0)
+
+    cutoff = _oldest_hot_date(db)
+    for old in db.daily_stats.find({'date': {'$lt': cutoff}}):
+        key = (old['date'], old.get('slot'))
+        if key not in rows:
+            rows[key] = {field: old.get(field, 0) for field in STAT_FIELDS}
+
+    now = datetime.now(timezone.utc)
+    scratch = db['daily_stats_rebuild']
+    scratch.drop()
+    ensure_indexes(db, {scratch.name: INDEXES['daily_stats']})
+    if rows:
+        scratch.insert_many([
+            dict(row, date=date, slot=slot, updated_at=now)
+            for (date, slot), row in rows.items()
+        ])
+        scratch.rename('daily_stats', dropTarget=True)
+    else:
+        scratch.drop()
+        db.daily_stats.delete_many({})
+    return len(rows)
+
+
+def fetch_daily_stats(db, from_date, to_date, by='date'):
+    """
+    Read rollups for [from_date, to_date] grouped by 'date', 'slot' or 'date_slot'.
+    Returns (rows, totals); only daily_stats is touched.
+    """
+    group_id = {
+        'date': {'date': '$date'},
+        'slot': {'slot': '$slot'},
+        'date_slot': {'date': '$date', 'slot': '$slot'},
+    }[by]
+    pipeline = [
+        {'$match': {'date': {'$gte': from_date, '$lte': to_date}}},
+        {'$group': dict({'_id': group_id}, **{f: {'$sum': f'${f}'} for f in STAT_FIELDS})},
+        {'$sort': {'_id': 1}},
+    ]
+    rows = []
+    totals = dict.fromkeys(STAT_FIELDS, 0)
+    for doc in db.daily_stats.aggregate(pipeline):
+        key = doc.pop('_id')
+        for field in STAT_FIELDS:
+            totals[field] += doc.get(field, 0)
+        rows.append(dict(key, **doc))
+    return rows, totals
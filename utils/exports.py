@@ -0,0 +1,105 @@
+# utils/exports.py
+"""
+Streaming CSV exports for staff: bookings over a date range and per-slot guide
+manifests. Rows are read from batched server-side cursors and written out in
+chunks, so memory stays flat however many bookings a range holds.
+"""
+import csv
+import io
+from itertools import groupby
+
+from models.booking_model import MANIFEST_PROJECTION
+from utils.occupancy import booking_seats_by_raft
+
+# Excel only detects UTF-8 (names, the en dash in slot labels) with a BOM
+CSV_BOM = '\ufeff'
+ROWS_PER_CHUNK = 200
+# Spreadsheets run cells starting with these as formulas (CSV injection);
+# such text cells get a leading apostrophe so they are shown as typed
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+BOOKING_EXPORT_HEADER = [
+    'Booking ID', 'Date', 'Slot', 'Name', 'Phone', 'Email', 'Group Size', 'Rafts',
+    'Status', 'Payment Status', 'Total Amount', 'Advance Amount', 'Balance Amount', 'Created At (IST)',
+]
+
+MANIFEST_HEADER = ['Date', 'Slot', 'Raft', 'Name', 'Phone', 'Seats', 'Group Size']
+
+
+def csv_safe(value):
+    """`value` with a leading apostrophe when it is text a spreadsheet would run as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(header, rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """
+    Yield CSV text for `header` and the `rows` iterable, `rows_per_chunk` rows
+    at a time. Text cells go through csv_safe; numbers are written as they are.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write(CSV_BOM)
+    writer.writerow(header)
+    pending = 0
+    for row in rows:
+        writer.writerow([csv_safe(value) for value in row])
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def booking_export_row(booking):
+    """CSV row for a decorated dashboard booking (see admin_routes._decorate_booking)."""
+    return [
+        str(booking['_id']),
+        booking.get('date', ''),
+        booking.get('slot', ''),
+        booking.get('user_name') or booking.get('name') or '',
+        booking.get('phone', ''),
+        booking.get('email', ''),
+        booking.get('group_size', ''),
+        ' '.join(str(r) for r in booking.get('raft_allocations') or []),
+        booking.get('status', ''),
+        booking.get('payment_status_display', ''),
+        booking.get('total_amount', 0),
+        booking.get('advance_amount', 0),
+        booking.get('balance_amount', 0),
+        booking.get('created_at_ist', ''),
+    ]
+
+
+def iter_manifest_rows(db, date, slot=None, batch_size=500):
+    """
+    Guide manifest rows for confirmed bookings on `date` (optionally one slot):
+    one row per guest group per raft, followed by a headcount row for each raft.
+    Bookings are read in slot order and held only one slot at a time.
+    """
+    query = {'date': date, 'status': 'Confirmed'}
+    if slot:
+        query['slot'] = slot
+    cursor = (
+        db.bookings.find(query, MANIFEST_PROJECTION)
+        .sort([('slot_index', 1), ('slot', 1), ('created_at', 1)])
+        .batch_size(batch_size)
+    )
+    for slot_name, bookings in groupby(cursor, key=lambda b: b.get('slot', '')):
+        by_raft = {}
+        for b in bookings:
+            for rid, seats in booking_seats_by_raft(b).items():
+                by_raft.setdefault(rid, []).append((b, seats))
+        for rid in sorted(by_raft):
+            headcount = 0
+            for b, seats in by_raft[rid]:
+                headcount += seats
+                yield [
+                    date, slot_name, rid,
+                    b.get('user_name') or b.get('name') or '',
+                    b.get('phone', ''), seats, b.get('group_size', ''),
+                ]
+            yield [date, slot_name, rid, 'Raft total', '', headcount, '']
@@ -0,0 +1,188 @@
+# utils/gateway.py
+"""
+Bounded, deadline-aware calls to the Razorpay API.
+
+Network calls to the gateway run on a small shared thread pool instead of
+directly in the request thread:
+
+- the pool and its queue are bounded, so a slow gateway cannot pile up more
+  than max_workers + max_queue waiting calls; extra calls fail at once
+- every call has an overall deadline; each HTTP attempt gets the remaining
+  time as its requests timeout, and the caller stops waiting at the deadline
+- connection errors, timeouts and 5xx gateway errors are retried with
+  exponential backoff and full jitter while the deadline allows
+- a circuit breaker opens after failure_threshold consecutive failures and
+  rejects calls for reset_timeout seconds, then lets one trial call through
+
+Callers get the gateway's result or a GatewayUnavailable; client errors
+(bad request, signature mismatch) are raised unchanged and never retried.
+Signature checks are local HMACs and do not need to go through here.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+import razorpay
+
+logger = logging.getLogger("gateway")
+
+# Worth another attempt: the request may not have reached Razorpay, or Razorpay failed
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    razorpay.errors.ServerError,
+    razorpay.errors.GatewayError,
+)
+
+
+class GatewayUnavailable(Exception):
+    """The gateway could not be reached in time (deadline, retries, open circuit or full queue)."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one trial call) -> closed."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        """True when a call may go out now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("Gateway circuit opened after %d failure(s)", self._failures)
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class RateLimiter:
+    """Token bucket shared by threads: at most `rate` acquisitions per second, bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Gateway:
+    """Runs gateway calls on a bounded pool with deadlines, retries and a circuit breaker."""
+
+    def __init__(self, max_workers=8, max_queue=16, deadline=8.0, retries=2,
+                 backoff=0.2, max_backoff=2.0, breaker=None):
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gateway')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def _submit(self, fn, args, kwargs):
+        """Queue one attempt, or raise GatewayUnavailable when the queue is full or the circuit is open."""
+        if not self._slots.acquire(blocking=False):
+            raise GatewayUnavailable("Gateway queue is full")
+        if not self.breaker.allow():
+            self._slots.release()
+            raise GatewayUnavailable("Gateway circuit is open")
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            self.breaker.record_failure()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def call(self, fn, *args, deadline=None, retries=None, **kwargs):
+        """
+        Run fn(*args, timeout=<remaining seconds>, **kwargs) on the pool and
+        return its result, retrying transient failures until `deadline`
+        seconds have passed. `fn` must accept the requests `timeout` keyword
+        (all razorpay resource methods pass it through).
+        """
+        deadline = self.deadline if deadline is None else deadline
+        retries = self.retries if retries is None else retries
+        give_up_at = time.monotonic() + deadline
+        last_error = None
+
+        for attempt in range(retries + 1):
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            future = self._submit(fn, args, dict(kwargs, timeout=remaining))
+            try:
+                result = future.result(timeout=remaining)
+            except FutureTimeout as exc:
+                # The worker thread finishes on its own once the requests timeout hits
+                last_error = exc
+            except RETRYABLE_ERRORS as exc:
+                last_error = exc
+            except Exception:
+                # Client errors say nothing about gateway health
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+            self.breaker.record_failure()
+            logger.warning("Gateway call %s failed (attempt %d/%d): %r",
+                           getattr(fn, '__qualname__', fn), attempt + 1, retries + 1, last_error)
+            if attempt < retries:
+                pause = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+                if time.monotonic() + pause >= give_up_at:
+                    break
+                time.sleep(pause)
+
+        raise GatewayUnavailable(f"Gateway did not answer within {deadline:.1f}s") from last_error
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,316 @@
+# utils/occupancy.py
+"""
+Occupancy views built from confirmed bookings, and the full recompute that
+brings the stored raft occupancy back in line with them.
+
+Raft documents and bookings for a whole date window are read with one sorted
+query each and merged day by day, so the work is linear in the number of rafts
+plus bookings and only one day is held in memory at a time.
+"""
+import time
+from datetime import datetime
+from itertools import groupby
+
+from pymongo import UpdateOne
+
+from models.raft_model import ensure_rafts_for_dates
+from utils.allocation_logic import allocate_raft, load_settings
+
+
+def booking_seats_by_raft(booking):
+    """
+    Seats a booking occupies per raft id: raft_allocation_details when present,
+    otherwise group_size spread evenly over raft_allocations.
+    """
+    seats = {}
+    group_size = int(booking.get('group_size', 0) or 0)
+    if group_size <= 0:
+        return seats
+
+    details = booking.get('raft_allocation_details') or []
+    allocations = booking.get('raft_allocations') or []
+    if details:
+        for entry in details:
+            try:
+                rid = int(entry.get('raft_id'))
+                count = int(entry.get('count', 0) or 0)
+            except Exception:
+                continue
+            if count > 0:
+                seats[rid] = seats.get(rid, 0) + count
+    elif allocations:
+        try:
+            raft_ids = [int(rid) for rid in allocations]
+        except Exception:
+            return seats
+        per = group_size // len(raft_ids)
+        rem = group_size % len(raft_ids)
+        for idx, rid in enumerate(raft_ids):
+            add = per + (1 if idx < rem else 0)
+            if add > 0:
+                seats[rid] = seats.get(rid, 0) + add
+    return seats
+
+
+def _slot_detail(rafts, slot_bookings, capacity):
+    """Raft list for one (date, slot) with confirmed occupancy and the bookings on each raft."""
+    occupancy_by_raft = {}
+    bookings_by_raft = {}
+    for b in slot_bookings:
+        for rid, count in booking_seats_by_raft(b).items():
+            occupancy_by_raft[rid] = occupancy_by_raft.get(rid, 0) + count
+        entry = None
+        for rid in dict.fromkeys(b.get('raft_allocations') or []):
+            if entry is None:
+                entry = {
+                    'id': str(b['_id']),
+                    'name': b.get('user_name') or b.get('name') or '',
+                    'email': b.get('email', ''),
+                    'group_size': b.get('group_size'),
+                    'status': b.get('status'),
+                }
+            bookings_by_raft.setdefault(rid, []).append(entry)
+
+    raft_list = []
+    for r in rafts:
+        rid = r.get('raft_id')
+        try:
+            rid_int = int(rid)
+        except Exception:
+            rid_int = None
+        confirmed_occupancy = max(0, occupancy_by_raft.get(rid_int, 0) if rid_int is not None else 0)
+        raft_list.append({
+            'raft_id': rid,
+            'occupancy': confirmed_occupancy,
+            'capacity': capacity,
+            # Special only when the raft actually holds 7 confirmed seats
+            'is_special': confirmed_occupancy == 7,
+            'bookings': bookings_by_raft.get(rid_int, []) if rid_int is not None else [],
+        })
+    return raft_list
+
+
+def iter_occupancy_detail(db, dates, slots, rafts_per_slot, capacity, booking_projection=None):
+    """
+    Yield (date, {slot: raft_list}) for each of the given sorted dates.
+
+    Occupancy is derived only from Confirmed bookings so pending / unpaid
+    bookings never show as booked seats. Rafts and bookings each come from a
+    single range query sorted by date and are consumed in step with `dates`.
+    """
+    if not dates:
+        return
+    date_range = {'$gte': dates[0], '$lte': dates[-1]}
+    rafts_cursor = db.rafts.find(
+        {'day': date_range, 'slot': {'$in': list(slots)}},
+        {'_id': 0, 'day': 1, 'slot': 1, 'raft_id': 1},
+    ).sort([('day', 1), ('raft_id', 1)])
+    bookings_cursor = db.bookings.find(
+        {'date': date_range, 'status': 'Confirmed'},
+        booking_projection,
+    ).sort('date', 1)
+
+    raft_days = groupby(rafts_cursor, key=lambda r: r.get('day'))
+    booking_days = groupby(bookings_cursor, key=lambda b: b.get('date'))
+    next_rafts = next(raft_days, None)
+    next_bookings = next(booking_days, None)
+
+    for date_str in dates:
+        rafts_by_slot = {}
+        while next_rafts is not None and next_rafts[0] <= date_str:
+            if next_rafts[0] == date_str:
+                for r in next_rafts[1]:
+                    rafts_by_slot.setdefault(r.get('slot'), []).append(r)
+            next_rafts = next(raft_days, None)
+
+        bookings_by_slot = {}
+        while next_bookings is not None and next_bookings[0] <= date_str:
+            if next_bookings[0] == date_str:
+                for b in next_bookings[1]:
+                    bookings_by_slot.setdefault(b.get('slot'), []).append(b)
+            next_bookings = next(booking_days, None)
+
+        yield date_str, {
+            slot: _slot_detail(rafts_by_slot.get(slot, [])[:rafts_per_slot], bookings_by_slot.get(slot, []), capacity)
+            for slot in slots
+        }
+
+
+def iter_occupancy_by_date(db, rafts_per_slot, capacity, from_date=None, to_date=None, batch_size=500):
+    """
+    Yield (day, {slot: [raft, ...]}) in day order for raft documents in the
+    optional [from_date, to_date] window. Rafts are grouped per (day, slot) by
+    MongoDB and read through a batched cursor, so only one day is held here.
+    """
+    match = {}
+    if from_date or to_date:
+        match['day'] = {}
+        if from_date:
+            match['day']['$gte'] = from_date
+        if to_date:
+            match['day']['$lte'] = to_date
+    pipeline = [
+        {'$match': match},
+        {'$sort': {'day': 1, 'slot': 1, 'raft_id': 1}},
+        {'$group': {
+            '_id': {'day': {'$ifNull': ['$day', 'Unknown']}, 'slot': {'$ifNull': ['$slot', 'Unknown']}},
+            'rafts': {'$push': {
+                'raft_id': {'$ifNull': ['$raft_id', '?']},
+                'occupancy': {'$max': [{'$ifNull': ['$occupancy', 0]}, 0]},
+            }},
+        }},
+        {'$project': {'rafts': {'$slice': ['$rafts', rafts_per_slot]}}},
+        {'$sort': {'_id.day': 1, '_id.slot': 1}},
+    ]
+    cursor = db.rafts.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+    for day, groups in groupby(cursor, key=lambda g: g['_id']['day']):
+        slots = {}
+        for g in groups:
+            for r in g['rafts']:
+                r['capacity'] = capacity
+            slots[g['_id']['slot']] = g['rafts']
+        yield day, slots
+
+
+def date_range_filter(field, from_date=None, to_date=None):
+    """{field: {'$gte': from_date, '$lte': to_date}} with either bound optional ({} when both are None)."""
+    query = {}
+    if from_date or to_date:
+        query[field] = {}
+        if from_date:
+            query[field]['$gte'] = from_date
+        if to_date:
+            query[field]['$lte'] = to_date
+    return query
+
+
+def expected_occupancy_pipeline(from_date=None, to_date=None):
+    """
+    Aggregation over bookings giving the seats every raft should hold:
+    one {_id: {day, slot, raft_id}, occupancy} document per raft with confirmed
+    seats. Same rules as booking_seats_by_raft: raft_allocation_details when
+    present, otherwise group_size spread evenly over raft_allocations.
+    """
+    match = dict({'status': 'Confirmed'}, **date_range_filter('date', from_date, to_date))
+    return [
+        {'$match': match},
+        {'$project': {
+            'date': 1, 'slot': 1,
+            'group': {'$toInt': {'$ifNull': ['$group_size', 0]}},
+            'details': {'$ifNull': ['$raft_allocation_details', []]},
+            'allocs': {'$ifNull': ['$raft_allocations', []]},
+        }},
+        {'$addFields': {
+            'use_details': {'$gt': [{'$size': '$details'}, 0]},
+            'n': {'$max': [{'$size': '$allocs'}, 1]},
+        }},
+        {'$addFields': {'items': {'$cond': ['$use_details', '$details', '$allocs']}}},
+        {'$unwind': {'path': '$items', 'includeArrayIndex': 'idx'}},
+        {'$group': {
+            '_id': {
+                'day': '$date',
+                'slot': '$slot',
+                'raft_id': {'$toInt': {'$cond': ['$use_details', '$items.raft_id', '$items']}},
+            },
+            'occupancy': {'$sum': {'$cond': [
+                '$use_details',
+                {'$toInt': '$items.count'},
+                # even split: group // n, plus one for the first group % n rafts
+                {'$add': [
+                    {'$floor': {'$divide': ['$group', '$n']}},
+                    {'$cond': [{'$lt': ['$idx', {'$mod': ['$group', '$n']}]}, 1, 0]},
+                ]},
+            ]}},
+        }},
+    ]
+
+
+def recompute_occupancy(db, from_date=None, to_date=None, dry_run=False, chunk_size=1000,
+                        allocate_missing=False, settings=None):
+    """
+    Set every raft in [from_date, to_date] (whole collection when both are
+    None) to the occupancy its confirmed bookings imply, with is_special
+    cleared, as scripts/recompute_raft_occupancy.py always has.
+
+    Target values come from one aggregation (expected_occupancy_pipeline); the
+    rafts are then scanned once and only the ones that differ are written, with
+    bulk_write in chunks of `chunk_size`. Disjoint date ranges can run in
+    parallel. With dry_run nothing is written and the differences are returned.
+
+    Confirmed bookings without any raft allocation are listed in
+    'unallocated'; allocate_missing places them with allocate_raft afterwards.
+    Returns a report dict (counts, 'changes' for dry runs, elapsed seconds).
+    """
+    started = time.perf_counter()
+    settings = settings or load_settings(db)
+    expected = {}
+    for doc in db.bookings.aggregate(expected_occupancy_pipeline(from_date, to_date), allowDiskUse=True):
+        key = (doc['_id']['day'], doc['_id']['slot'], doc['_id']['raft_id'])
+        expected[key] = max(0, doc['occupancy'])
+
+    if not dry_run and expected:
+        ensure_rafts_for_dates(
+            db,
+            sorted({day for day, _, _ in expected}),
+            sorted({slot for _, slot, _ in expected}),
+            settings.get('rafts_per_slot', 5),
+            settings.get('capacity', 6),
+        )
+
+    report = {
+        'from': from_date, 'to': to_date, 'dry_run': dry_run,
+        'rafts_scanned': 0, 'rafts_changed': 0, 'changes': [], 'unallocated': [],
+    }
+    ops = []
+
+    def flush():
+        if ops and not dry_run:
+            db.rafts.bulk_write(ops, ordered=False)
+        ops.clear()
+
+    seen = set()
+    for r in db.rafts.find(date_range_filter('day', from_date, to_date),
+                           {'day': 1, 'slot': 1, 'raft_id': 1, 'occupancy': 1, 'is_special': 1},
+                           batch_size=chunk_size):
+        report['rafts_scanned'] += 1
+        key = (r.get('day'), r.get('slot'), r.get('raft_id'))
+        seen.add(key)
+        target = expected.get(key, 0)
+        if r.get('occupancy', 0) == target and not r.get('is_special', False):
+            continue
+        report['rafts_changed'] += 1
+        if dry_run:
+            report['changes'].append({'day': key[0], 'slot': key[1], 'raft_id': key[2],
+                                      'occupancy': r.get('occupancy', 0), 'expected': target})
+        ops.append(UpdateOne({'_id': r['_id']}, {'$set': {'occupancy': target, 'is_special': False}}))
+        if len(ops) >= chunk_size:
+            flush()
+    flush()
+
+    # Seats on raft ids that have no document (beyond rafts_per_slot, or a dry run)
+    report['missing_rafts'] = [
+        {'day': day, 'slot': slot, 'raft_id': rid, 'expected': seats}
+        for (day, slot, rid), seats in sorted(expected.items()) if (day, slot, rid) not in seen
+    ]
+
+    unallocated_filter = dict({
+        'status': 'Confirmed',
+        'raft_allocation_details': {'$in': [None, []]},
+        'raft_allocations': {'$in': [None, []]},
+    }, **date_range_filter('date', from_date, to_date))
+    for b in db.bookings.find(unallocated_filter, {'date': 1, 'slot': 1, 'group_size': 1}):
+        entry = {'id': str(b['_id']), 'date': b.get('date'), 'slot': b.get('slot')}
+        if allocate_missing and not dry_run:
+            res = allocate_raft(db, None, b.get('date'), b.get('slot'), int(b.get('group_size', 0) or 0))
+            entry['allocated'] = res.get('status') == 'Confirmed'
+            if entry['allocated']:
+                db.bookings.update_one({'_id': b['_id']}, {'$set': {
+                    'raft_allocations': res.get('rafts', []),
+                    'raft_allocation_details': res.get('raft_details', []),
+                    'updated_at': datetime.utcnow(),
+                }})
+        report['unallocated'].append(entry)
+
+    report['rafts_with_seats'] = len(expected)
+    report['elapsed'] = time.perf_counter() - started
+    return report
@@ -0,0 +1,220 @@
+# utils/occupancy_audit.py
+"""
+Occupancy drift auditor.
+
+Compares the stored raft occupancy of every (date, slot) with the seats its
+Confirmed bookings add up to - the check the stress scripts run as
+verify_occupancy_integrity - and records the result in `occupancy_audits`.
+Drifted slots can be healed with recompute_occupancy_for_slot, which only
+touches the rafts of that slot.
+
+Each window costs one grouped aggregation over rafts and one over bookings.
+audit_recent_changes narrows the window to the slots of bookings changed or
+deleted since the last run (updated_at, booking_tombstones and a stored
+checkpoint), which keeps a run every minute cheap; once every
+FULL_AUDIT_INTERVAL the same job audits every slot from today on instead, so
+drift from writes that leave no trace there is caught as well.
+"""
+import logging
+import time
+from datetime import date, datetime, timedelta
+
+from utils.admin_queries import DELTA_OVERLAP
+from utils.allocation_logic import load_settings
+from utils.booking_ops import recompute_occupancy_for_slot
+from utils.checkpoints import load_checkpoint, save_checkpoint
+from utils.occupancy import date_range_filter
+
+logger = logging.getLogger("occupancy_audit")
+
+CHECKPOINT_JOB = 'occupancy_audit'
+# (date, slot) pairs per aggregation when auditing a list of slots
+SLOTS_PER_WINDOW = 200
+# Drifted slots kept in one occupancy_audits document
+MAX_RECORDED_DRIFT = 100
+# How often audit_recent_changes checks every slot from today on
+FULL_AUDIT_INTERVAL = timedelta(hours=1)
+
+
+def _slot_filter(date_field, slots):
+    return {'$or': [{date_field: d, 'slot': s} for d, s in slots]}
+
+
+def _slot_windows(slots):
+    slots = sorted(set(slots))
+    for i in range(0, len(slots), SLOTS_PER_WINDOW):
+        chunk = slots[i:i + SLOTS_PER_WINDOW]
+        yield _slot_filter('date', chunk), _slot_filter('day', chunk), set(chunk)
+
+
+def slot_drift(db, booking_match, raft_match):
+    """
+    Stored vs expected seats for every (date, slot) in one window.
+
+    Returns {(date, slot): {'stored': n, 'expected': n}} for every slot that
+    has rafts or Confirmed bookings matching the filters.
+    """
+    stored = db.rafts.aggregate([
+        {'$match': raft_match},
+        {'$group': {
+            '_id': {'date': '$day', 'slot': '$slot'},
+            'seats': {'$sum': {'$ifNull': ['$occupancy', 0]}},
+        }},
+    ])
+    expected = db.bookings.aggregate([
+        {'$match': dict(booking_match, status='Confirmed')},
+        {'$group': {
+            '_id': {'date': '$date', 'slot': '$slot'},
+            'seats': {'$sum': {'$toInt': {'$ifNull': ['$group_size', 0]}}},
+        }},
+    ])
+    totals = {}
+    for field, cursor in (('stored', stored), ('expected', expected)):
+        for doc in cursor:
+            key = (doc['_id']['date'], doc['_id'].get('slot'))
+            row = totals.setdefault(key, {'stored': 0, 'expected': 0})
+            row[field] = doc['seats']
+    return totals
+
+
+def _audit_windows(db, windows, heal, settings):
+    """Run slot_drift over (booking_match, raft_match, keep) windows and heal what drifted."""
+    report = {'slots_checked': 0, 'drifted_slots': 0, 'seat_drift': 0, 'healed': 0, 'drift': []}
+    for booking_match, raft_match, keep in windows:
+        for (day, slot), row in sorted(slot_drift(db, booking_match, raft_match).items()):
+            if keep is not None and (day, slot) not in keep:
+                continue
+            report['slots_checked'] += 1
+            if row['stored'] == row['expected']:
+                continue
+            report['drifted_slots'] += 1
+            report['seat_drift'] += abs(row['stored'] - row['expected'])
+            entry = {'date': day, 'slot': slot, 'stored': row['stored'], 'expected': row['expected']}
+            if heal:
+                settings = settings or load_settings(db)
+                try:
+                    recompute_occupancy_for_slot(db, day, slot, settings)
+                    entry['healed'] = True
+                    report['healed'] += 1
+                except Exception:
+                    logger.exception("Failed to heal occupancy for %s %s", day, slot)
+                    entry['healed'] = False
+            report['drift'].append(entry)
+    return report
+
+
+def _finish(db, report, started, record):
+    report['elapsed'] = time.perf_counter() - started
+    if report['drifted_slots']:
+        logger.warning("Occupancy drift in %d slot(s), %d seat(s), %d healed",
+                       report['drifted_slots'], report['seat_drift'], report['healed'])
+    if record:
+        doc = dict(report, created_at=datetime.utcnow(), drift=report['drift'][:MAX_RECORDED_DRIFT])
+        db.occupancy_audits.insert_one(doc)
+    return report
+
+
+def audit_occupancy(db, from_date=None, to_date=None, slots=None, heal=False, settings=None, record=True):
+    """
+    Audit the slots in [from_date, to_date] (every slot when both are None),
+    or only the given [(date, slot), ...] pairs, in windows of SLOTS_PER_WINDOW.
+
+    With heal=True each drifted slot is recomputed from its bookings. Unless
+    record=False the report is stored in occupancy_audits. Returns the report:
+    slots_checked, drifted_slots, seat_drift (sum of |stored - expected|),
+    healed, drift (one entry per drifted slot) and elapsed seconds.
+    """
+    started = time.perf_counter()
+    if slots is None:
+        windows = [(date_range_filter('date', from_date, to_date),
+                    date_range_filter('day', from_date, to_date), None)]
+        report = _audit_windows(db, windows, heal, settings)
+        report.update({'mode': 'range', 'from': from_date, 'to': to_date})
+    else:
+        report = _audit_windows(db, _slot_windows(slots), heal, settings)
+        report['mode'] = 'slots'
+    report['heal'] = heal
+    return _finish(db, report, started, record)
+
+
+def _changed_slots(db, since):
+    """
+    (date, slot) pairs touched after `since`: the current and postponed-from
+    slot of every booking with a newer updated_at, and the slot of every
+    booking deleted since (booking_tombstones; a tombstone without a slot
+    stands for its whole date, as (date, None)).
+    Returns (slots, changed_bookings, newest_updated_at, newest_deleted_at).
+    """
+    touched = set()
+    changed = 0
+    newest = newest_deleted = None
+    for b in db.bookings.find(
+        {'updated_at': {'$gt': since['updated_at'] - DELTA_OVERLAP}},
+        {'date': 1, 'slot': 1, 'postponed_from': 1, 'updated_at': 1},
+    ):
+        changed += 1
+        if isinstance(b.get('date'), str):
+            touched.add((b['date'], b.get('slot')))
+        origin = b.get('postponed_from') or {}
+        if isinstance(origin.get('date'), str):
+            touched.add((origin['date'], origin.get('slot')))
+        if newest is None or b['updated_at'] > newest:
+            newest = b['updated_at']
+    deleted_since = since.get('deleted_at') or since['updated_at']
+    for t in db.booking_tombstones.find({'deleted_at': {'$gt': deleted_since - DELTA_OVERLAP}},
+                                        {'date': 1, 'slot': 1, 'deleted_at': 1}):
+        if isinstance(t.get('date'), str):
+            touched.add((t['date'], t.get('slot')))
+        if newest_deleted is None or t['deleted_at'] > newest_deleted:
+            newest_deleted = t['deleted_at']
+    return touched, changed, newest, newest_deleted
+
+
+def audit_recent_changes(db, heal=False, settings=None, record=True, full_every=FULL_AUDIT_INTERVAL):
+    """
+    Audit only the slots touched by bookings changed or deleted since the
+    previous run (see _changed_slots). The first run, with no checkpoint yet,
+    and any run `full_every` or more after the last full one audit every slot
+    from today on instead (report['full'] is True).
+
+    The checkpoint is the newest updated_at / deleted_at seen; the next run
+    re-reads DELTA_OVERLAP before it so writes still in flight at read time
+    are caught.
+    """
+    started = time.perf_counter()
+    checkpoint = load_checkpoint(db, CHECKPOINT_JOB)
+    now = datetime.utcnow()
+    full_at = checkpoint.get('full_audit_at')
+    full = checkpoint.get('updated_at') is None or full_at is None or now - full_at >= full_every
+    saved = {}
+
+    if full:
+        latest = db.bookings.find_one({'updated_at': {'$ne': None}}, {'updated_at': 1},
+                                      sort=[('updated_at', -1)])
+        deleted = db.booking_tombstones.find_one({}, {'deleted_at': 1}, sort=[('deleted_at', -1)])
+        saved['full_audit_at'] = now
+        if latest:
+            saved['updated_at'] = latest['updated_at']
+        if deleted:
+            saved['deleted_at'] = deleted['deleted_at']
+        today = date.today().isoformat()
+        windows = [({'date': {'$gte': today}}, {'day': {'$gte': today}}, None)]
+        report = _audit_windows(db, windows, heal, settings)
+        report['changed_bookings'] = None
+    else:
+        touched, changed, newest, newest_deleted = _changed_slots(db, checkpoint)
+        if newest is not None:
+            saved['updated_at'] = max(newest, checkpoint['updated_at'])
+        if newest_deleted is not None:
+            saved['deleted_at'] = max(newest_deleted, checkpoint.get('deleted_at') or newest_deleted)
+        whole_dates = sorted({d for d, s in touched if s is None})
+        windows = list(_slot_windows((d, s) for d, s in touched if s is not None and d not in whole_dates))
+        if whole_dates:
+            windows.append(({'date': {'$in': whole_dates}}, {'day': {'$in': whole_dates}}, None))
+        report = _audit_windows(db, windows, heal, settings)
+        report['changed_bookings'] = changed
+
+    report.update(mode='recent', full=full, heal=heal, since=checkpoint.get('updated_at'))
+    if saved:
+        save_checkpoint(db, CHECKPOINT_JOB, **saved)
+    return _finish(db, report, started, record)
@@ -0,0 +1,250 @@
+# utils/reconciliation.py
+"""
+Reconcile bookings and payments with what Razorpay actually recorded.
+
+Unsettled bookings (an order was created but the booking is not Confirmed,
+Paid and tied to a payment id) are read in _id pages from the orders
+created since the stored checkpoint. For every page the payments of each
+order are fetched from the gateway, a few at a time and rate limited, and
+compared with the booking and the `payments` collection. Fixes for the
+page go out in one bulk write per collection; each booking fix only applies
+while the booking is still in the state it was read in, and daily_stats
+follow the fixes that applied.
+
+Mismatch categories (counts and example booking ids in the report):
+
+  captured_not_marked_paid  gateway captured the money, booking not Paid     -> marked Paid
+  paid_not_confirmed        Paid but never confirmed (verify_payment missed) -> flagged allocation_error
+  awaiting_confirmation     captured within CONFIRM_GRACE, verify_payment may still be running (next run)
+  paid_awaiting_allocation  already flagged allocation_error                 (manual)
+  captured_for_cancelled    money captured for a cancelled booking          (manual refund)
+  payment_record_missing    captured payment has no payments document       -> inserted
+  failed_not_marked         every attempt failed, booking still Pending      -> marked Failed
+  paid_without_capture      booking Paid, gateway has no captured payment   (manual)
+  authorized_not_captured   payment authorized but never captured           (manual)
+  gateway_error             order could not be fetched                      (retried next run)
+
+Bookings that simply have not been paid yet are counted as awaiting_payment
+(and, like awaiting_confirmation, not reported as a mismatch).
+
+Seats are never allocated here: a paid booking without rafts is flagged
+allocation_error, the same state verify_payment leaves when the slot filled
+up, and resolved from the admin side.
+
+The checkpoint (job_checkpoints 'payment_reconciliation') keeps the creation
+time of the oldest order that still needs the gateway, so later runs only
+look at orders that can still change, but never further back than
+SETTLE_DAYS.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from utils.checkpoints import load_checkpoint, save_checkpoint
+from utils.daily_stats import record_booking_changes
+from utils.allocation_logic import load_settings
+from utils.gateway import GatewayUnavailable, RateLimiter
+
+logger = logging.getLogger("reconciliation")
+
+CHECKPOINT_JOB = 'payment_reconciliation'
+DEFAULT_PAGE_SIZE = 200
+# First run looks back this far; orders older than this are settled for good
+SETTLE_DAYS = 3
+# Safety margin for orders whose creation overlaps a run
+WATERMARK_OVERLAP = timedelta(minutes=1)
+MAX_EXAMPLES = 20
+# A capture younger than this is left to verify_payment, which is most likely
+# confirming it right now
+CONFIRM_GRACE = timedelta(minutes=5)
+
+# Orders in these states are fetched again by the next run
+STILL_OPEN = ('awaiting_payment', 'gateway_error', 'authorized_not_captured', 'awaiting_confirmation')
+
+# A booking fix is written only while these still hold the values that were read
+GUARDED_FIELDS = ('status', 'payment_status', 'razorpay_payment_id', 'allocation_error')
+
+UNSETTLED_FILTER = {
+    'razorpay_order_id': {'$gt': ''},
+    '$or': [
+        {'payment_status': {'$ne': 'Paid'}},
+        {'status': {'$ne': 'Confirmed'}},
+        {'razorpay_payment_id': None},
+    ],
+}
+
+
+def _fetch_payments(client, gateway, limiter, order_id):
+    """The order's payment entities from the gateway, or an exception instance."""
+    limiter.acquire()
+    try:
+        return gateway.call(client.order.payments, order_id).get('items') or []
+    except GatewayUnavailable as exc:
+        return exc
+    except Exception as exc:
+        # Unknown order id, credentials etc.: report and go on with the page
+        logger.warning("Could not fetch payments for order %s: %r", order_id, exc)
+        return exc
+
+
+def _captured_at(payment, booking):
+    """When the payment was made (gateway created_at), else when its order was created."""
+    if payment.get('created_at'):
+        return datetime.utcfromtimestamp(payment['created_at'])
+    return booking.get('payment_order_created_at')
+
+
+def diff_booking(booking, items, recorded_payment_ids, now=None):
+    """
+    Compare one booking with its gateway payments. Returns (categories,
+    booking $set or None, payment to record or None).
+    """
+    if isinstance(items, Exception):
+        return ['gateway_error'], None, None
+    captured = [p for p in items if p.get('status') == 'captured']
+    categories, fix = [], {}
+    payment = None
+
+    if captured:
+        pay = captured[0]
+        captured_at = _captured_at(pay, booking)
+        if (booking.get('status') not in ('Confirmed', 'Cancelled') and not booking.get('allocation_error')
+                and captured_at and (now or datetime.utcnow()) - captured_at < CONFIRM_GRACE):
+            return ['awaiting_confirmation'], None, None
+        if booking.get('payment_status') != 'Paid':
+            categories.append('captured_not_marked_paid')
+            fix.update(payment_status='Paid', razorpay_payment_id=pay['id'])
+        elif not booking.get('razorpay_payment_id'):
+            fix['razorpay_payment_id'] = pay['id']
+        if booking.get('status') == 'Cancelled':
+            categories.append('captured_for_cancelled')
+        elif booking.get('status') != 'Confirmed':
+            if booking.get('allocation_error'):
+                categories.append('paid_awaiting_allocation')
+            else:
+                if 'captured_not_marked_paid' not in categories:
+                    categories.append('paid_not_confirmed')
+                fix['allocation_error'] = True
+        if pay['id'] not in recorded_payment_ids:
+            categories.append('payment_record_missing')
+            payment = pay
+    elif booking.get('payment_status') == 'Paid':
+        categories.append('paid_without_capture')
+    elif any(p.get('status') == 'authorized' for p in items):
+        categories.append('authorized_not_captured')
+    elif items and all(p.get('status') == 'failed' for p in items):
+        if booking.get('payment_status') != 'Failed':
+            categories.append('failed_not_marked')
+            fix['payment_status'] = 'Failed'
+    else:
+        categories.append('awaiting_payment')
+    return categories, fix or None, payment
+
+
+def reconcile_payments(db, client, gateway, since=None, page_size=DEFAULT_PAGE_SIZE,
+                       rate=5.0, concurrency=4, dry_run=False, settings=None):
+    """
+    Reconcile unsettled bookings whose order was created at or after `since`
+    (default: the checkpoint, or SETTLE_DAYS ago). `client` is a razorpay
+    Client and `gateway` the utils.gateway.Gateway its calls go through;
+    at most `rate` gateway calls per second, `concurrency` at a time.
+
+    Returns the report: {'checked', 'fixed', 'categories': {name: count},
+    'examples': {name: [booking id, ...]}, 'since', 'next_since'}.
+    """
+    started = datetime.utcnow()
+    floor = started - timedelta(days=SETTLE_DAYS)
+    if since is None:
+        since = load_checkpoint(db, CHECKPOINT_JOB).get('orders_since') or floor
+    settings = settings or load_settings(db)
+    limiter = RateLimiter(rate, burst=concurrency)
+    report = {'checked': 0, 'fixed': 0, 'categories': {}, 'examples': {}, 'since': since}
+    oldest_open = None
+    last_id = None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='reconcile') as pool:
+        while True:
+            query = dict(UNSETTLED_FILTER, payment_order_created_at={'$gte': since})
+            if last_id is not None:
+                query['_id'] = {'$gt': last_id}
+            page = list(db.bookings.find(query).sort('_id', 1).limit(page_size))
+            if not page:
+                break
+            last_id = page[-1]['_id']
+
+            order_ids = [b['razorpay_order_id'] for b in page]
+            results = list(pool.map(lambda oid: _fetch_payments(client, gateway, limiter, oid), order_ids))
+            recorded = {
+                p['payment_id'] for p in db.payments.find({'order_id': {'$in': order_ids}}, {'payment_id': 1})
+                if p.get('payment_id')
+            }
+
+            booking_ops, payment_ops, changes = [], [], []
+            for booking, items in zip(page, results):
+                categories, fix, payment = diff_booking(booking, items, recorded, started)
+                report['checked'] += 1
+                for name in categories:
+                    report['categories'][name] = report['categories'].get(name, 0) + 1
+                    examples = report['examples'].setdefault(name, [])
+                    if len(examples) < MAX_EXAMPLES:
+                        examples.append(str(booking['_id']))
+                if any(name in STILL_OPEN for name in categories):
+                    created = booking.get('payment_order_created_at')
+                    if created and (oldest_open is None or created < oldest_open):
+                        oldest_open = created
+                if fix:
+                    fix.update(updated_at=started, reconciled_at=started)
+                    # Only while nothing (verify_payment, the webhook) changed it since the read
+                    observed = {field: booking.get(field) for field in GUARDED_FIELDS}
+                    booking_ops.append(UpdateOne(dict(observed, _id=booking['_id']), {'$set': fix}))
+                    changes.append((booking, dict(booking, **fix)))
+                if payment:
+                    payment_ops.append(UpdateOne(
+                        {'payment_id': payment['id']},
+                        {'$setOnInsert': {
+                            'booking_id': str(booking['_id']),
+                            'order_id': booking['razorpay_order_id'],
+                            'payment_id': payment['id'],
+                            'amount': (payment.get('amount') or 0) / 100,
+                            'status': 'paid',
+                            'created_at': started,
+                            'source': 'reconciliation',
+                        }},
+                        upsert=True,
+                    ))
+
+            if dry_run:
+                continue
+            if booking_ops:
+                result = db.bookings.bulk_write(booking_ops, ordered=False)
+                if result.matched_count < len(booking_ops):
+                    applied = {d['_id'] for d in db.bookings.find(
+                        {'_id': {'$in': [before['_id'] for before, _ in changes]}, 'reconciled_at': started},
+                        {'_id': 1},
+                    )}
+                    changes = [(before, after) for before, after in changes if before['_id'] in applied]
+                record_booking_changes(db, changes, settings)
+            if payment_ops:
+                try:
+                    db.payments.bulk_write(payment_ops, ordered=False)
+                except BulkWriteError as exc:
+                    # A payment recorded meanwhile by verify_payment or the webhook is what we wanted
+                    if any(e.get('code') != 11000 for e in exc.details.get('writeErrors', [])):
+                        raise
+            report['fixed'] += len(changes) + len(payment_ops)
+
+    next_since = max(floor, (oldest_open or started) - WATERMARK_OVERLAP)
+    report['next_since'] = next_since
+    if not dry_run:
+        save_checkpoint(db, CHECKPOINT_JOB, orders_since=next_since, last_report={
+            'checked': report['checked'], 'fixed': report['fixed'], 'categories': report['categories'],
+        })
+    mismatches = sum(n for name, n in report['categories'].items()
+                     if name not in ('awaiting_payment', 'awaiting_confirmation'))
+    if mismatches:
+        logger.warning("Payment reconciliation: %d mismatch(es) in %d booking(s): %s",
+                       mismatches, report['checked'], report['categories'])
+    return report
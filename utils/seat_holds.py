@@ -0,0 +1,144 @@
+# utils/seat_holds.py
+"""
+Short-lived seat holds between create_order and verify_payment.
+
+A hold reserves the rafts a Pending booking would get, for SEAT_HOLD_MINUTES,
+without touching the rafts collection: one `seat_holds` document per booking
+with the planned {raft_id, count, special} parts and an expires_at. Every
+capacity decision (check_capacity_available, allocate_raft) overlays the
+active holds of the slot on the raft occupancies first, so held seats are
+not sold twice. verify_payment allocates with its own hold left out and then
+drops the hold.
+
+Expired holds stop counting immediately (every read filters on expires_at);
+the documents themselves are removed by the TTL index on expires_at and by
+release_expired_holds.
+"""
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+from utils.allocation_logic import load_settings, plan_raft_allocation
+
+
+def active_holds(db, date, slot, exclude_booking_id=None, session=None, placed_before=None):
+    """
+    Unexpired holds for one (date, slot), optionally leaving out one booking's
+    hold, or only those placed before the `placed_before` hold (by created_at,
+    then _id; a hold without created_at counts as placed first).
+    """
+    query = {'date': date, 'slot': slot, 'expires_at': {'$gt': datetime.utcnow()}}
+    if exclude_booking_id is not None:
+        query['booking_id'] = {'$ne': exclude_booking_id}
+    if placed_before is not None:
+        query['$or'] = [
+            {'created_at': None},
+            {'created_at': {'$lt': placed_before['created_at']}},
+            {'created_at': placed_before['created_at'], '_id': {'$lt': placed_before['_id']}},
+        ]
+    return list(db.seat_holds.find(query, {'booking_id': 1, 'raft_details': 1}, session=session))
+
+
+def overlay_holds(rafts, holds):
+    """Add held seats to the raft dicts in place (special parts mark the raft special). Returns rafts."""
+    by_id = {r.get('raft_id'): r for r in rafts}
+    for hold in holds:
+        for part in hold.get('raft_details') or []:
+            r = by_id.get(part.get('raft_id'))
+            if r is None:
+                continue
+            r['occupancy'] = r.get('occupancy', 0) + int(part.get('count', 0))
+            if part.get('special'):
+                r['is_special'] = True
+    return rafts
+
+
+def _plan_hold(db, booking, settings, exclude_booking_id, placed_before=None):
+    """
+    Plan the booking's seats on the slot's rafts plus every other active hold
+    (only those placed before `placed_before` when given); None when it does not fit.
+    """
+    rafts_per_slot = settings.get('rafts_per_slot', 5)
+    rafts = list(db.rafts.find(
+        {'day': booking.get('date'), 'slot': booking.get('slot')},
+        {'raft_id': 1, 'occupancy': 1, 'is_special': 1},
+    ).sort('raft_id', 1).limit(rafts_per_slot))
+    overlay_holds(rafts, active_holds(db, booking.get('date'), booking.get('slot'), exclude_booking_id,
+                                      placed_before=placed_before))
+    res = plan_raft_allocation(rafts, int(booking.get('group_size', 0) or 0), settings)
+    if res.get('status') != 'Confirmed':
+        return None
+    by_id = {r['raft_id']: r for r in rafts}
+    return [
+        dict(part, special=bool(by_id[part['raft_id']].get('is_special')))
+        for part in res.get('raft_details', [])
+    ]
+
+
+def place_hold(db, booking, minutes, settings=None):
+    """
+    Hold seats for a Pending booking for `minutes`. An active hold of the same
+    booking is just extended.
+
+    The hold is written first, stamped with the server's clock, and then
+    re-planned against the active holds placed before it. When two checkouts
+    race for the last seats the later one (by created_at, then _id) backs out
+    and the earlier one is kept: the later one was written after the earlier
+    one, so its re-check always sees it. Held seats never exceed what the slot
+    can take. Returns the hold document, or None when the slot has no room.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=minutes)
+    extended = db.seat_holds.find_one_and_update(
+        {'booking_id': booking['_id'], 'expires_at': {'$gt': now}},
+        {'$set': {'expires_at': expires_at}},
+    )
+    if extended:
+        return dict(extended, expires_at=expires_at)
+
+    settings = settings or load_settings(db)
+    from models.raft_model import ensure_rafts_for_date_slot
+    ensure_rafts_for_date_slot(db, booking.get('date'), booking.get('slot'),
+                               settings.get('rafts_per_slot', 5), settings['capacity'])
+    details = _plan_hold(db, booking, settings, booking['_id'])
+    if details is None:
+        return None
+
+    hold = {
+        'booking_id': booking['_id'],
+        'date': booking.get('date'),
+        'slot': booking.get('slot'),
+        'group_size': booking.get('group_size'),
+        'raft_details': details,
+        'expires_at': expires_at,
+    }
+    # created_at from the server, so the order of the stamps is the order of the writes
+    hold = db.seat_holds.find_one_and_update(
+        {'booking_id': booking['_id']},
+        {'$set': hold, '$currentDate': {'created_at': True}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+    # Re-check now that our hold is visible to everyone else; holds placed
+    # after ours do the same against ours and back out instead of us
+    confirmed = _plan_hold(db, booking, settings, booking['_id'], placed_before=hold)
+    if confirmed is None:
+        release_hold(db, booking['_id'])
+        return None
+    if confirmed != details:
+        db.seat_holds.update_one({'booking_id': booking['_id']}, {'$set': {'raft_details': confirmed}})
+        hold['raft_details'] = confirmed
+    return hold
+
+
+def release_hold(db, booking_ids):
+    """Drop the holds of one booking id or a list of them."""
+    if not isinstance(booking_ids, (list, tuple, set)):
+        booking_ids = [booking_ids]
+    return db.seat_holds.delete_many({'booking_id': {'$in': list(booking_ids)}}).deleted_count
+
+
+def release_expired_holds(db):
+    """Delete expired holds now instead of waiting for the TTL monitor. Returns the count."""
+    return db.seat_holds.delete_many({'expires_at': {'$lte': datetime.utcnow()}}).deleted_count
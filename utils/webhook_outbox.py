@@ -0,0 +1,211 @@
+# utils/webhook_outbox.py
+"""
+Mongo-backed outbox for Razorpay webhook events.
+
+The webhook route only verifies the signature and inserts the event into
+`webhook_outbox` (one insert, keyed "<payment_id>:<event>", so Razorpay's
+retries of the same event are dropped by the unique _id), then answers 200.
+Worker threads (start_outbox_workers, or scripts/drain_webhook_outbox.py)
+drain the outbox in batches:
+
+- a batch is claimed with one update_many that stamps a claim token and a
+  lease; a worker that dies mid-batch leaves its events to be reclaimed once
+  the lease runs out
+- each event is applied to payments / bookings (process_webhook_event) and
+  the whole batch is acknowledged with one bulk_write
+- failed events go back to pending with exponential backoff and are parked
+  as 'failed' after MAX_ATTEMPTS
+
+Applying an event twice is harmless: the payment upsert and the booking
+update only set fields. Done events are removed by the TTL index on
+processed_at.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from models.payment_model import upsert_payment
+from utils.daily_stats import record_booking_change
+
+logger = logging.getLogger("webhook_outbox")
+
+DEFAULT_BATCH_SIZE = 100
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 8
+MAX_BACKOFF_SECONDS = 600
+
+# Set on enqueue so in-process workers pick new events up without waiting for their poll
+_wakeup = threading.Event()
+
+
+def _payment_entity(body):
+    return (body.get("payload") or {}).get("payment", {}).get("entity", {}) or {}
+
+
+def enqueue_webhook_event(db, body):
+    """
+    Store a verified webhook body for the workers. Returns True when it was
+    queued, False for a repeat of an event already queued and for events
+    without a payment entity (nothing to apply).
+    """
+    event = body.get("event")
+    entity = _payment_entity(body)
+    payment_id = entity.get("id")
+    if not payment_id:
+        logger.info("Webhook %s has no payment entity; ignored", event)
+        return False
+    now = datetime.utcnow()
+    try:
+        db.webhook_outbox.insert_one({
+            "_id": f"{payment_id}:{event}",
+            "event": event,
+            "payment_id": payment_id,
+            "order_id": entity.get("order_id"),
+            "status": entity.get("status"),
+            "body": body,
+            "state": "pending",
+            "attempts": 0,
+            "received_at": now,
+            "next_attempt_at": now,
+        })
+    except DuplicateKeyError:
+        logger.info("Webhook %s for payment %s already queued", event, payment_id)
+        return False
+    _wakeup.set()
+    return True
+
+
+def process_webhook_event(db, doc):
+    """Apply one outbox event to payments and (for captured / failed payments) its booking."""
+    event, payment_id, order_id, status = doc["event"], doc["payment_id"], doc.get("order_id"), doc.get("status")
+    now = datetime.utcnow()
+
+    upsert_payment(
+        db,
+        payment_id,
+        {
+            "webhook_verified": True,
+            "status": status,
+            "webhook_event": event,
+            "webhook_received_at": doc.get("received_at"),
+        },
+        {"order_id": order_id},
+    )
+
+    # Best-effort sync to booking using razorpay_order_id
+    if event == "payment.captured" and status == "captured":
+        payment_status = "Paid"
+    elif event == "payment.failed":
+        payment_status = "Failed"
+    else:
+        return
+    before = db.bookings.find_one_and_update(
+        # A booking already Paid is not downgraded by a late failure of another attempt
+        {"razorpay_order_id": order_id, "payment_status": {"$nin": [payment_status, "Paid"]}},
+        {"$set": {"payment_status": payment_status, "updated_at": now}},
+    )
+    if before:
+        record_booking_change(db, before, dict(before, payment_status=payment_status))
+
+
+def _ready_filter(now):
+    return {"$or": [
+        {"state": "pending", "next_attempt_at": {"$lte": now}},
+        # Claimed by a worker that did not finish within its lease
+        {"state": "processing", "lease_until": {"$lte": now}},
+    ]}
+
+
+def claim_batch(db, batch_size=DEFAULT_BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+    """Claim up to batch_size ready events for this worker, oldest first."""
+    now = datetime.utcnow()
+    ready = _ready_filter(now)
+    ids = [d["_id"] for d in db.webhook_outbox.find(ready, {"_id": 1}).sort("received_at", 1).limit(batch_size)]
+    if not ids:
+        return []
+    token = ObjectId()
+    # Re-checking `ready` makes the claim exclusive when workers race for the same ids
+    db.webhook_outbox.update_many(
+        dict(ready, _id={"$in": ids}),
+        {"$set": {"state": "processing", "claim": token,
+                  "lease_until": now + timedelta(seconds=lease_seconds)},
+         "$inc": {"attempts": 1}},
+    )
+    return list(db.webhook_outbox.find({"claim": token}).sort("received_at", 1))
+
+
+def drain_batch(db, batch_size=DEFAULT_BATCH_SIZE):
+    """Claim and process one batch. Returns (processed, failed)."""
+    docs = claim_batch(db, batch_size)
+    if not docs:
+        return 0, 0
+    now = datetime.utcnow()
+    ops, failed = [], 0
+    for doc in docs:
+        claimed = {"_id": doc["_id"], "claim": doc["claim"]}
+        try:
+            process_webhook_event(db, doc)
+        except Exception as exc:
+            failed += 1
+            attempts = doc.get("attempts", 1)
+            state = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+            logger.exception("Webhook %s (attempt %d) failed", doc["_id"], attempts)
+            delay = min(MAX_BACKOFF_SECONDS, 2 ** attempts)
+            ops.append(UpdateOne(claimed, {
+                "$set": {"state": state, "last_error": repr(exc)[:500],
+                         "next_attempt_at": now + timedelta(seconds=delay)},
+                "$unset": {"claim": "", "lease_until": ""},
+            }))
+        else:
+            ops.append(UpdateOne(claimed, {
+                "$set": {"state": "done", "processed_at": now},
+                "$unset": {"claim": "", "lease_until": ""},
+            }))
+    db.webhook_outbox.bulk_write(ops, ordered=False)
+    return len(docs) - failed, failed
+
+
+def drain_outbox(db, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Process batches until nothing is ready (or max_batches). Returns (processed, failed)."""
+    processed = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        done, bad = drain_batch(db, batch_size)
+        if not done and not bad:
+            break
+        processed, failed, batches = processed + done, failed + bad, batches + 1
+    return processed, failed
+
+
+def requeue_failed(db):
+    """Give events parked as 'failed' a fresh set of attempts. Returns the count."""
+    return db.webhook_outbox.update_many(
+        {"state": "failed"},
+        {"$set": {"state": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()}},
+    ).modified_count
+
+
+def _worker(get_db, interval, batch_size, stop):
+    while not stop.is_set():
+        try:
+            drain_outbox(get_db(), batch_size)
+        except Exception:
+            logger.exception("Webhook outbox worker error")
+        _wakeup.wait(interval)
+        _wakeup.clear()
+
+
+def start_outbox_workers(get_db, count, interval=1.0, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Start `count` daemon threads draining the outbox. `get_db` is called for
+    every round, so it follows a database swapped on the app. Returns a
+    threading.Event that stops the workers when set.
+    """
+    stop = threading.Event()
+    for n in range(count):
+        threading.Thread(target=_worker, args=(get_db, interval, batch_size, stop),
+                         name=f"webhook-outbox-{n}", daemon=True).start()
+    return stop